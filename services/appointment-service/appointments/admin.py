@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import DoctorAvailability, TimeSlot, Appointment, AppointmentReminder
+from .models import DoctorAvailability, TimeSlot, Appointment, AppointmentReminder, DoctorDailyAvailability, AppointmentOutbox
 
 
 @admin.register(DoctorAvailability)
@@ -17,6 +17,14 @@ class TimeSlotAdmin(admin.ModelAdmin):
     date_hierarchy = 'date'
 
 
+@admin.register(DoctorDailyAvailability)
+class DoctorDailyAvailabilityAdmin(admin.ModelAdmin):
+    list_display = ('doctor_id', 'date', 'free_slots', 'total_slots', 'first_free_time', 'last_free_time', 'updated_at')
+    list_filter = ('date',)
+    search_fields = ('doctor_id',)
+    date_hierarchy = 'date'
+
+
 @admin.register(Appointment)
 class AppointmentAdmin(admin.ModelAdmin):
     list_display = ('id', 'patient_id', 'get_doctor_id', 'get_appointment_date', 'get_start_time', 'get_end_time', 'status')
@@ -47,3 +55,10 @@ class AppointmentReminderAdmin(admin.ModelAdmin):
     list_filter = ('reminder_type', 'status')
     search_fields = ('appointment__patient_id', 'appointment__doctor_id')
     date_hierarchy = 'scheduled_time'
+
+
+@admin.register(AppointmentOutbox)
+class AppointmentOutboxAdmin(admin.ModelAdmin):
+    list_display = ('id', 'appointment', 'effect', 'status', 'attempts', 'created_at', 'processed_at')
+    list_filter = ('effect', 'status')
+    search_fields = ('appointment__id',)
@@ -0,0 +1,150 @@
+"""
+Duy trì chỉ mục lịch trống DoctorDailyAvailability từ dữ liệu TimeSlot.
+"""
+import logging
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Q
+
+from .models import TimeSlot, DoctorDailyAvailability
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_UPDATE_FIELDS = [
+    'total_slots', 'free_slots', 'first_free_time', 'last_free_time',
+    'free_slot_bitmap', 'departments', 'updated_at'
+]
+
+
+def _is_free(slot):
+    """Khung giờ còn nhận thêm bệnh nhân hay không"""
+    return slot['status'] == 'AVAILABLE' and slot['current_patients'] < slot['max_patients']
+
+
+def _build_bitmap(free_slots):
+    """Tạo bitmap các khoảng BITMAP_GRANULARITY phút bị phủ bởi khung giờ trống"""
+    granularity = DoctorDailyAvailability.BITMAP_GRANULARITY
+    bits = ['0'] * DoctorDailyAvailability.BITMAP_LENGTH
+
+    for slot in free_slots:
+        start_minutes = slot['start_time'].hour * 60 + slot['start_time'].minute
+        end_minutes = slot['end_time'].hour * 60 + slot['end_time'].minute
+        for index in range(start_minutes // granularity, min(-(-end_minutes // granularity), len(bits))):
+            bits[index] = '1'
+
+    return ''.join(bits)
+
+
+def _build_summary(doctor_id, date, slots, summary_model=DoctorDailyAvailability):
+    """Tạo bản ghi tổng hợp cho một bác sĩ trong một ngày"""
+    free_slots = sorted((slot for slot in slots if _is_free(slot)), key=lambda slot: slot['start_time'])
+    departments = sorted({slot['department'] for slot in free_slots if slot['department']})
+
+    return summary_model(
+        doctor_id=doctor_id,
+        date=date,
+        total_slots=len(slots),
+        free_slots=len(free_slots),
+        first_free_time=free_slots[0]['start_time'] if free_slots else None,
+        last_free_time=free_slots[-1]['start_time'] if free_slots else None,
+        free_slot_bitmap=_build_bitmap(free_slots),
+        departments=','.join(departments)[:255],
+    )
+
+
+def refresh_daily_availability(keys, slot_model=TimeSlot, summary_model=DoctorDailyAvailability):
+    """
+    Tính lại chỉ mục lịch trống cho các cặp (doctor_id, date).
+
+    Đọc tất cả khung giờ liên quan trong một truy vấn và ghi lại bằng một lệnh
+    upsert duy nhất; các ngày không còn khung giờ nào sẽ bị xóa khỏi chỉ mục.
+    slot_model/summary_model cho phép dùng model lịch sử trong migration.
+
+    Returns:
+    - int: Số bản ghi tổng hợp được ghi
+    """
+    keys = {(int(doctor_id), date) for doctor_id, date in keys if doctor_id is not None and date is not None}
+    if not keys:
+        return 0
+
+    doctor_ids = {doctor_id for doctor_id, _ in keys}
+    dates = {date for _, date in keys}
+
+    slots_by_key = defaultdict(list)
+    rows = slot_model.objects.filter(
+        doctor_id__in=doctor_ids,
+        date__in=dates,
+        is_active=True
+    ).values('doctor_id', 'date', 'start_time', 'end_time', 'status', 'current_patients', 'max_patients', 'department')
+
+    for row in rows:
+        key = (row['doctor_id'], row['date'])
+        if key in keys:
+            slots_by_key[key].append(row)
+
+    summaries = [_build_summary(doctor_id, date, slots_by_key[(doctor_id, date)], summary_model) for doctor_id, date in keys if slots_by_key.get((doctor_id, date))]
+
+    with transaction.atomic():
+        # Xóa các ngày không còn khung giờ hoạt động
+        empty_keys = [key for key in keys if not slots_by_key.get(key)]
+        if empty_keys:
+            condition = Q()
+            for doctor_id, date in empty_keys:
+                condition |= Q(doctor_id=doctor_id, date=date)
+            summary_model.objects.filter(condition).delete()
+
+        if summaries:
+            summary_model.objects.bulk_create(
+                summaries,
+                update_conflicts=True,
+                unique_fields=['doctor_id', 'date'],
+                update_fields=SUMMARY_UPDATE_FIELDS
+            )
+
+    return len(summaries)
+
+
+def rebuild_daily_availability(start_date=None, end_date=None, batch_size=500,
+                               slot_model=TimeSlot, summary_model=DoctorDailyAvailability):
+    """
+    Xây dựng lại chỉ mục lịch trống từ các khung giờ hiện có.
+
+    Parameters:
+    - start_date, end_date: khoảng ngày cần xây dựng lại (None = không giới hạn)
+    - batch_size: số cặp (bác sĩ, ngày) mỗi lần ghi
+
+    Returns:
+    - tuple: (số cặp bác sĩ-ngày, số bản ghi tổng hợp được ghi)
+    """
+    slots = slot_model.objects.all()
+    if start_date:
+        slots = slots.filter(date__gte=start_date)
+    if end_date:
+        slots = slots.filter(date__lte=end_date)
+
+    keys = list(slots.values_list('doctor_id', 'date').distinct().order_by('date', 'doctor_id'))
+    total = 0
+    for index in range(0, len(keys), batch_size):
+        total += refresh_daily_availability(keys[index:index + batch_size], slot_model, summary_model)
+    return len(keys), total
+
+
+def schedule_refresh(keys):
+    """Tính lại chỉ mục sau khi transaction hiện tại commit thành công"""
+    keys = set(keys)
+    if not keys:
+        return
+
+    def _refresh():
+        try:
+            refresh_daily_availability(keys)
+        except Exception as e:
+            logger.error(f"Error refreshing availability index for {len(keys)} doctor-days: {str(e)}")
+
+    transaction.on_commit(_refresh)
+
+
+def refresh_for_slots(slots):
+    """Tính lại chỉ mục cho các ngày chứa những khung giờ đã cho"""
+    schedule_refresh({(slot.doctor_id, slot.date) for slot in slots})
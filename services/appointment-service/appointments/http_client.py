@@ -0,0 +1,221 @@
+"""
+HTTP client dùng chung cho các lời gọi từ appointment-service đến các service khác.
+
+- Một requests.Session duy nhất với connection pool giới hạn theo từng host (keep-alive)
+- Retry với exponential backoff và jitter
+- Circuit breaker cho từng service đích, tránh dồn request vào service đang lỗi
+- fan_out() để gọi song song các lời gọi độc lập
+"""
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_config = getattr(settings, 'API_RETRY_CONFIG', {})
+
+MAX_RETRIES = _config.get('MAX_RETRIES', 3)
+RETRY_DELAY = _config.get('RETRY_DELAY', 1)
+MAX_RETRY_DELAY = _config.get('MAX_RETRY_DELAY', 8)
+TIMEOUT = _config.get('TIMEOUT', 5)
+
+# Số kết nối tối đa được giữ cho mỗi host
+POOL_MAXSIZE = _config.get('POOL_MAXSIZE', 20)
+# Số host được giữ connection pool
+POOL_CONNECTIONS = _config.get('POOL_CONNECTIONS', 10)
+
+# Circuit breaker: mở sau CIRCUIT_FAILURE_THRESHOLD lỗi liên tiếp, thử lại sau CIRCUIT_RESET_TIMEOUT giây
+CIRCUIT_FAILURE_THRESHOLD = _config.get('CIRCUIT_FAILURE_THRESHOLD', 5)
+CIRCUIT_RESET_TIMEOUT = _config.get('CIRCUIT_RESET_TIMEOUT', 30)
+
+# Số luồng tối đa cho các lời gọi song song
+FAN_OUT_MAX_WORKERS = _config.get('FAN_OUT_MAX_WORKERS', 8)
+
+RETRYABLE_STATUS_CODES = (408, 429, 500, 502, 503, 504)
+SUCCESS_STATUS_CODES = (200, 201, 202, 204)
+
+
+class CircuitOpenError(Exception):
+    """Service đích đang bị ngắt mạch, request không được gửi"""
+    pass
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker đơn giản cho một service đích.
+
+    CLOSED: request đi qua bình thường.
+    OPEN: sau nhiều lỗi liên tiếp, từ chối request ngay trong reset_timeout giây.
+    HALF_OPEN: hết thời gian chờ, cho một request thử; thành công thì đóng lại, lỗi thì mở lại.
+    """
+
+    def __init__(self, name, failure_threshold=CIRCUIT_FAILURE_THRESHOLD, reset_timeout=CIRCUIT_RESET_TIMEOUT):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._half_open_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'CLOSED'
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return 'HALF_OPEN'
+        return 'OPEN'
+
+    def allow_request(self):
+        with self._lock:
+            state = self.state
+            if state == 'CLOSED':
+                return True
+            if state == 'HALF_OPEN' and not self._half_open_in_flight:
+                self._half_open_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._half_open_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._half_open_in_flight = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                if self.opened_at is None:
+                    logger.warning(f"Circuit opened for {self.name} after {self.failures} consecutive failures")
+                self.opened_at = time.monotonic()
+
+
+_session = None
+_session_lock = threading.Lock()
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_session():
+    """Lấy requests.Session dùng chung (tạo một lần cho mỗi process)"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                # pool_block=True: giới hạn cứng số kết nối đồng thời đến mỗi host
+                adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE, pool_block=True)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                _session = session
+    return _session
+
+
+def get_circuit_breaker(url):
+    """Lấy circuit breaker cho service đích (theo host:port của URL)"""
+    name = urlsplit(url).netloc
+    breaker = _breakers.get(name)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.setdefault(name, CircuitBreaker(name))
+    return breaker
+
+
+def backoff_delay(attempt):
+    """Thời gian chờ trước lần retry thứ attempt (exponential backoff với full jitter)"""
+    return random.uniform(0, min(MAX_RETRY_DELAY, RETRY_DELAY * (2 ** attempt)))
+
+
+def request(method, url, data=None, headers=None, timeout=TIMEOUT, max_retries=MAX_RETRIES):
+    """
+    Thực hiện HTTP request qua session dùng chung, có retry và circuit breaker
+
+    Returns:
+    - requests.Response: Response cuối cùng (có thể là lỗi không retry được)
+
+    Raises:
+    - CircuitOpenError: Nếu service đích đang bị ngắt mạch
+    - requests.exceptions.RequestException: Nếu lỗi kết nối sau khi hết lượt retry
+    """
+    breaker = get_circuit_breaker(url)
+    session = get_session()
+    json_data = data if method.lower() in ('post', 'put', 'patch') else None
+
+    attempt = 0
+    while True:
+        if not breaker.allow_request():
+            raise CircuitOpenError(f"Circuit open for {breaker.name}")
+
+        try:
+            response = session.request(method.upper(), url, json=json_data, headers=headers, timeout=timeout)
+        except requests.exceptions.RequestException as e:
+            breaker.record_failure()
+            if attempt >= max_retries:
+                raise
+            logger.warning(f"Connection error to {url}, retrying {attempt+1}/{max_retries}: {str(e)}")
+        else:
+            if response.status_code not in RETRYABLE_STATUS_CODES:
+                breaker.record_success()
+                return response
+
+            breaker.record_failure()
+            if attempt >= max_retries:
+                return response
+            logger.warning(f"Retrying API call to {url} after error {response.status_code}, attempt {attempt+1}/{max_retries}")
+
+        time.sleep(backoff_delay(attempt))
+        attempt += 1
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=FAN_OUT_MAX_WORKERS, thread_name_prefix='integrations')
+    return _executor
+
+
+def fan_out(calls):
+    """
+    Thực hiện song song các lời gọi độc lập
+
+    Parameters:
+    - calls: dict {key: (func, args)} hoặc {key: (func, args, kwargs)}
+
+    Returns:
+    - dict: {key: kết quả}; lời gọi bị lỗi trả về None
+    """
+    if not calls:
+        return {}
+
+    if len(calls) == 1:
+        key, call = next(iter(calls.items()))
+        return {key: _run_call(key, call)}
+
+    executor = _get_executor()
+    futures = {key: executor.submit(_run_call, key, call) for key, call in calls.items()}
+    return {key: future.result() for key, future in futures.items()}
+
+
+def _run_call(key, call):
+    func, args = call[0], call[1]
+    kwargs = call[2] if len(call) > 2 else {}
+    try:
+        return func(*args, **kwargs)
+    except Exception as e:
+        logger.error(f"Error in concurrent call {key}: {str(e)}")
+        return None
@@ -2,6 +2,9 @@ import requests
 import logging
 import os
 from django.conf import settings
+from django.core.cache import cache
+
+from . import http_client
 
 logger = logging.getLogger(__name__)
 
@@ -20,64 +23,59 @@ NOTIFICATION_SERVICE_URL = get_service_url('NOTIFICATION_SERVICE')
 BILLING_SERVICE_URL = get_service_url('BILLING_SERVICE')
 
 # Cấu hình retry cho các API call
-MAX_RETRIES = getattr(settings, 'API_RETRY_CONFIG', {}).get('MAX_RETRIES', 3)
-RETRY_DELAY = getattr(settings, 'API_RETRY_CONFIG', {}).get('RETRY_DELAY', 1)
-TIMEOUT = getattr(settings, 'API_RETRY_CONFIG', {}).get('TIMEOUT', 5)
+MAX_RETRIES = http_client.MAX_RETRIES
+RETRY_DELAY = http_client.RETRY_DELAY
+TIMEOUT = http_client.TIMEOUT
+
+# Thời gian lưu cache thông tin bác sĩ (giây), dùng chung giữa các request
+DOCTOR_INFO_CACHE_TTL = getattr(settings, 'DOCTOR_INFO_CACHE_TTL', 300)
+DOCTOR_INFO_MISS_CACHE_TTL = getattr(settings, 'DOCTOR_INFO_MISS_CACHE_TTL', 30)
+
 
+def get_auth_headers(token=None, service_auth=False):
+    """
+    Tạo headers xác thực cho các request đến service khác
 
-def get_auth_headers(token=None):
-    """Tạo headers xác thực cho các request đến service khác"""
+    service_auth: xác thực bằng API key của appointment-service (tác vụ nền, không có token người dùng)
+    """
     headers = {
         'Content-Type': 'application/json',
     }
     if token:
         headers['Authorization'] = f'Bearer {token}'
+    if service_auth:
+        headers['X-Service-API-Key'] = getattr(settings, 'SERVICE_API_KEY', '')
+        headers['X-Service-Name'] = getattr(settings, 'SERVICE_NAME', 'appointment-service')
     return headers
 
 
-def make_api_request(method, url, data=None, token=None, retry=0):
+def make_api_request(method, url, data=None, token=None, retry=0, service_auth=False):
     """
-    Hàm chung để thực hiện API call với cơ chế retry
+    Hàm chung để thực hiện API call qua connection pool dùng chung,
+    với retry (exponential backoff + jitter) và circuit breaker theo từng service
     """
-    import time
+    headers = get_auth_headers(token, service_auth)
 
-    headers = get_auth_headers(token)
+    if method.lower() not in ('get', 'post', 'put', 'patch', 'delete'):
+        logger.error(f"Unsupported HTTP method: {method}")
+        return None
 
     try:
-        if method.lower() == 'get':
-            response = requests.get(url, headers=headers, timeout=TIMEOUT)
-        elif method.lower() == 'post':
-            response = requests.post(url, json=data, headers=headers, timeout=TIMEOUT)
-        elif method.lower() == 'put':
-            response = requests.put(url, json=data, headers=headers, timeout=TIMEOUT)
-        elif method.lower() == 'patch':
-            response = requests.patch(url, json=data, headers=headers, timeout=TIMEOUT)
-        elif method.lower() == 'delete':
-            response = requests.delete(url, headers=headers, timeout=TIMEOUT)
-        else:
-            logger.error(f"Unsupported HTTP method: {method}")
-            return None
+        response = http_client.request(method, url, data=data, headers=headers, max_retries=max(MAX_RETRIES - retry, 0))
 
         # Treat 202 Accepted as success for event processing
-        if response.status_code in [200, 201, 202, 204]:
+        if response.status_code in http_client.SUCCESS_STATUS_CODES:
             if response.status_code == 204 or not response.content:
                 return {}
             return response.json()
 
-        # Nếu lỗi tạm thời và còn lượt retry, thử lại
-        if response.status_code in [408, 429, 500, 502, 503, 504] and retry < MAX_RETRIES:
-            logger.warning(f"Retrying API call to {url} after error {response.status_code}, attempt {retry+1}/{MAX_RETRIES}")
-            time.sleep(RETRY_DELAY)
-            return make_api_request(method, url, data, token, retry+1)
-
         logger.error(f"API call failed: {url}, status: {response.status_code}, response: {response.text}")
         return None
 
+    except http_client.CircuitOpenError as e:
+        logger.warning(f"Skipping API call to {url}: {str(e)}")
+        return None
     except requests.exceptions.RequestException as e:
-        if retry < MAX_RETRIES:
-            logger.warning(f"Connection error to {url}, retrying {retry+1}/{MAX_RETRIES}: {str(e)}")
-            time.sleep(RETRY_DELAY)
-            return make_api_request(method, url, data, token, retry+1)
         logger.error(f"Failed to connect to {url} after {MAX_RETRIES} attempts: {str(e)}")
         return None
 
@@ -89,26 +87,47 @@ def get_user_info(user_id, token=None):
     return make_api_request('get', url, token=token)
 
 
-def get_doctor_info(doctor_id, token=None):
-    """Lấy thông tin bác sĩ từ User Service"""
-    try:
-        # Thử gọi API đến User Service
-        url = f"{USER_SERVICE_URL}/api/doctors/{doctor_id}/"
-        result = make_api_request('get', url, token=token)
+def _doctor_info_cache_key(doctor_id):
+    """Khóa cache cho thông tin bác sĩ"""
+    return f"appointment:doctor_info:{doctor_id}"
 
-        if result:
-            return result
 
-        # Nếu không lấy được thông tin, thử gọi API danh sách và lọc
-        url = f"{USER_SERVICE_URL}/api/doctors/"
-        doctors = make_api_request('get', url, token=token)
+def _index_doctors_by_id(doctors):
+    """Chuyển danh sách bác sĩ (list hoặc response phân trang) thành dict theo ID"""
+    if isinstance(doctors, dict):
+        doctors = doctors.get('results', [])
+    if not isinstance(doctors, list):
+        return {}
+    return {str(doctor.get('id')): doctor for doctor in doctors if isinstance(doctor, dict) and doctor.get('id') is not None}
 
-        if doctors and isinstance(doctors, list):
-            for doctor in doctors:
-                if doctor.get('id') == doctor_id:
-                    return doctor
-    except Exception as e:
-        logger.error(f"Error getting doctor info: {str(e)}")
+
+def get_doctor_info(doctor_id, token=None):
+    """Lấy thông tin bác sĩ từ User Service"""
+    cached = cache.get(_doctor_info_cache_key(doctor_id))
+    if cached:
+        return cached
+
+    # False: User Service vừa trả lời là không có bác sĩ này
+    if cached is None:
+        try:
+            # Thử gọi API đến User Service
+            url = f"{USER_SERVICE_URL}/api/doctors/{doctor_id}/"
+            result = make_api_request('get', url, token=token)
+
+            if result:
+                cache.set(_doctor_info_cache_key(doctor_id), result, DOCTOR_INFO_CACHE_TTL)
+                return result
+
+            # Nếu không lấy được thông tin, thử gọi API danh sách và lọc
+            url = f"{USER_SERVICE_URL}/api/doctors/"
+            doctors = make_api_request('get', url, token=token)
+
+            doctor = _index_doctors_by_id(doctors).get(str(doctor_id))
+            if doctor:
+                cache.set(_doctor_info_cache_key(doctor_id), doctor, DOCTOR_INFO_CACHE_TTL)
+                return doctor
+        except Exception as e:
+            logger.error(f"Error getting doctor info: {str(e)}")
 
     # Nếu không lấy được thông tin, trả về thông tin cơ bản
     return {
@@ -117,6 +136,70 @@ def get_doctor_info(doctor_id, token=None):
     }
 
 
+def get_doctors_info_map(doctor_ids, token=None):
+    """
+    Lấy thông tin của nhiều bác sĩ cùng lúc, trả về dict {doctor_id: doctor_info}
+
+    Các ID đã có trong cache không gọi lại User Service. Các ID còn thiếu được lấy
+    bằng một request duy nhất qua API batch; nếu API batch không khả dụng thì lấy
+    danh sách bác sĩ một lần và lọc. ID không tìm thấy sẽ không có trong kết quả và
+    được ghi nhớ trong DOCTOR_INFO_MISS_CACHE_TTL giây để không gọi lại mỗi request.
+    """
+    doctor_ids = {doctor_id for doctor_id in doctor_ids if doctor_id is not None}
+    if not doctor_ids:
+        return {}
+
+    cache_keys = {_doctor_info_cache_key(doctor_id): doctor_id for doctor_id in doctor_ids}
+    cached = {cache_keys[key]: value for key, value in cache.get_many(list(cache_keys)).items()}
+    doctors_map = {doctor_id: value for doctor_id, value in cached.items() if value}
+
+    # ID đã biết là không tồn tại được lưu trong cache với giá trị False
+    missing_ids = [doctor_id for doctor_id in doctor_ids if doctor_id not in cached]
+    if not missing_ids:
+        return doctors_map
+
+    fetched = {}
+    answered = False
+    try:
+        # Sử dụng API batch
+        doctor_ids_str = ','.join(map(str, sorted(missing_ids)))
+        url = f"{USER_SERVICE_URL}/api/doctors/batch/?ids={doctor_ids_str}"
+        response = make_api_request('get', url, token=token)
+        answered = response is not None
+        doctors_by_id = _index_doctors_by_id(response)
+
+        # Nếu API batch không khả dụng, lấy danh sách bác sĩ một lần và lọc
+        if not answered:
+            url = f"{USER_SERVICE_URL}/api/doctors/"
+            response = make_api_request('get', url, token=token)
+            answered = response is not None
+            doctors_by_id = _index_doctors_by_id(response)
+
+        for doctor_id in missing_ids:
+            doctor = doctors_by_id.get(str(doctor_id))
+            if doctor:
+                fetched[doctor_id] = doctor
+    except Exception as e:
+        logger.error(f"Error getting doctors info map: {str(e)}")
+
+    if fetched:
+        cache.set_many(
+            {_doctor_info_cache_key(doctor_id): doctor for doctor_id, doctor in fetched.items()},
+            DOCTOR_INFO_CACHE_TTL
+        )
+        doctors_map.update(fetched)
+
+    # Chỉ ghi nhớ ID không tìm thấy khi User Service đã trả lời (không phải khi lỗi)
+    not_found = [doctor_id for doctor_id in missing_ids if doctor_id not in fetched]
+    if answered and not_found:
+        cache.set_many(
+            {_doctor_info_cache_key(doctor_id): False for doctor_id in not_found},
+            DOCTOR_INFO_MISS_CACHE_TTL
+        )
+
+    return doctors_map
+
+
 def get_doctors_by_specialty(specialty, token=None):
     """Lấy danh sách ID bác sĩ theo chuyên khoa từ User Service"""
     url = f"{USER_SERVICE_URL}/api/doctors/?specialty={specialty}"
@@ -141,10 +224,14 @@ def get_doctors_by_department(department, token=None):
         logger.warning(f"No specialty IDs found for department {department}")
         return None
 
-    # Lấy danh sách bác sĩ cho từng chuyên khoa
+    # Lấy danh sách bác sĩ cho các chuyên khoa song song
+    results = http_client.fan_out({
+        specialty_id: (get_doctors_by_specialty, (specialty_id, token))
+        for specialty_id in specialty_ids
+    })
+
     all_doctors = []
-    for specialty_id in specialty_ids:
-        doctors = get_doctors_by_specialty(specialty_id, token)
+    for doctors in results.values():
         if doctors:
             all_doctors.extend(doctors)
 
@@ -159,27 +246,16 @@ def get_doctors_info(doctor_ids, token=None):
     if not doctor_ids:
         return []
 
-    # Nếu chỉ có một ID, sử dụng API chi tiết
-    if len(doctor_ids) == 1:
-        doctor_info = get_doctor_info(doctor_ids[0], token)
-        return [doctor_info] if doctor_info else []
-
-    # Nếu có nhiều ID, sử dụng API danh sách với filter
     try:
-        # Thử sử dụng API batch nếu có
-        doctor_ids_str = ','.join(map(str, doctor_ids))
-        url = f"{USER_SERVICE_URL}/api/doctors/batch/?ids={doctor_ids_str}"
-        result = make_api_request('get', url, token=token)
+        doctors_map = get_doctors_info_map(doctor_ids, token)
 
-        if result:
-            return result
-
-        # Nếu không có API batch, sử dụng API danh sách
+        # Giữ thứ tự đầu vào, bác sĩ không tìm thấy sẽ dùng thông tin cơ bản
         doctors = []
-        for doctor_id in doctor_ids:
-            doctor_info = get_doctor_info(doctor_id, token)
-            if doctor_info:
-                doctors.append(doctor_info)
+        for doctor_id in dict.fromkeys(doctor_ids):
+            doctors.append(doctors_map.get(doctor_id) or {
+                'id': doctor_id,
+                'name': f'Bác sĩ (ID: {doctor_id})'
+            })
 
         return doctors
     except Exception as e:
@@ -440,7 +516,7 @@ def send_appointment_notification(appointment, notification_type, message=None,
 
 
 # Tích hợp với Billing Service
-def create_billing(data, token=None):
+def create_billing(data, token=None, service_auth=False):
     """
     Tạo hóa đơn mới cho một lịch hẹn
 
@@ -453,7 +529,7 @@ def create_billing(data, token=None):
         - insurance_id: ID bảo hiểm (tùy chọn)
     """
     url = f"{BILLING_SERVICE_URL}/api/billings/"
-    result = make_api_request('post', url, data=data, token=token)
+    result = make_api_request('post', url, data=data, token=token, service_auth=service_auth)
 
     # Ghi log kết quả
     if result:
@@ -464,7 +540,7 @@ def create_billing(data, token=None):
     return result
 
 
-def create_appointment_billing(appointment, service_items=None, token=None):
+def create_appointment_billing(appointment, service_items=None, token=None, service_auth=False):
     """
     Tạo hóa đơn cho lịch hẹn
 
@@ -472,6 +548,7 @@ def create_appointment_billing(appointment, service_items=None, token=None):
     appointment - Appointment: Đối tượng lịch hẹn
     service_items - list: Danh sách các dịch vụ (nếu không cung cấp, sẽ tạo dịch vụ mặc định)
     token - str: JWT token để xác thực với Billing Service
+    service_auth - bool: Xác thực với Billing Service bằng API key của service (dùng trong outbox)
     """
     # Lấy thông tin cần thiết từ lịch hẹn
     appointment_id = appointment.id
@@ -515,7 +592,7 @@ def create_appointment_billing(appointment, service_items=None, token=None):
             billing_data["patient_responsibility"] = verification.get('patient_responsibility', total_amount)
 
     # Tạo hóa đơn
-    result = create_billing(billing_data, token)
+    result = create_billing(billing_data, token, service_auth)
 
     # Gửi thông báo cho bệnh nhân
     if result:
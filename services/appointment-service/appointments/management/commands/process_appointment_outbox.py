@@ -0,0 +1,32 @@
+import logging
+from django.core.management.base import BaseCommand
+from appointments.models import AppointmentOutbox
+from appointments.outbox import process_pending
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Processes pending appointment outbox entries (reminders, billing)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=100, help='Maximum number of entries to process per batch')
+        parser.add_argument('--retry-failed', action='store_true', help='Reset FAILED entries to PENDING before processing')
+
+    def handle(self, *args, **options):
+        limit = options['limit']
+
+        if options['retry_failed']:
+            reset = AppointmentOutbox.objects.filter(status='FAILED').update(status='PENDING', attempts=0)
+            self.stdout.write(f"Reset {reset} failed outbox entries")
+
+        total_processed = 0
+        total_seen = 0
+        while True:
+            processed, seen = process_pending(limit=limit)
+            total_processed += processed
+            total_seen += seen
+            # Dừng khi không còn mục nào hoặc có mục thất bại (sẽ thử lại ở lần chạy sau)
+            if seen < limit or processed < seen:
+                break
+
+        self.stdout.write(self.style.SUCCESS(f"Processed {total_processed}/{total_seen} outbox entries"))
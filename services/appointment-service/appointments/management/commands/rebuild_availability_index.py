@@ -0,0 +1,24 @@
+import logging
+from datetime import datetime
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from appointments.availability_index import rebuild_daily_availability
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Rebuilds the per-doctor daily availability index from existing time slots'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start-date', type=str, default=None, help='First date to rebuild (YYYY-MM-DD, default: today)')
+        parser.add_argument('--end-date', type=str, default=None, help='Last date to rebuild (YYYY-MM-DD, default: no limit)')
+        parser.add_argument('--batch-size', type=int, default=500, help='Number of doctor-days to rebuild per batch')
+
+    def handle(self, *args, **options):
+        start_date = datetime.strptime(options['start_date'], '%Y-%m-%d').date() if options['start_date'] else timezone.now().date()
+        end_date = datetime.strptime(options['end_date'], '%Y-%m-%d').date() if options['end_date'] else None
+        batch_size = options['batch_size']
+
+        keys, total = rebuild_daily_availability(start_date, end_date, batch_size)
+        self.stdout.write(f"Rebuilt availability index for {keys} doctor-days")
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {total} availability index entries"))
@@ -0,0 +1,54 @@
+# Generated by Django 4.2.7 on 2026-10-18 09:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0002_remove_timeslot_is_available_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DoctorDailyAvailability',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('doctor_id', models.IntegerField(help_text='ID của bác sĩ trong user-service')),
+                ('date', models.DateField(help_text='Ngày khám')),
+                ('total_slots', models.IntegerField(default=0, help_text='Tổng số khung giờ đang hoạt động')),
+                ('free_slots', models.IntegerField(default=0, help_text='Số khung giờ còn trống')),
+                ('first_free_time', models.TimeField(blank=True, help_text='Giờ bắt đầu của khung giờ trống đầu tiên', null=True)),
+                ('last_free_time', models.TimeField(blank=True, help_text='Giờ bắt đầu của khung giờ trống cuối cùng', null=True)),
+                ('free_slot_bitmap', models.CharField(blank=True, default='', help_text="Bitmap các khoảng thời gian còn trống ('1' = trống)", max_length=96)),
+                ('departments', models.CharField(blank=True, default='', help_text='Các khoa có khung giờ trống (phân tách bằng dấu phẩy)', max_length=255)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Doctor Daily Availability',
+                'verbose_name_plural': 'Doctor Daily Availabilities',
+                'ordering': ['date', 'doctor_id'],
+                'unique_together': {('doctor_id', 'date')},
+            },
+        ),
+        migrations.AddIndex(
+            model_name='doctordailyavailability',
+            index=models.Index(fields=['date', 'free_slots'], name='daily_avail_date_free_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='timeslot',
+            index=models.Index(fields=['status', 'is_active', 'date', 'start_time'], name='timeslot_status_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='timeslot',
+            index=models.Index(fields=['doctor_id', 'status', 'date'], name='timeslot_doctor_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='timeslot',
+            index=models.Index(fields=['department', 'date'], name='timeslot_department_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='timeslot',
+            index=models.Index(fields=['location', 'date'], name='timeslot_location_date_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0003_timeslot_indexes_doctordailyavailability'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AppointmentOutbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('effect', models.CharField(choices=[('CREATE_REMINDERS', 'Tạo nhắc nhở'), ('CREATE_BILLING', 'Tạo hóa đơn')], max_length=30)),
+                ('payload', models.JSONField(blank=True, default=dict)),
+                ('status', models.CharField(choices=[('PENDING', 'Chờ xử lý'), ('DONE', 'Đã xử lý'), ('FAILED', 'Xử lý thất bại')], default='PENDING', max_length=10)),
+                ('attempts', models.IntegerField(default=0)),
+                ('last_error', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+                ('appointment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='outbox_entries', to='appointments.appointment')),
+            ],
+            options={
+                'verbose_name': 'Appointment Outbox',
+                'verbose_name_plural': 'Appointment Outbox',
+                'ordering': ['created_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='appointmentoutbox',
+            index=models.Index(fields=['status', 'created_at'], name='appt_outbox_status_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-18 23:10
+
+from django.db import migrations
+
+
+def backfill_daily_availability(apps, schema_editor):
+    from appointments.availability_index import rebuild_daily_availability
+
+    rebuild_daily_availability(
+        slot_model=apps.get_model('appointments', 'TimeSlot'),
+        summary_model=apps.get_model('appointments', 'DoctorDailyAvailability'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0004_appointmentoutbox'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_daily_availability, migrations.RunPython.noop),
+    ]
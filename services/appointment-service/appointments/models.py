@@ -109,6 +109,15 @@ class TimeSlot(models.Model):
         verbose_name_plural = "Time Slots"
         unique_together = ['doctor_id', 'date', 'start_time', 'end_time']
         ordering = ['date', 'start_time']
+        indexes = [
+            # Tìm khung giờ trống theo ngày/giờ (available, available_doctors)
+            models.Index(fields=['status', 'is_active', 'date', 'start_time'], name='timeslot_status_date_idx'),
+            # Lọc theo bác sĩ và trạng thái trong khoảng ngày
+            models.Index(fields=['doctor_id', 'status', 'date'], name='timeslot_doctor_status_idx'),
+            # Lọc theo khoa/địa điểm trong khoảng ngày
+            models.Index(fields=['department', 'date'], name='timeslot_department_date_idx'),
+            models.Index(fields=['location', 'date'], name='timeslot_location_date_idx'),
+        ]
 
     def has_capacity(self):
         """Kiểm tra xem khung giờ còn chỗ cho bệnh nhân hay không"""
@@ -129,79 +138,84 @@ class TimeSlot(models.Model):
         self.save(update_fields=['current_patients', 'status'])
 
     def add_patient(self):
-        """Thêm một bệnh nhân vào khung giờ và cập nhật trạng thái"""
+        """
+        Thêm một bệnh nhân vào khung giờ và cập nhật trạng thái.
+
+        Kiểm tra sức chứa và tăng bộ đếm trong một câu lệnh UPDATE có điều kiện
+        (current_patients < max_patients), không cần khóa row bằng select_for_update.
+        """
         from .exceptions import TimeSlotUnavailableException, TimeSlotCapacityExceededException
-        from django.db import transaction
+        from .availability_index import refresh_for_slots
+        from django.db.models import F, Case, When, Value
         import logging
 
         logger = logging.getLogger(__name__)
 
-        # Sử dụng transaction và select_for_update để tránh race condition
-        with transaction.atomic():
-            # Khóa row này cho đến khi transaction hoàn thành
-            time_slot = TimeSlot.objects.select_for_update().get(pk=self.id)
-
-            # Kiểm tra lại sau khi đã khóa row
-            if time_slot.current_patients >= time_slot.max_patients:
-                time_slot.status = 'BOOKED'
-                time_slot.save(update_fields=['status'])
-                raise TimeSlotCapacityExceededException(f"Khung giờ {self.id} đã đạt số lượng bệnh nhân tối đa ({self.max_patients})")
-
-            if time_slot.status != 'AVAILABLE' or not time_slot.is_active:
-                logger.warning(f"Trying to add patient to unavailable time slot {self.id} with status {time_slot.status}")
-                raise TimeSlotUnavailableException(f"Khung giờ {self.id} không khả dụng")
+        updated = TimeSlot.objects.filter(
+            pk=self.id,
+            status='AVAILABLE',
+            is_active=True,
+            current_patients__lt=F('max_patients')
+        ).update(
+            current_patients=F('current_patients') + 1,
+            # Các biểu thức trong SET dùng giá trị trước khi cập nhật
+            status=Case(
+                When(current_patients__gte=F('max_patients') - 1, then=Value('BOOKED')),
+                default=F('status')
+            ),
+            updated_at=timezone.now()
+        )
 
-            # Cập nhật số lượng bệnh nhân
-            time_slot.current_patients += 1
+        if not updated:
+            time_slot = TimeSlot.objects.get(pk=self.id)
 
-            # Cập nhật trạng thái
             if time_slot.current_patients >= time_slot.max_patients:
-                time_slot.status = 'BOOKED'
+                if time_slot.status == 'AVAILABLE':
+                    TimeSlot.objects.filter(pk=self.id, status='AVAILABLE').update(status='BOOKED')
+                raise TimeSlotCapacityExceededException(f"Khung giờ {self.id} đã đạt số lượng bệnh nhân tối đa ({time_slot.max_patients})")
 
-            time_slot.save(update_fields=['current_patients', 'status'])
+            logger.warning(f"Trying to add patient to unavailable time slot {self.id} with status {time_slot.status}")
+            raise TimeSlotUnavailableException(f"Khung giờ {self.id} không khả dụng")
 
-            # Cập nhật object hiện tại để phản ánh thay đổi
-            self.current_patients = time_slot.current_patients
-            self.status = time_slot.status
+        # Cập nhật object hiện tại để phản ánh thay đổi
+        self.refresh_from_db(fields=['current_patients', 'status', 'updated_at'])
+
+        # UPDATE không phát signal, cập nhật chỉ mục lịch trống trực tiếp
+        refresh_for_slots([self])
 
         return True
 
     def remove_patient(self):
-        """Xóa một bệnh nhân khỏi khung giờ và cập nhật trạng thái"""
-        from django.db import transaction
+        """
+        Xóa một bệnh nhân khỏi khung giờ và cập nhật trạng thái.
+
+        Giảm bộ đếm bằng một câu lệnh UPDATE nguyên tử, không để current_patients âm.
+        """
+        from .availability_index import refresh_for_slots
+        from django.db.models import F, Case, When, Value
+        from django.db.models.functions import Greatest
         import logging
 
         logger = logging.getLogger(__name__)
 
-        # Sử dụng transaction và select_for_update để tránh race condition
-        with transaction.atomic():
-            time_slot = TimeSlot.objects.select_for_update().get(pk=self.id)
-
-            if time_slot.current_patients <= 0:
-                # Thay vì ném ngoại lệ, chỉ ghi log và đảm bảo khung giờ được đánh dấu là khả dụng
-                logger.warning(f"Trying to remove patient from time slot {self.id} with current_patients={time_slot.current_patients}")
-                time_slot.current_patients = 0
-                time_slot.status = 'AVAILABLE'
-                time_slot.save(update_fields=['current_patients', 'status'])
-
-                # Cập nhật object hiện tại để phản ánh thay đổi
-                self.current_patients = time_slot.current_patients
-                self.status = time_slot.status
-
-                return True
-
-            # Giảm số lượng bệnh nhân
-            time_slot.current_patients -= 1
-
-            # Cập nhật trạng thái dựa trên số lượng bệnh nhân mới
-            if time_slot.current_patients < time_slot.max_patients:
-                time_slot.status = 'AVAILABLE'
+        if self.current_patients <= 0:
+            logger.warning(f"Trying to remove patient from time slot {self.id} with current_patients={self.current_patients}")
+
+        TimeSlot.objects.filter(pk=self.id).update(
+            current_patients=Greatest(F('current_patients') - 1, Value(0)),
+            # Sau khi giảm, khung giờ còn chỗ nếu số bệnh nhân cũ <= max_patients
+            status=Case(
+                When(current_patients__lte=F('max_patients'), then=Value('AVAILABLE')),
+                default=F('status')
+            ),
+            updated_at=timezone.now()
+        )
 
-            time_slot.save(update_fields=['current_patients', 'status'])
+        # Cập nhật object hiện tại để phản ánh thay đổi
+        self.refresh_from_db(fields=['current_patients', 'status', 'updated_at'])
 
-            # Cập nhật object hiện tại để phản ánh thay đổi
-            self.current_patients = time_slot.current_patients
-            self.status = time_slot.status
+        # UPDATE không phát signal, cập nhật chỉ mục lịch trống trực tiếp
+        refresh_for_slots([self])
 
         return True
 
@@ -220,6 +234,44 @@ class TimeSlot(models.Model):
         super().save(*args, **kwargs)
 
 
+class DoctorDailyAvailability(models.Model):
+    """
+    Chỉ mục lịch trống theo bác sĩ và ngày.
+
+    Được cập nhật mỗi khi khung giờ thay đổi (xem appointments.availability_index),
+    giúp các API tìm kiếm không phải quét toàn bộ bảng TimeSlot.
+    """
+    # Mỗi ký tự trong bitmap ứng với một khoảng BITMAP_GRANULARITY phút trong ngày
+    BITMAP_GRANULARITY = 15
+    BITMAP_LENGTH = 24 * 60 // BITMAP_GRANULARITY
+
+    doctor_id = models.IntegerField(help_text="ID của bác sĩ trong user-service")
+    date = models.DateField(help_text="Ngày khám")
+    total_slots = models.IntegerField(default=0, help_text="Tổng số khung giờ đang hoạt động")
+    free_slots = models.IntegerField(default=0, help_text="Số khung giờ còn trống")
+    first_free_time = models.TimeField(null=True, blank=True, help_text="Giờ bắt đầu của khung giờ trống đầu tiên")
+    last_free_time = models.TimeField(null=True, blank=True, help_text="Giờ bắt đầu của khung giờ trống cuối cùng")
+    free_slot_bitmap = models.CharField(max_length=BITMAP_LENGTH, default='', blank=True, help_text="Bitmap các khoảng thời gian còn trống ('1' = trống)")
+    departments = models.CharField(max_length=255, default='', blank=True, help_text="Các khoa có khung giờ trống (phân tách bằng dấu phẩy)")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Dr. {self.doctor_id} - {self.date}: {self.free_slots}/{self.total_slots} khung giờ trống"
+
+    @property
+    def department_list(self):
+        return [department for department in self.departments.split(',') if department]
+
+    class Meta:
+        verbose_name = "Doctor Daily Availability"
+        verbose_name_plural = "Doctor Daily Availabilities"
+        unique_together = ['doctor_id', 'date']
+        ordering = ['date', 'doctor_id']
+        indexes = [
+            models.Index(fields=['date', 'free_slots'], name='daily_avail_date_free_idx'),
+        ]
+
+
 class AppointmentReason(models.Model):
     """Phân loại lý do khám"""
     name = models.CharField(max_length=100, help_text="Tên lý do khám")
@@ -465,6 +517,43 @@ class AppointmentReminder(models.Model):
         ordering = ['scheduled_time']
 
 
+class AppointmentOutbox(models.Model):
+    """
+    Hàng đợi các tác vụ phụ của lịch hẹn (nhắc nhở, hóa đơn) được ghi cùng transaction
+    với lịch hẹn và chỉ được xử lý sau khi transaction commit.
+    """
+    EFFECT_CHOICES = [
+        ('CREATE_REMINDERS', 'Tạo nhắc nhở'),
+        ('CREATE_BILLING', 'Tạo hóa đơn'),
+    ]
+
+    STATUS_CHOICES = [
+        ('PENDING', 'Chờ xử lý'),
+        ('DONE', 'Đã xử lý'),
+        ('FAILED', 'Xử lý thất bại'),
+    ]
+
+    appointment = models.ForeignKey(Appointment, on_delete=models.CASCADE, related_name='outbox_entries')
+    effect = models.CharField(max_length=30, choices=EFFECT_CHOICES)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
+    attempts = models.IntegerField(default=0)
+    last_error = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.get_effect_display()} cho appointment {self.appointment_id} - {self.get_status_display()}"
+
+    class Meta:
+        verbose_name = "Appointment Outbox"
+        verbose_name_plural = "Appointment Outbox"
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='appt_outbox_status_idx'),
+        ]
+
+
 class PatientVisit(models.Model):
     """Thông tin chi tiết về lần khám bệnh"""
     VISIT_STATUS_CHOICES = [
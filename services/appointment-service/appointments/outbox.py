@@ -0,0 +1,141 @@
+"""
+Outbox cho các tác vụ phụ của lịch hẹn.
+
+Các tác vụ chậm (tạo nhắc nhở, gọi billing-service) được ghi vào bảng AppointmentOutbox
+trong cùng transaction với lịch hẹn, sau đó được xử lý khi transaction đã commit, để
+transaction đặt lịch không phải chờ các lời gọi mạng. Các mục xử lý thất bại được chạy
+lại bằng lệnh `python manage.py process_appointment_outbox`.
+"""
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Appointment, AppointmentOutbox
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = getattr(settings, 'APPOINTMENT_OUTBOX_MAX_ATTEMPTS', 5)
+
+
+def enqueue(appointment, effect, payload=None):
+    """
+    Ghi một tác vụ phụ vào outbox; tác vụ sẽ được xử lý sau khi transaction hiện tại commit.
+    """
+    entry = AppointmentOutbox.objects.create(
+        appointment=appointment,
+        effect=effect,
+        payload=payload or {}
+    )
+    transaction.on_commit(lambda: process_entries([entry.id]))
+    return entry
+
+
+def _create_reminders(appointment, payload):
+    from .serializers import AppointmentCreateSerializer
+
+    AppointmentCreateSerializer()._create_appointment_reminders(appointment, appointment.time_slot)
+
+
+def _create_billing(appointment, payload):
+    # Tự động tạo hóa đơn qua billing-service chỉ khi được bật trong settings
+    if not getattr(settings, 'APPOINTMENT_AUTO_BILLING', False):
+        return
+
+    from .integrations import create_appointment_billing
+
+    # Chạy nền sau commit, không có token người dùng: xác thực bằng API key của appointment-service
+    result = create_appointment_billing(appointment, service_auth=True)
+    if not result:
+        raise RuntimeError("Billing service did not return a billing record")
+
+    if result.get('id'):
+        Appointment.objects.filter(pk=appointment.pk).update(billing_id=result.get('id'))
+
+
+EFFECT_HANDLERS = {
+    'CREATE_REMINDERS': _create_reminders,
+    'CREATE_BILLING': _create_billing,
+}
+
+
+def process_entry(entry):
+    """
+    Xử lý một mục trong outbox
+
+    Returns:
+    - bool: True nếu xử lý thành công
+    """
+    handler = EFFECT_HANDLERS.get(entry.effect)
+    entry.attempts += 1
+
+    try:
+        if handler is None:
+            raise ValueError(f"Unsupported outbox effect: {entry.effect}")
+
+        # Savepoint: một lỗi DB trong handler không làm hỏng transaction đang giữ khóa mục outbox
+        with transaction.atomic():
+            appointment = Appointment.objects.select_related('time_slot').get(pk=entry.appointment_id)
+            handler(appointment, entry.payload or {})
+
+        entry.status = 'DONE'
+        entry.processed_at = timezone.now()
+        entry.last_error = None
+        entry.save(update_fields=['status', 'attempts', 'processed_at', 'last_error'])
+        return True
+    except Exception as e:
+        logger.error(f"Error processing outbox entry {entry.id} ({entry.effect}) for appointment {entry.appointment_id}: {str(e)}")
+        entry.status = 'FAILED' if entry.attempts >= MAX_ATTEMPTS else 'PENDING'
+        entry.last_error = str(e)
+        entry.save(update_fields=['status', 'attempts', 'last_error'])
+        return False
+
+
+def _process_locked(entry_id):
+    """
+    Khóa và xử lý một mục outbox trong transaction riêng.
+
+    Mục đang được tiến trình khác xử lý (đã bị khóa) hoặc không còn PENDING sẽ được bỏ qua,
+    nên đường xử lý sau commit và process_pending không chạy trùng một mục.
+
+    Returns:
+    - bool hoặc None: kết quả xử lý, None nếu mục bị bỏ qua
+    """
+    with transaction.atomic():
+        entry = (
+            AppointmentOutbox.objects.select_for_update(skip_locked=True)
+            .filter(id=entry_id, status='PENDING')
+            .first()
+        )
+        if entry is None:
+            return None
+        return process_entry(entry)
+
+
+def process_entries(entry_ids):
+    """Xử lý các mục outbox theo ID (gọi sau khi transaction commit)"""
+    processed = 0
+    for entry_id in entry_ids:
+        if _process_locked(entry_id):
+            processed += 1
+    return processed
+
+
+def process_pending(limit=100):
+    """Xử lý lại các mục outbox còn chờ (ví dụ sau khi billing-service khôi phục)"""
+    entry_ids = list(
+        AppointmentOutbox.objects.filter(status='PENDING')
+        .order_by('created_at')
+        .values_list('id', flat=True)[:limit]
+    )
+    processed = 0
+    seen = 0
+    for entry_id in entry_ids:
+        result = _process_locked(entry_id)
+        if result is None:
+            continue
+        seen += 1
+        if result:
+            processed += 1
+    return processed, seen
@@ -0,0 +1,217 @@
+"""
+Sinh khung giờ hàng loạt cho lịch làm việc của một hoặc nhiều bác sĩ.
+
+Toàn bộ khung giờ hiện có trong khoảng ngày được đọc bằng một truy vấn, xung đột
+được kiểm tra trong bộ nhớ và các khung giờ mới được ghi bằng một lệnh bulk_create.
+"""
+import logging
+from bisect import bisect_right
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from django.db import transaction
+
+from .models import TimeSlot
+from .availability_index import refresh_for_slots
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+def _parse_time(value):
+    """Chuyển chuỗi HH:MM (hoặc HH:MM:SS) thành đối tượng time"""
+    if isinstance(value, str):
+        fmt = '%H:%M:%S' if value.count(':') == 2 else '%H:%M'
+        return datetime.strptime(value, fmt).time()
+    return value
+
+
+def _to_minutes(value):
+    return value.hour * 60 + value.minute
+
+
+def _format_minutes(minutes):
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+class IntervalSet:
+    """
+    Tập các khoảng thời gian [start, end) (tính bằng phút) được gộp lại thành các
+    khoảng rời nhau và sắp xếp, cho phép kiểm tra giao nhau bằng tìm kiếm nhị phân.
+    """
+
+    def __init__(self):
+        self.starts = []
+        self.ends = []
+
+    def find_overlap(self, start, end):
+        """Trả về khoảng (start, end) đầu tiên giao với [start, end), hoặc None"""
+        index = bisect_right(self.starts, start) - 1
+        if index >= 0 and self.ends[index] > start:
+            return self.starts[index], self.ends[index]
+        if index + 1 < len(self.starts) and self.starts[index + 1] < end:
+            return self.starts[index + 1], self.ends[index + 1]
+        return None
+
+    def add(self, start, end):
+        """Thêm khoảng [start, end), gộp với các khoảng giao hoặc liền kề"""
+        left = bisect_right(self.ends, start - 1)
+        right = bisect_right(self.starts, end)
+        if left < right:
+            start = min(start, self.starts[left])
+            end = max(end, self.ends[right - 1])
+        self.starts[left:right] = [start]
+        self.ends[left:right] = [end]
+
+
+class ScheduleSlotGenerator:
+    """
+    Bộ sinh khung giờ cho nhiều bác sĩ trong một khoảng ngày.
+
+    Sử dụng:
+        generator = ScheduleSlotGenerator(doctor_ids, start_date, end_date)
+        generator.plan_weekly(doctor_id, weekdays, start_time, end_time, slot_duration, availability=...)
+        created = generator.save()
+    """
+
+    def __init__(self, doctor_ids, start_date, end_date, exclude_availability_ids=None):
+        self.start_date = start_date
+        self.end_date = end_date
+        self.exclude_availability_ids = set(exclude_availability_ids or [])
+        self.pending_slots = []
+        self.conflicts = []
+        self.existing_count = 0
+
+        # Khoảng thời gian đang bận theo (doctor_id, date)
+        self._busy = defaultdict(IntervalSet)
+        # Khóa (doctor_id, date, start, end) đã tồn tại (kể cả khung giờ không hoạt động)
+        self._existing_keys = set()
+
+        self._load_existing_slots({int(doctor_id) for doctor_id in doctor_ids})
+
+    def _load_existing_slots(self, doctor_ids):
+        """Đọc tất cả khung giờ của các bác sĩ trong khoảng ngày bằng một truy vấn"""
+        if not doctor_ids:
+            return
+
+        rows = TimeSlot.objects.filter(
+            doctor_id__in=doctor_ids,
+            date__gte=self.start_date,
+            date__lte=self.end_date
+        ).values_list('doctor_id', 'date', 'start_time', 'end_time', 'is_active', 'availability_id')
+
+        for doctor_id, date, start_time, end_time, is_active, availability_id in rows:
+            start_minutes, end_minutes = _to_minutes(start_time), _to_minutes(end_time)
+            self._existing_keys.add((doctor_id, date, start_minutes, end_minutes))
+            if is_active and availability_id not in self.exclude_availability_ids:
+                self._busy[(doctor_id, date)].add(start_minutes, end_minutes)
+
+    def find_conflict(self, doctor_id, date, start_time, end_time):
+        """
+        Kiểm tra xung đột thời gian cho một ngày
+
+        Returns:
+        - str hoặc None: Thông báo xung đột nếu có
+        """
+        start_minutes, end_minutes = _to_minutes(_parse_time(start_time)), _to_minutes(_parse_time(end_time))
+        if start_minutes >= end_minutes:
+            return "Thời gian bắt đầu phải trước thời gian kết thúc"
+
+        overlap = self._busy[(int(doctor_id), date)].find_overlap(start_minutes, end_minutes)
+        if overlap:
+            return f"Xung đột với khung giờ {_format_minutes(overlap[0])} - {_format_minutes(overlap[1])}"
+        return None
+
+    def plan_day(self, doctor_id, date, start_time, end_time, slot_duration, availability=None,
+                 location=None, department=None, room=None, max_patients=1, source_type=None):
+        """
+        Lên danh sách khung giờ cho một ngày. Ngày có xung đột sẽ bị bỏ qua và ghi vào self.conflicts.
+
+        Returns:
+        - list: Các TimeSlot (chưa lưu) được thêm vào hàng đợi
+        """
+        doctor_id = int(doctor_id)
+        slot_duration = int(slot_duration)
+        conflict = self.find_conflict(doctor_id, date, start_time, end_time)
+        if conflict:
+            self.conflicts.append({'doctor_id': doctor_id, 'date': date, 'message': conflict})
+            return []
+
+        if source_type is None:
+            source_type = 'REGULAR' if availability and availability.schedule_type == 'REGULAR' else 'TEMPORARY'
+
+        start_minutes = _to_minutes(_parse_time(start_time))
+        end_minutes = _to_minutes(_parse_time(end_time))
+        busy = self._busy[(doctor_id, date)]
+
+        planned = []
+        current_minutes = start_minutes
+        while current_minutes + slot_duration <= end_minutes:
+            slot_start, slot_end = current_minutes, current_minutes + slot_duration
+            current_minutes = slot_end
+
+            if (doctor_id, date, slot_start, slot_end) in self._existing_keys:
+                self.existing_count += 1
+                continue
+
+            self._existing_keys.add((doctor_id, date, slot_start, slot_end))
+            planned.append(TimeSlot(
+                doctor_id=doctor_id,
+                date=date,
+                start_time=_format_minutes(slot_start),
+                end_time=_format_minutes(slot_end),
+                status='AVAILABLE',
+                is_active=True,
+                source_type=source_type,
+                availability=availability,
+                location=location,
+                department=department,
+                room=room,
+                duration=slot_duration,
+                max_patients=max_patients,
+                current_patients=0
+            ))
+
+        # Đánh dấu khoảng thời gian đã được lên lịch để các lịch sau trong cùng lần chạy thấy xung đột
+        busy.add(start_minutes, end_minutes)
+        self.pending_slots.extend(planned)
+        return planned
+
+    def plan_weekly(self, doctor_id, weekdays, start_time, end_time, slot_duration, **slot_fields):
+        """
+        Lên danh sách khung giờ cho các ngày trong tuần thuộc khoảng [start_date, end_date]
+
+        Parameters:
+        - weekdays: Danh sách ngày trong tuần (0-6, 0 là thứ 2)
+        - slot_fields: Các tham số khác truyền cho plan_day (availability, location, ...)
+        """
+        weekdays = {int(weekday) for weekday in weekdays}
+        planned = []
+        current_date = self.start_date
+        while current_date <= self.end_date:
+            if current_date.weekday() in weekdays:
+                planned.extend(self.plan_day(doctor_id, current_date, start_time, end_time, slot_duration, **slot_fields))
+            current_date += timedelta(days=1)
+        return planned
+
+    def save(self, batch_size=DEFAULT_BATCH_SIZE):
+        """
+        Ghi tất cả khung giờ đã lên lịch bằng bulk_create theo từng lô và cập nhật chỉ mục lịch trống
+
+        Returns:
+        - list: Các TimeSlot đã được tạo
+        """
+        if not self.pending_slots:
+            return []
+
+        with transaction.atomic():
+            created = TimeSlot.objects.bulk_create(self.pending_slots, batch_size=batch_size)
+            refresh_for_slots(created)
+
+        logger.info(
+            f"Generated {len(created)} time slots "
+            f"({self.existing_count} already existed, {len(self.conflicts)} conflicting days skipped)"
+        )
+        self.pending_slots = []
+        return created
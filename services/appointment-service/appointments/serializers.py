@@ -5,7 +5,8 @@ from .models import (
     Appointment,
     AppointmentReminder,
     AppointmentReason,
-    PatientVisit
+    PatientVisit,
+    DoctorDailyAvailability
 )
 
 
@@ -25,12 +26,42 @@ class DoctorAvailabilitySerializer(serializers.ModelSerializer):
         read_only_fields = ['created_at', 'updated_at']
 
 
+class TimeSlotListSerializer(serializers.ListSerializer):
+    """
+    List serializer cho TimeSlot: lấy thông tin tất cả bác sĩ một lần trước khi
+    serialize từng khung giờ, tránh mỗi khung giờ gọi riêng một request đến user-service
+    """
+
+    def to_representation(self, data):
+        from django.db import models
+        from .integrations import get_doctors_info_map
+
+        iterable = data.all() if isinstance(data, models.manager.BaseManager) else data
+        slots = list(iterable)
+
+        # Lấy token từ request nếu có
+        request = self.context.get('request')
+        token = getattr(request, 'auth', None) if request else None
+
+        doctor_ids = {slot.doctor_id for slot in slots}
+        try:
+            self.context['doctor_info_map'] = get_doctors_info_map(doctor_ids, token)
+        except Exception as e:
+            import logging
+            logger = logging.getLogger(__name__)
+            logger.error(f"Error prefetching doctor info for {len(doctor_ids)} doctors: {str(e)}")
+
+        return super().to_representation(slots)
+
+
 class TimeSlotSerializer(serializers.ModelSerializer):
     availability_id = serializers.PrimaryKeyRelatedField(source='availability', read_only=True)
     doctor_info = serializers.SerializerMethodField()
     status_name = serializers.CharField(source='get_status_display', read_only=True)
     source_type_name = serializers.CharField(source='get_source_type_display', read_only=True)
 
+    DOCTOR_INFO_EXTRA_FIELDS = ['specialty', 'department', 'profile_image', 'email', 'phone', 'gender', 'rating']
+
     class Meta:
         model = TimeSlot
         fields = [
@@ -40,22 +71,28 @@ class TimeSlotSerializer(serializers.ModelSerializer):
             'max_patients', 'current_patients', 'created_at', 'updated_at'
         ]
         read_only_fields = ['created_at', 'updated_at', 'current_patients', 'doctor_info', 'status_name', 'source_type_name']
+        list_serializer_class = TimeSlotListSerializer
 
     def get_doctor_info(self, obj):
         """
         Lấy thông tin chi tiết về bác sĩ từ user-service
         """
         try:
-            from .integrations import get_doctor_info
-
-            # Lấy token từ request nếu có
-            request = self.context.get('request')
-            token = None
-            if request and hasattr(request, 'auth'):
-                token = request.auth
-
-            # Lấy thông tin bác sĩ
-            doctor_info = get_doctor_info(obj.doctor_id, token)
+            # Ưu tiên thông tin đã được TimeSlotListSerializer lấy sẵn cho cả danh sách
+            doctor_info_map = self.context.get('doctor_info_map')
+            if doctor_info_map is not None:
+                doctor_info = doctor_info_map.get(obj.doctor_id)
+            else:
+                from .integrations import get_doctor_info
+
+                # Lấy token từ request nếu có
+                request = self.context.get('request')
+                token = None
+                if request and hasattr(request, 'auth'):
+                    token = request.auth
+
+                # Lấy thông tin bác sĩ
+                doctor_info = get_doctor_info(obj.doctor_id, token)
 
             # Nếu doctor_info có trường 'name', sử dụng trực tiếp
             if doctor_info and 'name' in doctor_info:
@@ -65,7 +102,7 @@ class TimeSlotSerializer(serializers.ModelSerializer):
                 }
 
                 # Thêm các trường bổ sung nếu có
-                for field in ['specialty', 'department', 'profile_image', 'email', 'phone', 'gender', 'rating']:
+                for field in self.DOCTOR_INFO_EXTRA_FIELDS:
                     if field in doctor_info:
                         result[field] = doctor_info.get(field)
 
@@ -80,7 +117,7 @@ class TimeSlotSerializer(serializers.ModelSerializer):
                 }
 
                 # Thêm các trường bổ sung nếu có
-                for field in ['specialty', 'department', 'profile_image', 'email', 'phone', 'gender', 'rating']:
+                for field in self.DOCTOR_INFO_EXTRA_FIELDS:
                     if field in doctor_info:
                         result[field] = doctor_info.get(field)
 
@@ -100,6 +137,18 @@ class TimeSlotSerializer(serializers.ModelSerializer):
         }
 
 
+class DoctorDailyAvailabilitySerializer(serializers.ModelSerializer):
+    departments = serializers.ListField(source='department_list', read_only=True)
+
+    class Meta:
+        model = DoctorDailyAvailability
+        fields = [
+            'doctor_id', 'date', 'total_slots', 'free_slots', 'first_free_time', 'last_free_time',
+            'free_slot_bitmap', 'departments', 'updated_at'
+        ]
+        read_only_fields = fields
+
+
 class AppointmentReasonSerializer(serializers.ModelSerializer):
     class Meta:
         model = AppointmentReason
@@ -308,6 +357,7 @@ class AppointmentCreateSerializer(serializers.ModelSerializer):
         from django.db import transaction
         import logging
         from .exceptions import TimeSlotUnavailableException, TimeSlotCapacityExceededException
+        from . import outbox
 
         logger = logging.getLogger(__name__)
 
@@ -342,14 +392,14 @@ class AppointmentCreateSerializer(serializers.ModelSerializer):
                     logger.error(f"Error auto-confirming appointment: {str(e)}")
                     # Tiếp tục xử lý ngay cả khi không thể chuyển trạng thái
 
-                # Tạo các nhắc nhở cho lịch hẹn
-                self._create_appointment_reminders(appointment, time_slot)
+                # Tạo các nhắc nhở cho lịch hẹn (xử lý sau khi transaction commit)
+                outbox.enqueue(appointment, 'CREATE_REMINDERS')
 
                 # Xử lý lịch hẹn định kỳ
                 if validated_data.get('is_recurring') and validated_data.get('recurrence_pattern'):
                     self._create_recurring_appointments(appointment)
 
-                # Tạo hóa đơn cho lịch hẹn
+                # Tạo hóa đơn cho lịch hẹn (xử lý sau khi transaction commit)
                 self._create_appointment_billing(appointment)
 
                 return appointment
@@ -400,6 +450,11 @@ class AppointmentCreateSerializer(serializers.ModelSerializer):
             {'hours': 1, 'type': 'SMS', 'message_template': 'Nhắc nhở gấp: Bạn có lịch hẹn khám bệnh với {doctor_name} trong vòng 1 giờ nữa {location}. Vui lòng đến sớm 15 phút để chuẩn bị.'},
         ])
 
+        # Nhắc nhở đã tạo trước đó (mục outbox được chạy lại sau khi lỗi giữa chừng)
+        existing = set(
+            AppointmentReminder.objects.filter(appointment=appointment).values_list('reminder_type', 'scheduled_time')
+        )
+
         # Tạo các nhắc nhở theo cấu hình
         reminders = []
         for config in reminder_configs:
@@ -409,6 +464,8 @@ class AppointmentCreateSerializer(serializers.ModelSerializer):
 
             # Tính thởi gian nhắc nhở
             reminder_time = appointment_time - datetime.timedelta(hours=hours)
+            if (reminder_type, reminder_time) in existing:
+                continue
 
             # Định dạng tin nhắn với tham số động
             message = message_template.format(
@@ -440,6 +497,7 @@ class AppointmentCreateSerializer(serializers.ModelSerializer):
         from django.utils import timezone
         import datetime
         import logging
+        from . import outbox
 
         logger = logging.getLogger(__name__)
 
@@ -545,8 +603,8 @@ class AppointmentCreateSerializer(serializers.ModelSerializer):
                     notes=f"Lịch hẹn tái khám tự động tạo từ lịch hẹn #{parent_appointment.id}"
                 )
 
-                # Tạo các nhắc nhở cho lịch hẹn tái khám
-                self._create_appointment_reminders(recurring_appointment, recurring_time_slot)
+                # Tạo các nhắc nhở cho lịch hẹn tái khám (xử lý sau khi transaction commit)
+                outbox.enqueue(recurring_appointment, 'CREATE_REMINDERS')
 
                 recurring_appointments.append(recurring_appointment)
             except Exception as e:
@@ -556,6 +614,11 @@ class AppointmentCreateSerializer(serializers.ModelSerializer):
         return recurring_appointments
 
     def _create_appointment_billing(self, appointment):
-        """Tạo hóa đơn cho lịch hẹn"""
-        # Tạm thời bỏ qua, sẽ được triển khai khi tích hợp với billing-service
-        pass
+        """
+        Tạo hóa đơn cho lịch hẹn qua outbox, chỉ khi APPOINTMENT_AUTO_BILLING được bật.
+        """
+        from django.conf import settings
+        from . import outbox
+
+        if getattr(settings, 'APPOINTMENT_AUTO_BILLING', False):
+            outbox.enqueue(appointment, 'CREATE_BILLING')
@@ -1,9 +1,10 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.utils import timezone
 from datetime import datetime, timedelta
 
 from .models import DoctorAvailability, TimeSlot, Appointment, AppointmentReminder
+from .availability_index import refresh_for_slots
 
 # Import module redis_notifications từ common-auth
 try:
@@ -15,6 +16,16 @@ except ImportError:
         return True
 
 
+@receiver(post_save, sender=TimeSlot)
+@receiver(post_delete, sender=TimeSlot)
+def update_availability_index(sender, instance, **kwargs):
+    """
+    Cập nhật chỉ mục lịch trống khi khung giờ thay đổi (bao gồm add_patient/remove_patient).
+    Các thao tác bulk_create/update không phát signal nên được cập nhật trực tiếp trong view.
+    """
+    refresh_for_slots([instance])
+
+
 @receiver(post_save, sender=Appointment)
 def create_appointment_reminder(sender, instance, created, **kwargs):
     """
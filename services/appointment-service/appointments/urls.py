@@ -1,6 +1,7 @@
 from django.urls import path, include
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from common_auth import register_health_check
 from .views import (
     DoctorAvailabilityViewSet,
     TimeSlotViewSet,
@@ -22,3 +23,6 @@ urlpatterns = [
     path('', include(router.urls)),
     path('appointment-reasons/', appointment_reasons_list, name='appointment-reasons-list'),
 ]
+
+# Register health check and metrics endpoints
+urlpatterns = register_health_check(urlpatterns)
@@ -3,11 +3,14 @@ from rest_framework.response import Response
 from rest_framework.decorators import action, api_view
 from django_filters.rest_framework import DjangoFilterBackend
 from django.utils import timezone
+from django.db import transaction
+from django.db.models import Count
 from datetime import datetime, timedelta
 from rest_framework.permissions import IsAuthenticated
-from .models import DoctorAvailability, TimeSlot, Appointment, PatientVisit, AppointmentReason
+from .models import DoctorAvailability, TimeSlot, Appointment, PatientVisit, AppointmentReason, DoctorDailyAvailability
 from .serializers import (
     DoctorAvailabilitySerializer,
+    DoctorDailyAvailabilitySerializer,
     TimeSlotSerializer,
     AppointmentSerializer,
     AppointmentCreateSerializer,
@@ -18,6 +21,8 @@ from .permissions import (
     CanViewAppointments, CanManageDoctorSchedule, IsAdmin
 )
 from .authentication import CustomJWTAuthentication
+from .availability_index import refresh_for_slots, schedule_refresh
+from .schedule_generator import ScheduleSlotGenerator
 from .integrations import get_doctors_by_specialty, get_doctors_by_department, get_doctors_info, get_doctor_info, get_specialties, get_departments
 import logging
 logger = logging.getLogger(__name__)
@@ -153,106 +158,80 @@ class DoctorAvailabilityViewSet(viewsets.ModelViewSet):
 
         try:
             if schedule_type == 'REGULAR':
-                # Tạo lịch làm việc hàng tuần
-                for weekday in weekdays:
-                    try:
-                        # Kiểm tra xung đột thởi gian
-                        if start_date:
-                            # Nếu có start_date, kiểm tra xung đột cho ngày đầu tiên
-                            current_date = datetime.strptime(start_date, '%Y-%m-%d').date()
-                            end_date_obj = datetime.strptime(end_date, '%Y-%m-%d').date() if end_date else current_date
-
-                            while current_date <= end_date_obj:
-                                if current_date.weekday() == weekday:
-                                    has_conflict, conflict_message = self._check_time_conflict(
-                                        doctor_id=doctor_id,
-                                        date=current_date,
-                                        start_time=start_time,
-                                        end_time=end_time
+                # Khoảng ngày cần tạo khung giờ
+                if start_date and end_date:
+                    range_start = datetime.strptime(start_date, '%Y-%m-%d').date()
+                    range_end = datetime.strptime(end_date, '%Y-%m-%d').date()
+                else:
+                    # Tạo khung giờ cho 4 tuần tới
+                    range_start = timezone.now().date()
+                    range_end = range_start + timedelta(days=28)
+
+                # Đọc toàn bộ khung giờ hiện có của bác sĩ trong khoảng ngày bằng một truy vấn
+                generator = ScheduleSlotGenerator([doctor_id], range_start, range_end)
+
+                # Kiểm tra xung đột thởi gian cho ngày đầu tiên của mỗi thứ trong tuần
+                if start_date:
+                    check_start = datetime.strptime(start_date, '%Y-%m-%d').date()
+                    check_end = datetime.strptime(end_date, '%Y-%m-%d').date() if end_date else check_start
+                    for weekday in weekdays:
+                        current_date = check_start
+                        while current_date <= check_end:
+                            if current_date.weekday() == int(weekday):
+                                conflict_message = generator.find_conflict(doctor_id, current_date, start_time, end_time)
+                                if conflict_message:
+                                    return Response(
+                                        {"error": f"Xung đột thởi gian cho ngày {current_date}: {conflict_message}"},
+                                        status=status.HTTP_400_BAD_REQUEST
                                     )
-                                    if has_conflict:
-                                        return Response(
-                                            {"error": f"Xung đột thởi gian cho ngày {current_date}: {conflict_message}"},
-                                            status=status.HTTP_400_BAD_REQUEST
-                                        )
-                                    break
-                                current_date += timedelta(days=1)
-
-                        # Tạo lịch mới
-                        schedule = DoctorAvailability.objects.create(
-                            doctor_id=doctor_id,
-                            weekday=weekday,
-                            start_time=start_time,
-                            end_time=end_time,
-                            schedule_type='REGULAR',
-                            is_available=True,
-                            is_active=True,
-                            recurring_pattern=recurring_pattern,
-                            start_date=start_date,
-                            end_date=end_date,
-                            location=request.data.get('location'),
-                            department=request.data.get('department'),
-                            room=request.data.get('room'),
-                            slot_duration=slot_duration,
-                            max_patients_per_slot=max_patients_per_slot,
-                            notes=request.data.get('notes')
-                        )
+                                break
+                            current_date += timedelta(days=1)
 
-                        created_schedules.append(schedule)
-
-                        # Tạo các khung giờ cho lịch làm việc này
-                        if start_date and end_date:
-                            # Tạo khung giờ cho khoảng thởi gian cụ thể
-                            start_date_obj = datetime.strptime(start_date, '%Y-%m-%d').date()
-                            end_date_obj = datetime.strptime(end_date, '%Y-%m-%d').date()
-
-                            current_date = start_date_obj
-                            while current_date <= end_date_obj:
-                                if current_date.weekday() == weekday:
-                                    # Tạo khung giờ cho ngày này
-                                    slots = self._create_time_slots_for_date(
-                                        doctor_id=doctor_id,
-                                        date=current_date,
-                                        start_time=start_time,
-                                        end_time=end_time,
-                                        slot_duration=slot_duration,
-                                        availability=schedule,
-                                        location=request.data.get('location'),
-                                        department=request.data.get('department'),
-                                        room=request.data.get('room'),
-                                        max_patients=max_patients_per_slot
-                                    )
-                                    created_time_slots.extend(slots)
-                                current_date += timedelta(days=1)
-                        else:
-                            # Tạo khung giờ cho 4 tuần tới
-                            start_date_obj = timezone.now().date()
-                            end_date_obj = start_date_obj + timedelta(days=28)
-
-                            current_date = start_date_obj
-                            while current_date <= end_date_obj:
-                                if current_date.weekday() == weekday:
-                                    # Tạo khung giờ cho ngày này
-                                    slots = self._create_time_slots_for_date(
-                                        doctor_id=doctor_id,
-                                        date=current_date,
-                                        start_time=start_time,
-                                        end_time=end_time,
-                                        slot_duration=slot_duration,
-                                        availability=schedule,
-                                        location=request.data.get('location'),
-                                        department=request.data.get('department'),
-                                        room=request.data.get('room'),
-                                        max_patients=max_patients_per_slot
-                                    )
-                                    created_time_slots.extend(slots)
-                                current_date += timedelta(days=1)
-                    except Exception as e:
-                        logger.error(f"Error creating schedule for weekday {weekday}: {str(e)}")
-                        return Response(
-                            {"error": f"Lỗi khi tạo lịch làm việc cho thứ {weekday + 1}: {str(e)}"},
-                            status=status.HTTP_500_INTERNAL_SERVER_ERROR
-                        )
+                # Tạo lịch làm việc hàng tuần
+                try:
+                    with transaction.atomic():
+                        for weekday in weekdays:
+                            schedule = DoctorAvailability.objects.create(
+                                doctor_id=doctor_id,
+                                weekday=weekday,
+                                start_time=start_time,
+                                end_time=end_time,
+                                schedule_type='REGULAR',
+                                is_available=True,
+                                is_active=True,
+                                recurring_pattern=recurring_pattern,
+                                start_date=start_date,
+                                end_date=end_date,
+                                location=request.data.get('location'),
+                                department=request.data.get('department'),
+                                room=request.data.get('room'),
+                                slot_duration=slot_duration,
+                                max_patients_per_slot=max_patients_per_slot,
+                                notes=request.data.get('notes')
+                            )
+                            created_schedules.append(schedule)
+
+                            # Lên danh sách khung giờ cho lịch làm việc này
+                            generator.plan_weekly(
+                                doctor_id, [weekday], start_time, end_time, slot_duration,
+                                availability=schedule,
+                                location=request.data.get('location'),
+                                department=request.data.get('department'),
+                                room=request.data.get('room'),
+                                max_patients=max_patients_per_slot
+                            )
+
+                        # Ghi tất cả khung giờ bằng một lệnh bulk_create
+                        created_time_slots.extend(generator.save())
+
+                    for conflict in generator.conflicts:
+                        logger.error(f"Time conflict for date {conflict['date']}: {conflict['message']}")
+                except Exception as e:
+                    logger.error(f"Error creating regular schedule: {str(e)}")
+                    return Response(
+                        {"error": f"Lỗi khi tạo lịch làm việc: {str(e)}"},
+                        status=status.HTTP_500_INTERNAL_SERVER_ERROR
+                    )
             elif schedule_type == 'TEMPORARY':
                 try:
                     # Chuyển đổi ngày thành đối tượng date
@@ -355,6 +334,7 @@ class DoctorAvailabilityViewSet(viewsets.ModelViewSet):
 
                     # Đánh dấu các khung giờ là không khả dụng
                     affected_slots.update(status='BLOCKED', is_active=False)
+                    schedule_refresh([(doctor_id, effective_date_obj)])
 
                     # Thêm thông tin về các lịch hẹn bị hủy vào response
                     if cancelled_appointments:
@@ -414,6 +394,119 @@ class DoctorAvailabilityViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+    @action(detail=False, methods=['post'])
+    def bulk_create_schedules(self, request):
+        """
+        Tạo lịch làm việc thường xuyên và khung giờ cho nhiều bác sĩ trong một lần gọi
+        (ví dụ: nhập lịch trực của cả khoa).
+
+        Parameters:
+        - start_date: Ngày bắt đầu (YYYY-MM-DD) (bắt buộc)
+        - end_date: Ngày kết thúc (YYYY-MM-DD) (bắt buộc)
+        - schedules: Danh sách lịch, mỗi phần tử gồm:
+            - doctor_id, weekdays, start_time, end_time (bắt buộc)
+            - slot_duration, max_patients_per_slot, location, department, room,
+              recurring_pattern, notes (tùy chọn)
+
+        Các ngày bị xung đột với khung giờ hiện có sẽ được bỏ qua và trả về trong 'conflicts'.
+        """
+        schedules_data = request.data.get('schedules') or []
+        start_date = request.data.get('start_date')
+        end_date = request.data.get('end_date')
+
+        if not schedules_data:
+            return Response({"error": "schedules là bắt buộc"}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            start_date_obj = datetime.strptime(start_date, '%Y-%m-%d').date()
+            end_date_obj = datetime.strptime(end_date, '%Y-%m-%d').date()
+        except (TypeError, ValueError):
+            return Response(
+                {"error": "start_date và end_date là bắt buộc (YYYY-MM-DD)"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        for index, item in enumerate(schedules_data):
+            missing = [field for field in ['doctor_id', 'weekdays', 'start_time', 'end_time'] if not item.get(field)]
+            if missing:
+                return Response(
+                    {"error": f"Lịch thứ {index + 1} thiếu trường bắt buộc: {', '.join(missing)}"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+        try:
+            # Một truy vấn đọc khung giờ hiện có của tất cả bác sĩ trong khoảng ngày
+            generator = ScheduleSlotGenerator(
+                [item['doctor_id'] for item in schedules_data],
+                start_date_obj,
+                end_date_obj
+            )
+
+            with transaction.atomic():
+                availabilities = []
+                for item in schedules_data:
+                    for weekday in item['weekdays']:
+                        availabilities.append(DoctorAvailability(
+                            doctor_id=item['doctor_id'],
+                            weekday=weekday,
+                            start_time=item['start_time'],
+                            end_time=item['end_time'],
+                            schedule_type='REGULAR',
+                            is_available=True,
+                            is_active=True,
+                            recurring_pattern=item.get('recurring_pattern', 'WEEKLY'),
+                            start_date=start_date_obj,
+                            end_date=end_date_obj,
+                            location=item.get('location'),
+                            department=item.get('department'),
+                            room=item.get('room'),
+                            slot_duration=item.get('slot_duration', 30),
+                            max_patients_per_slot=item.get('max_patients_per_slot', 1),
+                            notes=item.get('notes')
+                        ))
+                availabilities = DoctorAvailability.objects.bulk_create(availabilities)
+
+                for availability in availabilities:
+                    generator.plan_weekly(
+                        availability.doctor_id, [availability.weekday],
+                        availability.start_time, availability.end_time, availability.slot_duration,
+                        availability=availability,
+                        location=availability.location,
+                        department=availability.department,
+                        room=availability.room,
+                        max_patients=availability.max_patients_per_slot
+                    )
+
+                created_time_slots = generator.save()
+        except Exception as e:
+            logger.error(f"Error in bulk_create_schedules: {str(e)}")
+            return Response(
+                {"error": f"Lỗi khi tạo lịch làm việc hàng loạt: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+        slots_by_doctor = {}
+        for slot in created_time_slots:
+            slots_by_doctor[slot.doctor_id] = slots_by_doctor.get(slot.doctor_id, 0) + 1
+
+        return Response({
+            'success': True,
+            'message': f"Tạo thành công {len(availabilities)} lịch làm việc và {len(created_time_slots)} khung giờ",
+            'summary': {
+                'total_doctors': len({item['doctor_id'] for item in schedules_data}),
+                'total_schedules': len(availabilities),
+                'total_time_slots': len(created_time_slots),
+                'existing_time_slots': generator.existing_count,
+                'date_range': f"{start_date} - {end_date}",
+                'time_slots_by_doctor': slots_by_doctor,
+            },
+            'schedules': DoctorAvailabilitySerializer(availabilities, many=True).data,
+            'conflicts': [
+                {'doctor_id': conflict['doctor_id'], 'date': conflict['date'].strftime('%Y-%m-%d'), 'message': conflict['message']}
+                for conflict in generator.conflicts
+            ],
+        }, status=status.HTTP_201_CREATED)
+
     def _check_time_conflict(self, doctor_id, date, start_time, end_time, exclude_id=None):
         """
         Kiểm tra xung đột thởi gian khi tạo lịch làm việc mới
@@ -559,6 +652,9 @@ class DoctorAvailabilityViewSet(viewsets.ModelViewSet):
             created_bulk = TimeSlot.objects.bulk_create(slots_to_create)
             created_slots.extend(created_bulk)
 
+            # bulk_create không phát signal, cập nhật chỉ mục lịch trống trực tiếp
+            refresh_for_slots(created_bulk)
+
         return created_slots
 
 
@@ -792,6 +888,42 @@ class TimeSlotViewSet(viewsets.ModelViewSet):
         return Response(result)
 
 
+    @action(detail=False, methods=['get'])
+    def calendar(self, request):
+        """
+        Lịch trống theo ngày của bác sĩ, đọc từ chỉ mục DoctorDailyAvailability.
+
+        Query parameters:
+        - doctor_id: ID của bác sĩ (optional, bác sĩ mặc định xem lịch của mình)
+        - start_date: Ngày bắt đầu (YYYY-MM-DD) (optional, mặc định là ngày hiện tại)
+        - end_date: Ngày kết thúc (YYYY-MM-DD) (optional, mặc định là 30 ngày sau start_date)
+        - only_free: Chỉ trả về các ngày còn khung giờ trống (true/false, mặc định true)
+        """
+        doctor_id = request.query_params.get('doctor_id')
+        if getattr(request.user, 'role', None) == 'DOCTOR':
+            doctor_id = getattr(request.user, 'id', None)
+
+        try:
+            start_date = request.query_params.get('start_date')
+            start_date = datetime.strptime(start_date, '%Y-%m-%d').date() if start_date else timezone.now().date()
+            end_date = request.query_params.get('end_date')
+            end_date = datetime.strptime(end_date, '%Y-%m-%d').date() if end_date else start_date + timedelta(days=30)
+        except ValueError:
+            return Response(
+                {"error": "Invalid date format. Use YYYY-MM-DD"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        queryset = DoctorDailyAvailability.objects.filter(date__gte=start_date, date__lte=end_date)
+        if doctor_id:
+            queryset = queryset.filter(doctor_id=doctor_id)
+        if request.query_params.get('only_free', 'true').lower() == 'true':
+            queryset = queryset.filter(free_slots__gt=0)
+
+        serializer = DoctorDailyAvailabilitySerializer(queryset, many=True)
+        return Response(serializer.data)
+
+
 class AppointmentViewSet(viewsets.ModelViewSet):
     """
     API endpoint for managing appointments.
@@ -1659,6 +1791,55 @@ class PatientVisitViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
+def _aggregate_doctor_availability(available_slots):
+    """
+    Tổng hợp khung giờ trống theo bác sĩ bằng một truy vấn GROUP BY (doctor_id, date, department).
+
+    Returns:
+    - dict: {str(doctor_id): {'doctor_id', 'slots_count', 'dates', 'departments'}}
+    """
+    availability_by_doctor = {}
+    rows = available_slots.values('doctor_id', 'date', 'department').annotate(
+        slots_count=Count('id')
+    ).order_by()
+
+    for row in rows:
+        entry = availability_by_doctor.setdefault(str(row['doctor_id']), {
+            'doctor_id': row['doctor_id'],
+            'slots_count': 0,
+            'dates': set(),
+            'departments': set(),
+        })
+        entry['slots_count'] += row['slots_count']
+        entry['dates'].add(row['date'])
+        if row['department']:
+            entry['departments'].add(row['department'])
+
+    return availability_by_doctor
+
+
+def _aggregate_daily_availability_index(daily_index):
+    """
+    Tổng hợp lịch trống theo bác sĩ từ chỉ mục DoctorDailyAvailability.
+
+    Returns:
+    - dict: cùng định dạng với _aggregate_doctor_availability
+    """
+    availability_by_doctor = {}
+    for summary in daily_index.only('doctor_id', 'date', 'free_slots', 'departments'):
+        entry = availability_by_doctor.setdefault(str(summary.doctor_id), {
+            'doctor_id': summary.doctor_id,
+            'slots_count': 0,
+            'dates': set(),
+            'departments': set(),
+        })
+        entry['slots_count'] += summary.free_slots
+        entry['dates'].add(summary.date)
+        entry['departments'].update(summary.department_list)
+
+    return availability_by_doctor
+
+
 @api_view(['GET'])
 def available_doctors(request):
     """
@@ -1747,6 +1928,7 @@ def available_doctors(request):
         available_slots = available_slots.filter(location=location)
 
     # Lọc theo weekday nếu có
+    weekday_dates = None
     if weekday:
         try:
             weekday_int = int(weekday)
@@ -1780,15 +1962,30 @@ def available_doctors(request):
         except (ValueError, IndexError):
             logger.warning(f"Invalid time_range format: {time_range}")
 
-    # Lấy danh sách ID bác sĩ có lịch trống
-    doctor_ids = available_slots.values_list('doctor_id', flat=True).distinct()
+    # Tổng hợp số khung giờ, ngày trống và khoa của từng bác sĩ trong một truy vấn.
+    # Khi không lọc theo khoa/địa điểm/khung giờ, đọc trực tiếp từ chỉ mục lịch trống
+    if department or location or time_range:
+        availability_by_doctor = _aggregate_doctor_availability(available_slots)
+    else:
+        indexed_days = DoctorDailyAvailability.objects.filter(
+            date__gte=start_date_obj,
+            date__lte=end_date_obj
+        )
+        if weekday_dates is not None:
+            indexed_days = indexed_days.filter(date__in=weekday_dates)
+        availability_by_doctor = _aggregate_daily_availability_index(indexed_days.filter(free_slots__gt=0))
+
+        # Chỉ mục chưa có dữ liệu cho khoảng ngày này (chưa xây dựng): tính trực tiếp từ khung giờ
+        if not availability_by_doctor and not indexed_days.exists():
+            availability_by_doctor = _aggregate_doctor_availability(available_slots)
+    doctor_ids = [entry['doctor_id'] for entry in availability_by_doctor.values()]
 
     logger.info(f"Found {len(doctor_ids)} doctors with available slots")
 
     # Lấy thông tin chi tiết về bác sĩ từ user-service
     from .integrations import get_doctors_info
     token = getattr(request, 'auth', None)
-    doctors = get_doctors_info(list(doctor_ids), token)
+    doctors = get_doctors_info(doctor_ids, token)
 
     # Nếu không lấy được thông tin từ user-service, trả về lỗi
     if not doctors:
@@ -1800,49 +1997,47 @@ def available_doctors(request):
         doctors = [d for d in doctors if d.get('specialty') == specialty or d.get('specialization') == specialty]
         logger.info(f"After specialty filter: {len(doctors)} doctors")
 
-    # Thêm thông tin về ngày có lịch trống cho mỗi bác sĩ
-    for doctor in doctors:
-        doctor_id = doctor.get('id')
-
-        # Lấy các ngày có lịch trống
-        available_dates = available_slots.filter(
-            doctor_id=doctor_id
-        ).values('date').distinct()
-
-        doctor['available_dates'] = [date['date'].strftime('%Y-%m-%d') for date in available_dates]
-
-        # Lấy số lượng khung giờ trống
-        doctor['available_slots_count'] = available_slots.filter(doctor_id=doctor_id).count()
+    # Số lịch hẹn đã hoàn thành của mỗi bác sĩ (một truy vấn GROUP BY)
+    completed_counts = {
+        str(row['time_slot__doctor_id']): row['completed_count']
+        for row in Appointment.objects.filter(
+            time_slot__doctor_id__in=doctor_ids,
+            status='COMPLETED'
+        ).values('time_slot__doctor_id').annotate(completed_count=Count('id')).order_by()
+    }
 
-        # Lấy thông tin về khoa/phòng làm việc
-        departments = available_slots.filter(
-            doctor_id=doctor_id
-        ).values_list('department', flat=True).distinct()
+    # Khung giờ trống sớm nhất của mỗi bác sĩ (DISTINCT ON doctor_id)
+    earliest_slots = {
+        str(slot.doctor_id): slot
+        for slot in available_slots.order_by('doctor_id', 'date', 'start_time').distinct('doctor_id')
+    }
 
-        doctor['departments'] = list(filter(None, departments))
+    # Lý do khám chỉ cần lấy một lần cho tất cả bác sĩ
+    reason = None
+    if reason_id:
+        reason = AppointmentReason.objects.filter(id=reason_id).first()
 
-        # Lấy thông tin về số lượng bệnh nhân đã khám
-        appointment_count = Appointment.objects.filter(
-            time_slot__doctor_id=doctor_id,
-            status='COMPLETED'
-        ).count()
+    # Thêm thông tin về ngày có lịch trống cho mỗi bác sĩ
+    for doctor in doctors:
+        doctor_key = str(doctor.get('id'))
+        availability = availability_by_doctor.get(doctor_key, {})
 
-        doctor['completed_appointments'] = appointment_count
+        doctor['available_dates'] = [date.strftime('%Y-%m-%d') for date in sorted(availability.get('dates', set()))]
+        doctor['available_slots_count'] = availability.get('slots_count', 0)
+        doctor['departments'] = sorted(availability.get('departments', set()))
+        doctor['completed_appointments'] = completed_counts.get(doctor_key, 0)
 
         # Tính điểm phù hợp nếu có reason_id
         if reason_id:
-            try:
-                reason = AppointmentReason.objects.get(id=reason_id)
+            relevance_score = 0
+            if reason:
                 # Tính điểm phù hợp dựa trên khoa và chuyên khoa
-                relevance_score = 0
                 if reason.department and reason.department in doctor.get('departments', []):
                     relevance_score += 5
                 if doctor.get('specialty') and reason.department and doctor.get('specialty').lower() in reason.department.lower():
                     relevance_score += 3
 
-                doctor['relevance_score'] = relevance_score
-            except AppointmentReason.DoesNotExist:
-                doctor['relevance_score'] = 0
+            doctor['relevance_score'] = relevance_score
 
     # Sắp xếp bác sĩ theo tiêu chí được chọn
     if sort_by == 'rating':
@@ -1857,10 +2052,7 @@ def available_doctors(request):
 
     # Thêm thông tin về khung giờ trống sớm nhất cho mỗi bác sĩ
     for doctor in doctors:
-        doctor_id = doctor.get('id')
-        earliest_slot = available_slots.filter(
-            doctor_id=doctor_id
-        ).order_by('date', 'start_time').first()
+        earliest_slot = earliest_slots.get(str(doctor.get('id')))
 
         if earliest_slot:
             doctor['earliest_available_slot'] = {
@@ -38,6 +38,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'common_auth.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -149,6 +150,9 @@ API_GATEWAY_URL = os.environ.get('API_GATEWAY_URL', 'http://api-gateway:8000')
 # Common Auth settings
 REDIS_URL = os.environ.get('REDIS_URL', 'redis://redis:6379/0')
 
+# Bearer token for scraping /metrics/ (common_auth.metrics); unset = other services and localhost only
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
 # Đặt JWT_SECRET cố định để đảm bảo nhất quán với các service khác
 JWT_SECRET = 'healthcare_jwt_secret_key_2025'
 
@@ -182,10 +186,28 @@ SERVICE_INTEGRATIONS = {
 # Cấu hình retry cho các API call tích hợp
 API_RETRY_CONFIG = {
     'MAX_RETRIES': 3,
-    'RETRY_DELAY': 1,  # seconds
+    'RETRY_DELAY': 1,  # seconds, nhân đôi sau mỗi lần retry (có jitter)
+    'MAX_RETRY_DELAY': 8,  # seconds
     'TIMEOUT': 5,  # seconds
+    'POOL_MAXSIZE': int(os.environ.get('API_POOL_MAXSIZE', 20)),  # kết nối tối đa cho mỗi host
+    'CIRCUIT_FAILURE_THRESHOLD': 5,  # số lỗi liên tiếp trước khi ngắt mạch
+    'CIRCUIT_RESET_TIMEOUT': 30,  # seconds
+    'FAN_OUT_MAX_WORKERS': 8,
 }
 
+# Thời gian cache thông tin bác sĩ lấy từ user-service (giây)
+DOCTOR_INFO_CACHE_TTL = int(os.environ.get('DOCTOR_INFO_CACHE_TTL', 300))
+# Thời gian ghi nhớ ID bác sĩ không tồn tại (giây)
+DOCTOR_INFO_MISS_CACHE_TTL = int(os.environ.get('DOCTOR_INFO_MISS_CACHE_TTL', 30))
+
+# Outbox cho các tác vụ phụ của lịch hẹn (nhắc nhở, hóa đơn)
+APPOINTMENT_AUTO_BILLING = os.environ.get('APPOINTMENT_AUTO_BILLING', 'False') == 'True'
+APPOINTMENT_OUTBOX_MAX_ATTEMPTS = int(os.environ.get('APPOINTMENT_OUTBOX_MAX_ATTEMPTS', 5))
+
+# Xác thực service-to-service (ví dụ: tạo hóa đơn từ outbox, không có token người dùng)
+SERVICE_NAME = 'appointment-service'
+SERVICE_API_KEY = os.environ.get('APPOINTMENT_SERVICE_API_KEY', 'appointment-service-api-key')
+
 # Swagger UI JWT auth configuration
 SWAGGER_SETTINGS = {
     'SECURITY_DEFINITIONS': {
@@ -2,7 +2,23 @@
 Proxy module for authentication from common-auth package.
 This file exists to maintain backward compatibility.
 """
-from common_auth.authentication import ServiceAuthentication
+from rest_framework.authentication import BaseAuthentication
+from common_auth.authentication import ServiceAuthentication, ServiceUser
 
 # Re-export for backward compatibility
 HeaderAuthentication = ServiceAuthentication
+
+
+class ServiceAPIKeyAuthentication(BaseAuthentication):
+    """
+    Authenticate requests verified by ServiceAPIKeyMiddleware as the calling service.
+
+    The service user has role SERVICE, so it passes IsAuthenticated but no role-based permission.
+    """
+
+    def authenticate(self, request):
+        if not getattr(request._request, 'is_service_request', False):
+            return None
+        service_name = getattr(request._request, 'service_name', None)
+        user = ServiceUser(user_id=0, role='SERVICE', service_name=service_name)
+        return (user, None)
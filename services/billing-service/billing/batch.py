@@ -0,0 +1,289 @@
+"""
+Batch invoice generation (billing runs).
+
+A billing run stores one BillingRunItem per encounter or appointment ID. Pending items
+are streamed through a worker pool in chunks; after each chunk the item results and run
+counters are written in bulk. The item statuses are the checkpoint: an interrupted run
+is resumed by processing the items that are still pending.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import timedelta
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F, Q
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from .models import BillingRun, BillingRunItem, Invoice
+from .services import (
+    create_invoice_from_appointment, create_invoice_from_encounter, get_insurance_coverage
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_WORKERS = getattr(settings, 'BILLING_RUN_MAX_WORKERS', 8)
+DEFAULT_CHUNK_SIZE = getattr(settings, 'BILLING_RUN_CHUNK_SIZE', 100)
+# A RUNNING run without a heartbeat for this long is considered interrupted
+STALE_AFTER_SECONDS = getattr(settings, 'BILLING_RUN_STALE_AFTER', 600)
+# A live run refreshes its heartbeat at least this often, even while items are slow
+HEARTBEAT_INTERVAL_SECONDS = getattr(settings, 'BILLING_RUN_HEARTBEAT_INTERVAL', 30)
+
+
+class InsuranceLookupCache:
+    """
+    Per-run cache of insurance lookups so each patient is looked up once,
+    even when several workers bill the same patient concurrently.
+    """
+
+    def __init__(self):
+        self._results = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, patient_id, headers=None):
+        with self._lock:
+            if patient_id in self._results:
+                return self._results[patient_id]
+            patient_lock = self._locks.setdefault(patient_id, threading.Lock())
+
+        with patient_lock:
+            with self._lock:
+                if patient_id in self._results:
+                    return self._results[patient_id]
+            coverage = get_insurance_coverage(patient_id, headers)
+            with self._lock:
+                self._results[patient_id] = coverage
+            return coverage
+
+
+def _existing_invoice_id(source_type, source_id):
+    """
+    Find an invoice already created for a source, e.g. before the run was interrupted.
+    """
+    if source_type == BillingRun.SourceType.APPOINTMENT:
+        invoices = Invoice.objects.filter(invoice_number=f"INV-APP-{source_id}")
+    else:
+        invoices = Invoice.objects.filter(invoice_number__startswith=f"INV-ENC-{source_id}-")
+    return invoices.values_list('id', flat=True).first()
+
+
+def create_billing_run(source_type, source_ids, apply_insurance=True, created_by=None):
+    """
+    Create a billing run and its items.
+
+    Args:
+        source_type: BillingRun.SourceType value
+        source_ids: Encounter or appointment IDs (duplicates are ignored)
+        apply_insurance: Apply insurance coverage to the created invoices
+        created_by: ID of the user who started the run
+
+    Returns:
+        BillingRun: The created run
+    """
+    source_ids = list(dict.fromkeys(int(source_id) for source_id in source_ids))
+
+    with transaction.atomic():
+        run = BillingRun.objects.create(
+            source_type=source_type,
+            apply_insurance=apply_insurance,
+            total=len(source_ids),
+            created_by=created_by
+        )
+        BillingRunItem.objects.bulk_create(
+            [BillingRunItem(run=run, source_id=source_id) for source_id in source_ids],
+            batch_size=1000
+        )
+    logger.info(f"Created billing run {run.id} for {len(source_ids)} {source_type.lower()}s")
+    return run
+
+
+def _process_item(run, item, headers, insurance_lookup):
+    """
+    Create the invoice for one run item (executed in a worker thread).
+
+    Returns:
+        tuple: (status, invoice_id, error)
+    """
+    close_old_connections()
+    try:
+        existing = _existing_invoice_id(run.source_type, item.source_id)
+        if existing:
+            return BillingRunItem.Status.SKIPPED, existing, 'Invoice already exists'
+
+        if run.source_type == BillingRun.SourceType.APPOINTMENT:
+            create = create_invoice_from_appointment
+        else:
+            create = create_invoice_from_encounter
+        invoice = create(
+            item.source_id, headers,
+            apply_insurance=run.apply_insurance,
+            insurance_lookup=insurance_lookup
+        )
+        if not invoice:
+            return BillingRunItem.Status.FAILED, None, 'Failed to create invoice'
+        return BillingRunItem.Status.SUCCEEDED, invoice.id, None
+    except Exception as e:
+        logger.error(f"Billing run {run.id}: error billing {run.source_type.lower()} {item.source_id}: {str(e)}")
+        return BillingRunItem.Status.FAILED, None, str(e)
+
+
+def _checkpoint(run, items):
+    """
+    Write the results of a chunk: item statuses with one bulk_update, counters with one UPDATE.
+    """
+    counts = {status: 0 for status in BillingRunItem.Status.values}
+    for item in items:
+        counts[item.status] += 1
+
+    now = timezone.now()
+    with transaction.atomic():
+        BillingRunItem.objects.bulk_update(items, ['status', 'invoice_id', 'error', 'processed_at'])
+        BillingRun.objects.filter(pk=run.pk).update(
+            succeeded=F('succeeded') + counts[BillingRunItem.Status.SUCCEEDED],
+            failed=F('failed') + counts[BillingRunItem.Status.FAILED],
+            skipped=F('skipped') + counts[BillingRunItem.Status.SKIPPED],
+            heartbeat_at=now,
+            updated_at=now
+        )
+
+
+def _heartbeat(run):
+    BillingRun.objects.filter(pk=run.pk, status=BillingRun.Status.RUNNING).update(heartbeat_at=timezone.now())
+
+
+def _process_chunk(executor, run, chunk, headers, insurance_lookup):
+    """
+    Process a chunk on the worker pool, refreshing the run heartbeat while waiting.
+    """
+    futures = {
+        executor.submit(_process_item, run, item, headers, insurance_lookup): item
+        for item in chunk
+    }
+    pending = set(futures)
+    last_heartbeat = time.monotonic()
+    while pending:
+        done, pending = wait(pending, timeout=HEARTBEAT_INTERVAL_SECONDS, return_when=FIRST_COMPLETED)
+        processed_at = timezone.now()
+        for future in done:
+            item = futures[future]
+            item.status, item.invoice_id, item.error = future.result()
+            item.processed_at = processed_at
+        if time.monotonic() - last_heartbeat >= HEARTBEAT_INTERVAL_SECONDS:
+            _heartbeat(run)
+            last_heartbeat = time.monotonic()
+
+
+def claim_billing_run(run, include_completed=False):
+    """
+    Atomically mark a run as RUNNING if it may be (re)started.
+
+    Only one caller can claim a run: PENDING and FAILED runs, and RUNNING runs whose
+    heartbeat is older than BILLING_RUN_STALE_AFTER, are claimable.
+
+    Args:
+        run: BillingRun to claim
+        include_completed: Also claim COMPLETED runs (to retry their failed items)
+
+    Returns:
+        bool: True if this caller claimed the run
+    """
+    now = timezone.now()
+    stale_before = now - timedelta(seconds=STALE_AFTER_SECONDS)
+    statuses = [BillingRun.Status.PENDING, BillingRun.Status.FAILED]
+    if include_completed:
+        statuses.append(BillingRun.Status.COMPLETED)
+
+    claimable = Q(status__in=statuses) | Q(status=BillingRun.Status.RUNNING) & (
+        Q(heartbeat_at__lt=stale_before) | Q(heartbeat_at__isnull=True, started_at__lt=stale_before)
+    )
+    claimed = BillingRun.objects.filter(claimable, pk=run.pk).update(
+        status=BillingRun.Status.RUNNING,
+        started_at=Coalesce('started_at', now),
+        heartbeat_at=now,
+        finished_at=None
+    )
+    if claimed:
+        run.refresh_from_db()
+    return claimed == 1
+
+
+def execute_billing_run(run, headers=None, max_workers=None, chunk_size=None):
+    """
+    Process the pending items of a billing run claimed with claim_billing_run.
+    Safe to call again (after claiming) to resume an interrupted run.
+
+    Args:
+        run: BillingRun to process
+        headers: Headers forwarded to the other services
+        max_workers: Number of concurrent invoice creations
+        chunk_size: Number of items processed between checkpoints
+
+    Returns:
+        BillingRun: The refreshed run
+    """
+    max_workers = max_workers or DEFAULT_MAX_WORKERS
+    chunk_size = chunk_size or DEFAULT_CHUNK_SIZE
+    logger.info(f"Starting billing run {run.id} with {max_workers} workers")
+
+    insurance_lookup = InsuranceLookupCache()
+    pending = BillingRunItem.objects.filter(run=run, status=BillingRunItem.Status.PENDING).order_by('id')
+
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f'billing-run-{run.id}') as executor:
+            last_id = 0
+            while True:
+                # Keyset pagination: items of the previous chunk are no longer pending
+                chunk = list(pending.filter(id__gt=last_id)[:chunk_size])
+                if not chunk:
+                    break
+                last_id = chunk[-1].id
+
+                _process_chunk(executor, run, chunk, headers, insurance_lookup)
+                _checkpoint(run, chunk)
+    except Exception as e:
+        logger.error(f"Billing run {run.id} failed: {str(e)}")
+        BillingRun.objects.filter(pk=run.pk).update(status=BillingRun.Status.FAILED, finished_at=timezone.now())
+        raise
+
+    BillingRun.objects.filter(pk=run.pk).update(status=BillingRun.Status.COMPLETED, finished_at=timezone.now())
+    run.refresh_from_db()
+    logger.info(f"Finished billing run {run.id}: {run.succeeded} succeeded, {run.failed} failed, {run.skipped} skipped")
+    return run
+
+
+def retry_failed_items(run):
+    """
+    Mark the failed items of a run as pending again so the next execution retries them.
+
+    Returns:
+        int: Number of items reset
+    """
+    with transaction.atomic():
+        reset = BillingRunItem.objects.filter(run=run, status=BillingRunItem.Status.FAILED).update(
+            status=BillingRunItem.Status.PENDING, error=None, processed_at=None
+        )
+        if reset:
+            BillingRun.objects.filter(pk=run.pk).update(failed=F('failed') - reset)
+    return reset
+
+
+def start_billing_run_in_background(run, headers=None, max_workers=None):
+    """
+    Execute a claimed billing run in a background thread (used by the API).
+    """
+    # Request headers are not usable after the request ends; keep only what the other services need
+    forwarded = {key: value for key, value in (headers or {}).items() if key.lower() in ('authorization', 'x-user-id', 'x-user-role', 'x-user-email')}
+
+    def target():
+        try:
+            execute_billing_run(run, forwarded, max_workers)
+        except Exception:
+            pass  # Already logged and recorded on the run
+        finally:
+            connection.close()
+
+    thread = threading.Thread(target=target, name=f'billing-run-{run.id}', daemon=True)
+    thread.start()
+    return thread
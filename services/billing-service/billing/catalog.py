@@ -0,0 +1,354 @@
+"""
+Local read replica of prices owned by other services.
+
+Test type prices (Laboratory Service), medication prices (Pharmacy Service) and doctor
+consultation fees (User Service) are stored in PriceCatalogEntry and served from a
+per-process in-memory index, so invoices can be priced without synchronous calls to
+the owning services.
+
+The replica is populated by bulk syncs (the sync endpoint or the sync_price_catalog
+command) and kept fresh by change events consumed from the notification stream
+(consume_price_events). Every write bumps a version counter in Redis; processes reload
+their index when they see a new version.
+"""
+import logging
+import threading
+import time
+from decimal import Decimal
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from common_auth.redis_client import get_redis_client
+from .models import PriceCatalogEntry
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = 'billing:price_catalog:version'
+
+Kind = PriceCatalogEntry.Kind
+
+# Price kinds used by pricing.py mapped to catalog kinds
+CACHE_KINDS = {
+    'test_type': Kind.TEST_TYPE,
+    'medication': Kind.MEDICATION,
+    'doctor_fee': Kind.DOCTOR_FEE,
+}
+
+# Change events: event type -> (catalog kind, data field holding the ID, deleted)
+PRICE_EVENTS = {
+    'TEST_TYPE_UPDATED': (Kind.TEST_TYPE, 'test_type_id', False),
+    'TEST_TYPE_DELETED': (Kind.TEST_TYPE, 'test_type_id', True),
+    'MEDICATION_UPDATED': (Kind.MEDICATION, 'medication_id', False),
+    'MEDICATION_DELETED': (Kind.MEDICATION, 'medication_id', True),
+    'DOCTOR_FEE_UPDATED': (Kind.DOCTOR_FEE, 'doctor_id', False),
+    'DOCTOR_FEE_DELETED': (Kind.DOCTOR_FEE, 'doctor_id', True),
+}
+
+# Bulk sync sources: kind -> (client class name, list endpoint, price field, name field)
+SOURCES = {
+    Kind.TEST_TYPE: ('LaboratoryServiceClient', '/api/test-types/', 'price', 'name'),
+    Kind.MEDICATION: ('PharmacyServiceClient', '/api/medications/', 'price', 'name'),
+    Kind.DOCTOR_FEE: ('UserServiceClient', '/api/doctors/', 'consultation_fee', None),
+}
+
+MISSING = object()
+
+
+def _to_price(value):
+    return Decimal(str(value)) if value not in (None, '') else None
+
+
+def _to_datetime(value):
+    if value in (None, ''):
+        return None
+    if isinstance(value, str):
+        value = parse_datetime(value)
+    if value is not None and timezone.is_naive(value):
+        value = timezone.make_aware(value)
+    return value
+
+
+class PriceCatalogIndex:
+    """
+    In-memory index {kind: {external_id: price}} over PriceCatalogEntry.
+    """
+
+    def __init__(self, refresh_interval=None):
+        self.refresh_interval = refresh_interval if refresh_interval is not None else getattr(settings, 'PRICE_CATALOG_REFRESH_INTERVAL', 5)
+        self._index = None
+        self._version = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def lookup(self, kind, external_id):
+        """
+        Look up a replicated price.
+
+        Args:
+            kind: PriceCatalogEntry.Kind value
+            external_id: ID in the owning service
+
+        Returns:
+            Decimal or None if the entry exists (None means the service has no price),
+            MISSING if the entry is not replicated.
+        """
+        index = self._get_index()
+        return index.get(kind, {}).get(int(external_id), MISSING)
+
+    def _get_index(self):
+        if self._index is not None and time.monotonic() - self._checked_at < self.refresh_interval:
+            return self._index
+
+        with self._lock:
+            if self._index is not None and time.monotonic() - self._checked_at < self.refresh_interval:
+                return self._index
+            version = self._read_version()
+            # Without Redis the version is unknown; reload on every refresh interval
+            if self._index is None or version is None or version != self._version:
+                self._index = self._load()
+                self._version = version
+            self._checked_at = time.monotonic()
+            return self._index
+
+    def _read_version(self):
+        r = get_redis_client()
+        if r is None:
+            return None
+        try:
+            return r.get(VERSION_KEY)
+        except Exception as e:
+            logger.warning(f"Error reading price catalog version: {str(e)}")
+            return None
+
+    def _load(self):
+        index = {}
+        for kind, external_id, price in PriceCatalogEntry.objects.values_list('kind', 'external_id', 'price').iterator(chunk_size=5000):
+            index.setdefault(kind, {})[external_id] = price
+        logger.info(f"Loaded {sum(len(prices) for prices in index.values())} price catalog entries")
+        return index
+
+    def invalidate(self):
+        """
+        Force a reload on the next lookup.
+        """
+        with self._lock:
+            self._checked_at = 0.0
+            self._version = None
+
+
+price_index = PriceCatalogIndex()
+
+
+def is_enabled():
+    return getattr(settings, 'PRICE_CATALOG_ENABLED', True)
+
+
+def lookup_price(cache_kind, external_id):
+    """
+    Look up a price by pricing.py kind ('test_type', 'medication', 'doctor_fee').
+
+    Returns:
+        Decimal, None or MISSING (see PriceCatalogIndex.lookup)
+    """
+    kind = CACHE_KINDS.get(cache_kind)
+    if kind is None or not is_enabled():
+        return MISSING
+    try:
+        return price_index.lookup(kind, external_id)
+    except Exception as e:
+        logger.error(f"Error reading price catalog: {str(e)}")
+        return MISSING
+
+
+def _publish_change(kinds):
+    """
+    Notify all processes that the catalog changed.
+    """
+    from .pricing import price_cache
+
+    for kind in kinds:
+        for cache_kind, catalog_kind in CACHE_KINDS.items():
+            if catalog_kind == kind:
+                price_cache.invalidate(cache_kind)
+    price_index.invalidate()
+
+    r = get_redis_client()
+    if r is not None:
+        try:
+            r.incr(VERSION_KEY)
+        except Exception as e:
+            logger.warning(f"Error bumping price catalog version: {str(e)}")
+
+
+def upsert_prices(kind, items, full=False):
+    """
+    Insert or update replicated prices.
+
+    Args:
+        kind: PriceCatalogEntry.Kind value
+        items: list of dicts with 'id', 'price' and optional 'name' and 'updated_at'
+        full: the items are the complete catalog of this kind; entries not listed are removed
+
+    An item older than the stored entry (by 'updated_at') is skipped, so a delayed event or
+    a sync that started before a newer event cannot roll a price back.
+
+    Returns:
+        tuple: (number of entries written, number of entries removed)
+    """
+    entries = {}
+    for item in items:
+        entries[int(item['id'])] = PriceCatalogEntry(
+            kind=kind,
+            external_id=int(item['id']),
+            name=item.get('name'),
+            price=_to_price(item.get('price')),
+            source_updated_at=_to_datetime(item.get('updated_at'))
+        )
+
+    removed = 0
+    with transaction.atomic():
+        stored = dict(
+            PriceCatalogEntry.objects.select_for_update()
+            .filter(kind=kind, external_id__in=list(entries))
+            .values_list('external_id', 'source_updated_at')
+        )
+        fresh = [
+            entry for external_id, entry in entries.items()
+            if entry.source_updated_at is None
+            or stored.get(external_id) is None
+            or entry.source_updated_at >= stored[external_id]
+        ]
+        if fresh:
+            PriceCatalogEntry.objects.bulk_create(
+                fresh,
+                batch_size=1000,
+                update_conflicts=True,
+                unique_fields=['kind', 'external_id'],
+                update_fields=['name', 'price', 'source_updated_at', 'synced_at']
+            )
+        if full:
+            removed, _ = PriceCatalogEntry.objects.filter(kind=kind).exclude(external_id__in=list(entries)).delete()
+        transaction.on_commit(lambda: _publish_change([kind]))
+
+    return len(fresh), removed
+
+
+def delete_prices(kind, external_ids):
+    """
+    Remove replicated prices.
+
+    Returns:
+        int: Number of entries removed
+    """
+    with transaction.atomic():
+        removed, _ = PriceCatalogEntry.objects.filter(kind=kind, external_id__in=external_ids).delete()
+        transaction.on_commit(lambda: _publish_change([kind]))
+    return removed
+
+
+def handle_price_event(event_type, data):
+    """
+    Apply a price change event published by another service.
+
+    Returns:
+        bool: True if the event was a price change event
+    """
+    spec = PRICE_EVENTS.get(event_type)
+    if spec is None:
+        return False
+
+    kind, id_field, deleted = spec
+    external_id = data.get(id_field)
+    if external_id is None:
+        logger.warning(f"Price event {event_type} without {id_field}")
+        return True
+
+    if deleted:
+        delete_prices(kind, [external_id])
+    else:
+        upsert_prices(kind, [{
+            'id': external_id,
+            'name': data.get('name'),
+            'price': data.get('price'),
+            'updated_at': data.get('updated_at'),
+        }])
+    logger.info(f"Applied price event {event_type} for {kind} {external_id}")
+    return True
+
+
+def fetch_source_prices(kind, headers=None, page_size=200):
+    """
+    Fetch the complete price list of a kind from its owning service.
+
+    Returns:
+        dict: {external_id: {'id', 'name', 'price', 'updated_at'}}, or None if the fetch failed
+    """
+    from . import services
+
+    client_name, endpoint, price_field, name_field = SOURCES[kind]
+    client = getattr(services, client_name)()
+
+    prices = {}
+    page = 1
+    while True:
+        data = client.get(f"{endpoint}?page={page}&page_size={page_size}", headers=headers)
+        if data is None:
+            return None
+        results = data.get('results', []) if isinstance(data, dict) else data
+        for item in results:
+            prices[int(item['id'])] = {
+                'id': item['id'],
+                'name': item.get(name_field) if name_field else None,
+                'price': item.get(price_field),
+                'updated_at': item.get('updated_at'),
+            }
+        if not isinstance(data, dict) or not data.get('next'):
+            return prices
+        page += 1
+
+
+def sync_from_sources(kinds=None, headers=None):
+    """
+    Replace the replica of each kind with the owning service's complete price list.
+
+    Returns:
+        dict: {kind: (written, removed)}; kinds whose fetch failed are omitted
+    """
+    results = {}
+    for kind in kinds or SOURCES:
+        prices = fetch_source_prices(kind, headers)
+        if prices is None:
+            logger.error(f"Could not fetch {kind} prices for catalog sync")
+            continue
+        results[kind] = upsert_prices(kind, prices.values(), full=True)
+    return results
+
+
+def reconcile(kinds=None, headers=None):
+    """
+    Compare the replica with the owning services.
+
+    Returns:
+        dict: {kind: {'missing': [ids], 'extra': [ids], 'mismatched': [(id, local, remote)]}}
+    """
+    report = {}
+    for kind in kinds or SOURCES:
+        remote = fetch_source_prices(kind, headers)
+        if remote is None:
+            logger.error(f"Could not fetch {kind} prices for reconciliation")
+            continue
+        local = dict(PriceCatalogEntry.objects.filter(kind=kind).values_list('external_id', 'price'))
+
+        mismatched = []
+        for external_id in local.keys() & remote.keys():
+            remote_price = _to_price(remote[external_id]['price'])
+            if local[external_id] != remote_price:
+                mismatched.append((external_id, local[external_id], remote_price))
+
+        report[kind] = {
+            'missing': sorted(remote.keys() - local.keys()),
+            'extra': sorted(local.keys() - remote.keys()),
+            'mismatched': sorted(mismatched),
+        }
+    return report
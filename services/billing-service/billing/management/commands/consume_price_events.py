@@ -0,0 +1,73 @@
+import json
+import logging
+import os
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from common_auth.redis_notifications import RedisNotificationClient
+from billing.catalog import handle_price_event
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Consumes price change events from the Redis Stream and applies them to the local price catalog'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--group', type=str, default='billing_price_catalog', help='Consumer group name')
+        parser.add_argument('--consumer', type=str, default=None, help='Consumer name (default: auto-generated)')
+        parser.add_argument('--batch-size', type=int, default=100, help='Number of messages to read in one batch')
+        parser.add_argument('--block', type=int, default=2000, help='Time in milliseconds to block waiting for new messages')
+        parser.add_argument('--sleep', type=int, default=1, help='Sleep time in seconds after a consumer error')
+
+    def handle(self, *args, **options):
+        group_name = options['group']
+        consumer_name = options['consumer'] or f"billing-{os.getpid()}"
+
+        client = RedisNotificationClient()
+        client.create_consumer_group(group_name)
+
+        self.stdout.write(self.style.SUCCESS(f"Starting price event consumer: {consumer_name} (group {group_name})"))
+
+        try:
+            while True:
+                try:
+                    messages = client.read_notifications(group_name, consumer_name, count=options['batch_size'], block=options['block'])
+                    if not messages:
+                        continue
+
+                    close_old_connections()
+                    for stream, message_list in messages:
+                        processed = [message_id for message_id, message_data in message_list if self.process_message(message_id, message_data)]
+                        if processed:
+                            client.acknowledge_messages(group_name, processed)
+                except Exception as e:
+                    logger.error(f"Error in price event consumer loop: {str(e)}")
+                    self.stderr.write(self.style.ERROR(f"Error in consumer loop: {str(e)}"))
+                    time.sleep(options['sleep'])
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.SUCCESS("Price event consumer stopped by user"))
+
+    def process_message(self, message_id, message_data):
+        """
+        Apply one stream message. Messages that are not price events are acknowledged as is.
+
+        Returns:
+            bool: True if the message can be acknowledged
+        """
+        message = {
+            key.decode('utf-8') if isinstance(key, bytes) else key:
+            value.decode('utf-8') if isinstance(value, bytes) else value
+            for key, value in message_data.items()
+        }
+        try:
+            data = json.loads(message.get('data') or '{}')
+        except json.JSONDecodeError:
+            data = {}
+
+        try:
+            handle_price_event(message.get('event_type'), data)
+            return True
+        except Exception as e:
+            # Left pending; the next sync_price_catalog run repairs the replica in any case
+            logger.error(f"Error applying price event {message_id}: {str(e)}")
+            return False
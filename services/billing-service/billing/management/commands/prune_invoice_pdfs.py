@@ -0,0 +1,17 @@
+import logging
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from billing.pdf_cache import get_cache_dir, prune_pdf_cache
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Removes cached invoice PDFs that have not been rendered recently'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-age', type=int, default=None, help='Maximum age in seconds (default: INVOICE_PDF_CACHE_MAX_AGE)')
+
+    def handle(self, *args, **options):
+        max_age = options['max_age'] or getattr(settings, 'INVOICE_PDF_CACHE_MAX_AGE', 30 * 24 * 3600)
+        removed = prune_pdf_cache(max_age)
+        self.stdout.write(self.style.SUCCESS(f"Removed {removed} cached PDFs from {get_cache_dir()}"))
@@ -0,0 +1,49 @@
+import logging
+from django.core.management.base import BaseCommand
+from billing.catalog import SOURCES, reconcile, upsert_prices, fetch_source_prices
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Reports drift between the local price catalog replica and the owning services'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--kind', action='append', choices=list(SOURCES), help='Only check this kind (can be repeated)')
+        parser.add_argument('--token', type=str, default=None, help='Bearer token used to call the other services')
+        parser.add_argument('--fix', action='store_true', help='Resync kinds that have drifted')
+
+    def handle(self, *args, **options):
+        headers = {'Authorization': f"Bearer {options['token']}"} if options['token'] else None
+        kinds = options['kind'] or list(SOURCES)
+
+        report = reconcile(kinds, headers)
+        drifted = []
+        for kind in kinds:
+            if kind not in report:
+                self.stdout.write(self.style.ERROR(f"{kind}: could not fetch source prices"))
+                continue
+            result = report[kind]
+            if not (result['missing'] or result['extra'] or result['mismatched']):
+                self.stdout.write(self.style.SUCCESS(f"{kind}: in sync"))
+                continue
+
+            drifted.append(kind)
+            self.stdout.write(self.style.WARNING(
+                f"{kind}: {len(result['missing'])} missing, {len(result['extra'])} extra, "
+                f"{len(result['mismatched'])} mismatched"
+            ))
+            for external_id, local_price, remote_price in result['mismatched']:
+                self.stdout.write(f"  {external_id}: replica {local_price}, source {remote_price}")
+            if result['missing']:
+                self.stdout.write(f"  missing: {result['missing']}")
+            if result['extra']:
+                self.stdout.write(f"  extra: {result['extra']}")
+
+        if options['fix']:
+            for kind in drifted:
+                prices = fetch_source_prices(kind, headers)
+                if prices is None:
+                    self.stdout.write(self.style.ERROR(f"{kind}: resync failed"))
+                    continue
+                written, removed = upsert_prices(kind, prices.values(), full=True)
+                self.stdout.write(self.style.SUCCESS(f"{kind}: resynced ({written} written, {removed} removed)"))
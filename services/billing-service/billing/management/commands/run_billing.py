@@ -0,0 +1,60 @@
+import logging
+from django.core.management.base import BaseCommand, CommandError
+from billing.models import BillingRun
+from billing.batch import create_billing_run, claim_billing_run, execute_billing_run, retry_failed_items
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Generates invoices for a batch of encounters or appointments (e.g. month-end billing)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--source-type', choices=BillingRun.SourceType.values, default=BillingRun.SourceType.ENCOUNTER, help='Type of the IDs to bill')
+        parser.add_argument('--ids', type=str, default=None, help='Comma-separated encounter or appointment IDs')
+        parser.add_argument('--ids-file', type=str, default=None, help='File with one ID per line')
+        parser.add_argument('--resume', type=int, default=None, metavar='RUN_ID', help='Resume an interrupted billing run')
+        parser.add_argument('--retry-failed', action='store_true', help='With --resume, process failed items again')
+        parser.add_argument('--workers', type=int, default=None, help='Number of concurrent invoice creations')
+        parser.add_argument('--chunk-size', type=int, default=None, help='Number of items processed between checkpoints')
+        parser.add_argument('--no-insurance', action='store_true', help='Do not apply insurance coverage')
+        parser.add_argument('--token', type=str, default=None, help='Bearer token used to call the other services')
+
+    def handle(self, *args, **options):
+        headers = {'Authorization': f"Bearer {options['token']}"} if options['token'] else None
+
+        if options['resume']:
+            try:
+                run = BillingRun.objects.get(pk=options['resume'])
+            except BillingRun.DoesNotExist:
+                raise CommandError(f"Billing run {options['resume']} not found")
+            if not claim_billing_run(run, include_completed=options['retry_failed']):
+                run.refresh_from_db()
+                raise CommandError(f"Billing run {run.id} is {run.status.lower()} and cannot be resumed")
+            if options['retry_failed']:
+                retry_failed_items(run)
+                run.refresh_from_db()
+        else:
+            source_ids = []
+            if options['ids']:
+                source_ids.extend(value for value in options['ids'].split(',') if value.strip())
+            if options['ids_file']:
+                with open(options['ids_file']) as ids_file:
+                    source_ids.extend(line for line in ids_file if line.strip())
+            if not source_ids:
+                raise CommandError('Provide --ids, --ids-file or --resume')
+            try:
+                run = create_billing_run(
+                    options['source_type'],
+                    source_ids,
+                    apply_insurance=not options['no_insurance']
+                )
+            except ValueError as e:
+                raise CommandError(f"Invalid ID: {str(e)}")
+            self.stdout.write(f"Created billing run {run.id} with {run.total} items")
+            claim_billing_run(run)
+
+        run = execute_billing_run(run, headers, options['workers'], options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Billing run {run.id} {run.status.lower()}: {run.succeeded} succeeded, "
+            f"{run.failed} failed, {run.skipped} skipped of {run.total}"
+        ))
@@ -0,0 +1,24 @@
+import logging
+from django.core.management.base import BaseCommand
+from billing.catalog import SOURCES, sync_from_sources
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Replaces the local price catalog replica with the price lists of the laboratory, pharmacy and user services'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--kind', action='append', choices=list(SOURCES), help='Only sync this kind (can be repeated)')
+        parser.add_argument('--token', type=str, default=None, help='Bearer token used to call the other services')
+
+    def handle(self, *args, **options):
+        headers = {'Authorization': f"Bearer {options['token']}"} if options['token'] else None
+        kinds = options['kind'] or list(SOURCES)
+
+        results = sync_from_sources(kinds, headers)
+        for kind in kinds:
+            if kind not in results:
+                self.stdout.write(self.style.ERROR(f"{kind}: sync failed"))
+                continue
+            written, removed = results[kind]
+            self.stdout.write(self.style.SUCCESS(f"{kind}: {written} entries written, {removed} removed"))
@@ -0,0 +1,35 @@
+import logging
+from django.conf import settings
+from django.http import JsonResponse
+
+logger = logging.getLogger(__name__)
+
+
+class ServiceAPIKeyMiddleware:
+    """
+    Authenticate service-to-service requests by API key.
+
+    Requests with valid X-Service-API-Key / X-Service-Name headers (see SERVICE_API_KEYS)
+    are marked with request.is_service_request; an invalid key is rejected with 403.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        api_key = request.META.get('HTTP_X_SERVICE_API_KEY')
+        service_name = request.META.get('HTTP_X_SERVICE_NAME')
+
+        if api_key and service_name:
+            valid_api_key = getattr(settings, 'SERVICE_API_KEYS', {}).get(service_name)
+
+            if valid_api_key and api_key == valid_api_key:
+                request.is_service_request = True
+                request.service_name = service_name
+            else:
+                logger.warning(f"Invalid API key for service {service_name}")
+                return JsonResponse({"detail": "Invalid API key"}, status=403)
+        else:
+            request.is_service_request = False
+
+        return self.get_response(request)
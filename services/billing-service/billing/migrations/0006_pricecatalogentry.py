@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-18 21:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing', '0005_invoiceitem_encounter_id_invoiceitem_medication_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PriceCatalogEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('TEST_TYPE', 'Test Type'), ('MEDICATION', 'Medication'), ('DOCTOR_FEE', 'Doctor Consultation Fee')], max_length=20)),
+                ('external_id', models.IntegerField()),
+                ('name', models.CharField(blank=True, max_length=255, null=True)),
+                ('price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('source_updated_at', models.DateTimeField(blank=True, null=True)),
+                ('synced_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Price Catalog Entries',
+                'unique_together': {('kind', 'external_id')},
+            },
+        ),
+    ]
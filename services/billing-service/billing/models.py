@@ -1,5 +1,6 @@
 from django.db import models
 from django.utils.translation import gettext_lazy as _
+from common_auth.outbox import EventOutboxBase
 
 
 class Invoice(models.Model):
@@ -160,3 +161,98 @@ class InsuranceClaim(models.Model):
 
     def __str__(self):
         return f"Claim #{self.claim_number} - {self.get_status_display()}"
+
+
+class PriceCatalogEntry(models.Model):
+    """
+    Local replica of a price owned by another service (test types, medications, doctor fees).
+    """
+    class Kind(models.TextChoices):
+        TEST_TYPE = 'TEST_TYPE', _('Test Type')
+        MEDICATION = 'MEDICATION', _('Medication')
+        DOCTOR_FEE = 'DOCTOR_FEE', _('Doctor Consultation Fee')
+
+    kind = models.CharField(max_length=20, choices=Kind.choices)
+    external_id = models.IntegerField()  # ID in the owning service
+    name = models.CharField(max_length=255, blank=True, null=True)
+    price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)  # None: the service has no price
+    source_updated_at = models.DateTimeField(null=True, blank=True)
+    synced_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['kind', 'external_id']
+        verbose_name_plural = "Price Catalog Entries"
+
+    def __str__(self):
+        return f"{self.kind} {self.external_id}: {self.price}"
+
+
+class BillingRun(models.Model):
+    """
+    Batch invoice generation run over many encounters or appointments.
+    """
+    class SourceType(models.TextChoices):
+        ENCOUNTER = 'ENCOUNTER', _('Encounter')
+        APPOINTMENT = 'APPOINTMENT', _('Appointment')
+
+    class Status(models.TextChoices):
+        PENDING = 'PENDING', _('Pending')
+        RUNNING = 'RUNNING', _('Running')
+        COMPLETED = 'COMPLETED', _('Completed')
+        FAILED = 'FAILED', _('Failed')
+
+    source_type = models.CharField(max_length=20, choices=SourceType.choices)
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.PENDING)
+    apply_insurance = models.BooleanField(default=True)
+    total = models.PositiveIntegerField(default=0)
+    succeeded = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+    skipped = models.PositiveIntegerField(default=0)
+    created_by = models.IntegerField(null=True, blank=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)  # Last checkpoint, used to detect interrupted runs
+    finished_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Billing run {self.id} ({self.source_type}, {self.status})"
+
+
+class BillingRunItem(models.Model):
+    """
+    One source ID of a billing run; its status is the run's checkpoint.
+    """
+    class Status(models.TextChoices):
+        PENDING = 'PENDING', _('Pending')
+        SUCCEEDED = 'SUCCEEDED', _('Succeeded')
+        FAILED = 'FAILED', _('Failed')
+        SKIPPED = 'SKIPPED', _('Skipped')
+
+    run = models.ForeignKey(BillingRun, on_delete=models.CASCADE, related_name='items')
+    source_id = models.IntegerField()
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.PENDING)
+    invoice_id = models.IntegerField(null=True, blank=True)
+    error = models.TextField(blank=True, null=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        unique_together = ['run', 'source_id']
+        indexes = [
+            models.Index(fields=['run', 'status', 'id'], name='billing_run_item_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"Run {self.run_id} {self.source_id}: {self.status}"
+
+
+class EventOutbox(EventOutboxBase):
+    """
+    Notification events written in the same transaction as the billing change
+    and published to the notification stream by relay_event_outbox.
+    """
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'available_at', 'id'], name='billing_outbox_pending_idx'),
+        ]
@@ -0,0 +1,17 @@
+"""
+Notification events of the Billing Service.
+
+Events are stored in EventOutbox in the caller's transaction and published to the
+notification stream by `python manage.py relay_event_outbox` (see common_auth.outbox).
+"""
+from common_auth.outbox import enqueue_event
+from .models import EventOutbox
+
+SERVICE_NAME = 'BILLING'
+
+
+def enqueue_notification(event_type, data, recipients=None):
+    """
+    Store a notification event; it is published only if the current transaction commits.
+    """
+    return enqueue_event(EventOutbox, SERVICE_NAME, event_type, data, recipients)
@@ -0,0 +1,249 @@
+"""
+Cached, asynchronous invoice PDF rendering.
+
+Rendered PDFs are stored in a content-addressed file cache. The cache key (also used as
+the ETag) is a hash of the invoice ID and the latest change to the invoice, its items,
+payments and insurance claims, so any change produces a new file and old files are
+never served. Rendering runs on a bounded background pool; concurrent requests for the
+same version share one render.
+"""
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Count, IntegerField, Max, OuterRef, Subquery
+from .models import Invoice, InvoiceItem, Payment, InsuranceClaim
+from .pdf_generator import generate_invoice_pdf
+
+logger = logging.getLogger(__name__)
+
+# Bump when billing/invoice_pdf.html or the PDF context changes to invalidate cached files
+TEMPLATE_VERSION = 1
+
+READ_CHUNK_SIZE = 64 * 1024
+
+_executor = None
+_executor_lock = threading.Lock()
+_in_flight = {}
+_in_flight_lock = threading.Lock()
+
+
+def get_cache_dir():
+    return getattr(settings, 'INVOICE_PDF_CACHE_DIR', os.path.join(settings.BASE_DIR, 'pdf_cache'))
+
+
+def get_render_executor():
+    """
+    Get the shared thread pool used for PDF rendering.
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'INVOICE_PDF_RENDER_WORKERS', 2),
+                    thread_name_prefix='billing-pdf'
+                )
+    return _executor
+
+
+def _related_state(model):
+    """
+    Subqueries for the latest updated_at and the row count of an invoice relation.
+    """
+    rows = model.objects.filter(invoice=OuterRef('pk')).order_by().values('invoice')
+    return (
+        Subquery(rows.annotate(latest=Max('updated_at')).values('latest')),
+        Subquery(rows.annotate(count=Count('id')).values('count'), output_field=IntegerField()),
+    )
+
+
+def with_pdf_state(queryset):
+    """
+    Annotate invoices with what their PDF depends on, so ETags of many invoices need one query.
+    """
+    annotations = {}
+    for name, model in (('items', InvoiceItem), ('payments', Payment), ('claims', InsuranceClaim)):
+        annotations[f'pdf_{name}_updated'], annotations[f'pdf_{name}_count'] = _related_state(model)
+    return queryset.annotate(**annotations)
+
+
+STATE_FIELDS = (
+    'updated_at', 'pdf_items_updated', 'pdf_items_count', 'pdf_payments_updated',
+    'pdf_payments_count', 'pdf_claims_updated', 'pdf_claims_count',
+)
+
+
+def invoice_pdf_etag(invoice):
+    """
+    Compute the cache key of an invoice's current PDF.
+
+    Args:
+        invoice: Invoice instance, ideally from a with_pdf_state() queryset (otherwise one query is made)
+
+    Returns:
+        str: Hex digest used as file name and ETag
+    """
+    if not hasattr(invoice, 'pdf_items_count'):
+        invoice = with_pdf_state(Invoice.objects.filter(pk=invoice.pk)).first() or invoice
+
+    key = ':'.join([str(invoice.pk), str(TEMPLATE_VERSION)] + [
+        value.isoformat() if hasattr(value, 'isoformat') else str(value)
+        for value in (getattr(invoice, field, None) for field in STATE_FIELDS)
+    ])
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+def _cache_path(etag):
+    return os.path.join(get_cache_dir(), etag[:2], f'{etag}.pdf')
+
+
+def get_cached_pdf_path(etag):
+    """
+    Returns:
+        str: Path of the cached PDF, or None if it has not been rendered yet
+    """
+    path = _cache_path(etag)
+    return path if os.path.exists(path) else None
+
+
+def _render_and_store(invoice_id, etag):
+    """
+    Render a PDF and write it to the cache (executed in a worker thread).
+
+    Returns:
+        str: Path of the cached PDF, or None if rendering failed
+    """
+    close_old_connections()
+    try:
+        path = _cache_path(etag)
+        if os.path.exists(path):
+            return path
+
+        pdf = generate_invoice_pdf(invoice_id)
+        if not pdf:
+            return None
+
+        # Write to a temporary file and rename so readers never see a partial PDF
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=os.path.dirname(path), suffix='.tmp', delete=False) as tmp:
+            tmp.write(pdf)
+        os.replace(tmp.name, path)
+        logger.info(f"Rendered PDF for invoice {invoice_id} ({len(pdf)} bytes)")
+        return path
+    except Exception as e:
+        logger.error(f"Error rendering PDF for invoice {invoice_id}: {str(e)}")
+        return None
+    finally:
+        close_old_connections()
+
+
+def request_invoice_pdf(invoice_id, etag):
+    """
+    Schedule rendering of an invoice PDF, sharing an in-flight render of the same version.
+
+    Returns:
+        Future: Resolves to the cached file path, or None if rendering failed
+    """
+    with _in_flight_lock:
+        future = _in_flight.get(etag)
+        if future is not None:
+            return future
+        future = get_render_executor().submit(_render_and_store, invoice_id, etag)
+        _in_flight[etag] = future
+
+    # Attached outside the lock: a future that is already done runs the callback
+    # immediately in this thread, and _forget takes the lock
+    future.add_done_callback(lambda _: _forget(etag))
+    return future
+
+
+def _forget(etag):
+    with _in_flight_lock:
+        _in_flight.pop(etag, None)
+
+
+class _ZipStream:
+    """
+    Write-only file object collecting the bytes zipfile writes, so they can be yielded.
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def iter_invoice_pdf_zip(invoices):
+    """
+    Stream a zip archive with the PDFs of several invoices.
+
+    All missing PDFs are scheduled up front; files are added to the archive in order as
+    their renders complete, so the response starts before the last PDF is rendered.
+
+    Args:
+        invoices: Invoice instances from a with_pdf_state() queryset
+
+    Yields:
+        bytes: Chunks of the zip archive
+    """
+    pending = []
+    for invoice in invoices:
+        etag = invoice_pdf_etag(invoice)
+        path = get_cached_pdf_path(etag)
+        pending.append((invoice, path or request_invoice_pdf(invoice.id, etag)))
+
+    stream = _ZipStream()
+    failed = []
+    with zipfile.ZipFile(stream, mode='w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for invoice, source in pending:
+            path = source if isinstance(source, str) else source.result()
+            if not path:
+                failed.append(invoice.invoice_number)
+                continue
+
+            with open(path, 'rb') as pdf, archive.open(f'invoice_{invoice.invoice_number}.pdf', mode='w') as entry:
+                for chunk in iter(lambda: pdf.read(READ_CHUNK_SIZE), b''):
+                    entry.write(chunk)
+                    yield stream.pop()
+
+        if failed:
+            archive.writestr('errors.txt', 'Failed to generate PDF for invoices:\n' + '\n'.join(failed) + '\n')
+    yield stream.pop()
+
+
+def prune_pdf_cache(max_age_seconds):
+    """
+    Remove cached PDFs not modified within max_age_seconds (superseded versions are never read again).
+
+    Returns:
+        int: Number of files removed
+    """
+    cutoff = time.time() - max_age_seconds
+    removed = 0
+    for root, _, files in os.walk(get_cache_dir()):
+        for name in files:
+            path = os.path.join(root, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                    removed += 1
+            except OSError as e:
+                logger.warning(f"Could not prune {path}: {str(e)}")
+    return removed
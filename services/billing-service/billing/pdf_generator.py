@@ -3,6 +3,7 @@ Module for generating PDF invoices.
 """
 import os
 import logging
+from functools import lru_cache
 from io import BytesIO
 from decimal import Decimal
 from datetime import datetime
@@ -17,12 +18,20 @@ from .models import Invoice
 logger = logging.getLogger(__name__)
 
 
-def render_to_pdf(template_src, context_dict={}):
+@lru_cache(maxsize=None)
+def _get_template(template_src):
+    """
+    Resolve and compile a template once per process.
+    """
+    return get_template(template_src)
+
+
+def render_to_pdf(template_src, context_dict=None):
     """
     Render HTML template to PDF.
     """
-    template = get_template(template_src)
-    html = template.render(context_dict)
+    template = _get_template(template_src)
+    html = template.render(context_dict or {})
     result = BytesIO()
     pdf = pisa.pisaDocument(BytesIO(html.encode("UTF-8")), result)
     if not pdf.err:
@@ -36,8 +45,9 @@ def generate_invoice_pdf(invoice_id):
     Generate PDF for an invoice.
     """
     try:
-        # Get invoice data
-        invoice = Invoice.objects.get(id=invoice_id)
+        # Get invoice data with its items, payments and claims in one query each
+        invoice = Invoice.objects.prefetch_related('items', 'payments', 'insurance_claims').get(id=invoice_id)
+        payments = list(invoice.payments.all())
         
         # Format currency values
         def format_currency(value):
@@ -55,7 +65,7 @@ def generate_invoice_pdf(invoice_id):
         context = {
             'invoice': invoice,
             'items': invoice.items.all(),
-            'payments': invoice.payments.all(),
+            'payments': payments,
             'insurance_claims': invoice.insurance_claims.all(),
             'total_amount': format_currency(invoice.total_amount),
             'discount': format_currency(invoice.discount),
@@ -73,7 +83,7 @@ def generate_invoice_pdf(invoice_id):
         }
         
         # Calculate total paid amount
-        total_paid = sum(payment.amount for payment in invoice.payments.all())
+        total_paid = sum(payment.amount for payment in payments)
         context['total_paid'] = format_currency(total_paid)
         context['balance'] = format_currency(invoice.final_amount - total_paid)
         
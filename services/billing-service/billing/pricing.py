@@ -0,0 +1,217 @@
+"""
+Price resolution for invoice generation.
+
+Prices for lab test types, medications and doctor consultation fees are read from the
+local price catalog replica (see catalog.py) when available. Anything not replicated is
+fetched from the owning services: IDs are deduplicated, uncached prices are fetched
+concurrently on a shared thread pool, and successful lookups are kept in a process-wide
+TTL cache so repeated invoices for the same services do not hit the network again.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from typing import Dict, NamedTuple, Optional
+from django.conf import settings
+from .catalog import MISSING, lookup_price
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONSULTATION_FEE = Decimal('200000')
+DEFAULT_LAB_TEST_FEE = Decimal('300000')
+DEFAULT_MEDICATION_FEE = Decimal('100000')
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """
+    Get the shared thread pool used for outbound price lookups.
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'PRICE_RESOLUTION_MAX_WORKERS', 8),
+                    thread_name_prefix='billing-pricing'
+                )
+    return _executor
+
+
+class PriceCatalogCache:
+    """
+    Thread-safe TTL cache of resolved prices.
+
+    Keys are (kind, id) tuples, e.g. ('test_type', 3) or ('medication', 12).
+    Only prices actually returned by a service are cached; defaults are not.
+    """
+
+    def __init__(self, ttl=None, max_size=None):
+        self.ttl = ttl if ttl is not None else getattr(settings, 'PRICE_CACHE_TTL', 300)
+        self.max_size = max_size or getattr(settings, 'PRICE_CACHE_SIZE', 10000)
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, kind, key):
+        with self._lock:
+            entry = self._entries.get((kind, key))
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[(kind, key)]
+                return None
+            return value
+
+    def set(self, kind, key, value):
+        with self._lock:
+            if len(self._entries) >= self.max_size:
+                # Drop expired entries first, then the oldest insertions
+                now = time.monotonic()
+                for cache_key in [k for k, (_, expires_at) in self._entries.items() if expires_at < now]:
+                    del self._entries[cache_key]
+                while len(self._entries) >= self.max_size:
+                    del self._entries[next(iter(self._entries))]
+            self._entries[(kind, key)] = (value, time.monotonic() + self.ttl)
+
+    def invalidate(self, kind=None, key=None):
+        """
+        Drop one entry, all entries of a kind, or the whole cache.
+        """
+        with self._lock:
+            if kind is None:
+                self._entries.clear()
+            elif key is None:
+                for cache_key in [k for k in self._entries if k[0] == kind]:
+                    del self._entries[cache_key]
+            else:
+                self._entries.pop((kind, key), None)
+
+
+price_cache = PriceCatalogCache()
+
+
+class EncounterPrices(NamedTuple):
+    """
+    Prices resolved for one encounter.
+
+    consultation_fee: Doctor consultation fee
+    lab_test_fees: {lab_test_id: fee}
+    medication_prices: {medication_id: unit price}, None when the pharmacy has no price
+    """
+    consultation_fee: Decimal
+    lab_test_fees: Dict[int, Decimal]
+    medication_prices: Dict[int, Optional[Decimal]]
+
+
+def _to_price(value):
+    return Decimal(str(value)) if value else None
+
+
+def _fetch_doctor_fee(doctor_id, headers):
+    from .services import UserServiceClient
+    doctor = UserServiceClient().get_doctor(doctor_id, headers)
+    return _to_price(doctor.get('consultation_fee')) if doctor else None
+
+
+def _fetch_lab_test_type(lab_test_id, headers):
+    from .services import LaboratoryServiceClient
+    test_info = LaboratoryServiceClient().get_lab_test(lab_test_id, headers)
+    return test_info.get('test_type') if test_info else None
+
+
+def _fetch_test_type_price(type_id, headers):
+    from .services import LaboratoryServiceClient
+    test_type = LaboratoryServiceClient().get_test_type(type_id, headers)
+    return _to_price(test_type.get('price')) if test_type else None
+
+
+def _fetch_medication_price(medication_id, headers):
+    from .services import PharmacyServiceClient
+    medication = PharmacyServiceClient().get_medication(medication_id, headers)
+    return _to_price(medication.get('price')) if medication else None
+
+
+def _submit_many(kind, ids, fetch, headers):
+    """
+    Look up unique IDs in the catalog replica and the cache, and submit fetches for the missing ones.
+
+    Returns:
+        tuple: (dict {id: cached value}, dict {id: Future})
+    """
+    resolved = {}
+    futures = {}
+    for key in dict.fromkeys(ids):
+        if key is None:
+            continue
+        replicated = lookup_price(kind, key)
+        if replicated is not MISSING:
+            resolved[key] = replicated
+            continue
+        cached = price_cache.get(kind, key)
+        if cached is not None:
+            resolved[key] = cached
+        else:
+            futures[key] = get_executor().submit(fetch, key, headers)
+    return resolved, futures
+
+
+def _collect(kind, resolved, futures):
+    """
+    Wait for submitted fetches and cache their results.
+
+    Returns:
+        dict: {id: value} (value is None when the lookup failed)
+    """
+    for key, future in futures.items():
+        try:
+            value = future.result()
+        except Exception as e:
+            logger.error(f"Error resolving {kind} {key}: {str(e)}")
+            value = None
+        if value is not None:
+            price_cache.set(kind, key, value)
+        resolved[key] = value
+    return resolved
+
+
+def resolve_encounter_prices(encounter, headers=None):
+    """
+    Resolve all prices needed to invoice an encounter.
+
+    Doctor fee, lab test -> test type mappings and medication prices are resolved
+    concurrently; test type prices are then fetched once per distinct test type.
+
+    Args:
+        encounter: Encounter data from the Medical Record Service
+        headers: Headers forwarded to the other services
+
+    Returns:
+        EncounterPrices: Resolved prices, falling back to defaults where unavailable
+    """
+    lab_test_ids = [lab_test['id'] for lab_test in encounter.get('lab_tests') or []]
+    medication_ids = [medication['id'] for medication in encounter.get('medications') or []]
+    doctor_id = encounter.get('doctor_id')
+
+    # Independent lookups are all in flight before waiting on any of them
+    doctor_pending = _submit_many('doctor_fee', [doctor_id], _fetch_doctor_fee, headers)
+    medication_pending = _submit_many('medication', medication_ids, _fetch_medication_price, headers)
+    lab_test_pending = _submit_many('lab_test_type', lab_test_ids, _fetch_lab_test_type, headers)
+
+    lab_test_types = _collect('lab_test_type', *lab_test_pending)
+    test_type_prices = _collect('test_type', *_submit_many('test_type', lab_test_types.values(), _fetch_test_type_price, headers))
+    medication_prices = _collect('medication', *medication_pending)
+    doctor_fees = _collect('doctor_fee', *doctor_pending)
+
+    lab_test_fees = {}
+    for lab_test_id in lab_test_ids:
+        lab_test_fees[lab_test_id] = test_type_prices.get(lab_test_types.get(lab_test_id)) or DEFAULT_LAB_TEST_FEE
+
+    return EncounterPrices(
+        consultation_fee=doctor_fees.get(doctor_id) or DEFAULT_CONSULTATION_FEE,
+        lab_test_fees=lab_test_fees,
+        medication_prices=medication_prices
+    )
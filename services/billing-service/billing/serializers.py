@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Invoice, InvoiceItem, Payment, InsuranceClaim
+from .models import Invoice, InvoiceItem, Payment, InsuranceClaim, PriceCatalogEntry, BillingRun, BillingRunItem
 
 
 class InvoiceItemSerializer(serializers.ModelSerializer):
@@ -116,3 +116,42 @@ class InsuranceClaimCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = InsuranceClaim
         fields = ['insurance_provider_id', 'policy_number', 'member_id', 'claim_number', 'claim_amount', 'submission_date', 'status', 'approved_amount', 'rejection_reason', 'notes']
+
+
+class PriceCatalogEntrySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = PriceCatalogEntry
+        fields = '__all__'
+        read_only_fields = ['synced_at']
+
+
+class PriceCatalogItemSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    name = serializers.CharField(required=False, allow_null=True, allow_blank=True)
+    price = serializers.DecimalField(max_digits=10, decimal_places=2, required=False, allow_null=True)
+    updated_at = serializers.DateTimeField(required=False, allow_null=True)
+
+
+class PriceCatalogSyncSerializer(serializers.Serializer):
+    kind = serializers.ChoiceField(choices=PriceCatalogEntry.Kind.choices)
+    items = PriceCatalogItemSerializer(many=True)
+    full = serializers.BooleanField(default=False)
+
+
+class BillingRunItemSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = BillingRunItem
+        fields = ['id', 'source_id', 'status', 'invoice_id', 'error', 'processed_at']
+
+
+class BillingRunSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = BillingRun
+        fields = '__all__'
+
+
+class BillingRunCreateSerializer(serializers.Serializer):
+    source_type = serializers.ChoiceField(choices=BillingRun.SourceType.choices)
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=100000)
+    apply_insurance = serializers.BooleanField(default=True)
+    max_workers = serializers.IntegerField(required=False, min_value=1, max_value=32)
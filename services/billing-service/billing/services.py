@@ -3,11 +3,22 @@ Services for interacting with other services in the healthcare system.
 """
 import requests
 import logging
+from requests.adapters import HTTPAdapter
 from django.conf import settings
 from decimal import Decimal
+from .pricing import DEFAULT_MEDICATION_FEE
 
 logger = logging.getLogger(__name__)
 
+# Shared session so that connections to other services are reused across requests and threads
+_session = requests.Session()
+_session.mount('http://', HTTPAdapter(pool_connections=10, pool_maxsize=32))
+_session.mount('https://', HTTPAdapter(pool_connections=10, pool_maxsize=32))
+
+# (connect, read) timeout in seconds for calls to other services
+REQUEST_TIMEOUT = getattr(settings, 'SERVICE_REQUEST_TIMEOUT', (3, 15))
+
+
 class ServiceClient:
     """
     Base client for interacting with other services.
@@ -20,7 +31,7 @@ class ServiceClient:
         Make a GET request to the service.
         """
         try:
-            response = requests.get(f"{self.base_url}{endpoint}", headers=headers)
+            response = _session.get(f"{self.base_url}{endpoint}", headers=headers, timeout=REQUEST_TIMEOUT)
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
@@ -140,7 +151,7 @@ class PharmacyServiceClient(ServiceClient):
         return self.get(f"/api/medications/{medication_id}/", headers=headers)
 
 
-def create_invoice_from_appointment(appointment_id, headers=None):
+def create_invoice_from_appointment(appointment_id, headers=None, apply_insurance=True, insurance_lookup=None):
     """
     Create an invoice from an appointment.
     """
@@ -182,7 +193,8 @@ def create_invoice_from_appointment(appointment_id, headers=None):
     )
 
     # Apply insurance if available
-    apply_insurance_to_invoice(invoice, headers)
+    if apply_insurance:
+        apply_insurance_to_invoice(invoice, headers, insurance_lookup)
 
     return invoice
 
@@ -315,11 +327,17 @@ def create_invoice_from_prescription(prescription_id, headers=None):
     return invoice
 
 
-def create_invoice_from_encounter(encounter_id, headers=None):
+def create_invoice_from_encounter(encounter_id, headers=None, apply_insurance=True, insurance_lookup=None):
     """
     Create an invoice from an encounter.
+
+    The medical record lookup and all price lookups run concurrently (see pricing.py),
+    and invoice items are written with a single bulk_create.
     """
+    from django.db import transaction
+    from django.utils import timezone
     from .models import Invoice, InvoiceItem
+    from .pricing import get_executor, resolve_encounter_prices
 
     # Get encounter information
     client = MedicalRecordServiceClient()
@@ -329,8 +347,10 @@ def create_invoice_from_encounter(encounter_id, headers=None):
         logger.error(f"Could not retrieve encounter {encounter_id}")
         return None
 
-    # Get patient information from medical record
-    medical_record = client.get_medical_record(encounter['medical_record'], headers)
+    # Get patient information from medical record while prices are being resolved
+    medical_record_future = get_executor().submit(client.get_medical_record, encounter['medical_record'], headers)
+    prices = resolve_encounter_prices(encounter, headers)
+    medical_record = medical_record_future.result()
     if not medical_record:
         logger.error(f"Could not retrieve medical record for encounter {encounter_id}")
         return None
@@ -338,7 +358,6 @@ def create_invoice_from_encounter(encounter_id, headers=None):
     patient_id = medical_record['patient_id']
 
     # Get current date if encounter_date is not available
-    from django.utils import timezone
     current_date = timezone.now().strftime('%Y-%m-%d')
 
     # Use encounter_date if available, otherwise use current date
@@ -348,107 +367,72 @@ def create_invoice_from_encounter(encounter_id, headers=None):
     else:
         issue_date = current_date
 
-    # Create invoice with unique invoice number
-    from django.utils import timezone
-    timestamp = timezone.now().strftime('%Y%m%d%H%M%S')
-    invoice = Invoice.objects.create(
-        patient_id=patient_id,
-        invoice_number=f"INV-ENC-{encounter_id}-{timestamp}",
-        status=Invoice.Status.PENDING,
-        issue_date=issue_date,
-        due_date=issue_date,  # Due same day
-        total_amount=Decimal('0'),  # Will be updated after adding items
-        discount=Decimal('0'),
-        tax=Decimal('0'),
-        final_amount=Decimal('0'),  # Will be updated after adding items
-        notes=f"Invoice for encounter on {issue_date}"
-    )
-
-    # Add items based on encounter data
-    total_amount = Decimal('0')
-
-    # Add consultation fee
-    consultation_fee = Decimal('200000')  # Default consultation fee
-    if encounter.get('doctor_id'):
-        # Get doctor information to get consultation fee
-        user_client = UserServiceClient()
-        doctor = user_client.get_doctor(encounter['doctor_id'], headers)
-        if doctor and doctor.get('consultation_fee'):
-            consultation_fee = Decimal(str(doctor['consultation_fee']))
-
-    InvoiceItem.objects.create(
-        invoice=invoice,
+    # Build items based on encounter data
+    items = [InvoiceItem(
         item_type=InvoiceItem.ItemType.CONSULTATION,
         description=f"Consultation Fee",
         quantity=1,
-        unit_price=consultation_fee,
-        total_price=consultation_fee,
+        unit_price=prices.consultation_fee,
+        total_price=prices.consultation_fee,
         reference_id=encounter_id,
         service_type='encounter',
         encounter_id=encounter_id
-    )
-
-    total_amount += consultation_fee
+    )]
 
     # Add lab tests if available
-    if 'lab_tests' in encounter and encounter['lab_tests']:
-        for lab_test in encounter['lab_tests']:
-            lab_test_fee = Decimal('300000')  # Default lab test fee
-
-            # Try to get actual lab test fee
-            lab_client = LaboratoryServiceClient()
-            test_info = lab_client.get_lab_test(lab_test['id'], headers)
-            if test_info and test_info.get('test_type'):
-                test_type = lab_client.get_test_type(test_info['test_type'], headers)
-                if test_type and test_type.get('price'):
-                    lab_test_fee = Decimal(str(test_type['price']))
-
-            InvoiceItem.objects.create(
-                invoice=invoice,
-                item_type=InvoiceItem.ItemType.LAB_TEST,
-                description=f"Laboratory Test: {lab_test.get('test_name', 'Unknown')}",
-                quantity=1,
-                unit_price=lab_test_fee,
-                total_price=lab_test_fee,
-                reference_id=lab_test['id'],
-                service_type='laboratory',
-                lab_test_id=lab_test['id']
-            )
-
-            total_amount += lab_test_fee
+    for lab_test in encounter.get('lab_tests') or []:
+        lab_test_fee = prices.lab_test_fees[lab_test['id']]
+        items.append(InvoiceItem(
+            item_type=InvoiceItem.ItemType.LAB_TEST,
+            description=f"Laboratory Test: {lab_test.get('test_name', 'Unknown')}",
+            quantity=1,
+            unit_price=lab_test_fee,
+            total_price=lab_test_fee,
+            reference_id=lab_test['id'],
+            service_type='laboratory',
+            lab_test_id=lab_test['id']
+        ))
 
     # Add medications if available
-    if 'medications' in encounter and encounter['medications']:
-        for medication in encounter['medications']:
-            medication_fee = Decimal('100000')  # Default medication fee
-
-            # Try to get actual medication fee
-            pharmacy_client = PharmacyServiceClient()
-            med_info = pharmacy_client.get_medication(medication['id'], headers)
-            if med_info and med_info.get('price'):
-                medication_fee = Decimal(str(med_info['price'])) * Decimal(str(medication.get('quantity', 1)))
-
-            InvoiceItem.objects.create(
-                invoice=invoice,
-                item_type=InvoiceItem.ItemType.MEDICATION,
-                description=f"Medication: {medication.get('medication_name', 'Unknown')}",
-                quantity=medication.get('quantity', 1),
-                unit_price=medication_fee / Decimal(str(medication.get('quantity', 1))),
-                total_price=medication_fee,
-                reference_id=medication['id'],
-                service_type='pharmacy',
-                medication_id=medication['id']
-            )
-
-            total_amount += medication_fee
+    for medication in encounter.get('medications') or []:
+        quantity = Decimal(str(medication.get('quantity', 1)))
+        unit_price = prices.medication_prices.get(medication['id'])
+        medication_fee = unit_price * quantity if unit_price else DEFAULT_MEDICATION_FEE
+        items.append(InvoiceItem(
+            item_type=InvoiceItem.ItemType.MEDICATION,
+            description=f"Medication: {medication.get('medication_name', 'Unknown')}",
+            quantity=medication.get('quantity', 1),
+            unit_price=medication_fee / quantity,
+            total_price=medication_fee,
+            reference_id=medication['id'],
+            service_type='pharmacy',
+            medication_id=medication['id']
+        ))
 
-    # Update invoice total
-    invoice.total_amount = total_amount
-    invoice.final_amount = total_amount
-    invoice.save()
+    total_amount = sum((item.total_price for item in items), Decimal('0'))
+
+    # Create invoice with unique invoice number
+    timestamp = timezone.now().strftime('%Y%m%d%H%M%S')
+    with transaction.atomic():
+        invoice = Invoice.objects.create(
+            patient_id=patient_id,
+            invoice_number=f"INV-ENC-{encounter_id}-{timestamp}",
+            status=Invoice.Status.PENDING,
+            issue_date=issue_date,
+            due_date=issue_date,  # Due same day
+            total_amount=total_amount,
+            discount=Decimal('0'),
+            tax=Decimal('0'),
+            final_amount=total_amount,
+            notes=f"Invoice for encounter on {issue_date}"
+        )
+        for item in items:
+            item.invoice = invoice
+        InvoiceItem.objects.bulk_create(items)
 
     # Apply insurance if available
-    apply_insurance_to_invoice(invoice, headers)
+    if apply_insurance:
+        apply_insurance_to_invoice(invoice, headers, insurance_lookup)
 
     return invoice
 
@@ -526,18 +510,19 @@ def create_invoice_from_medical_record(record_id, headers=None):
     return invoice
 
 
-def apply_insurance_to_invoice(invoice, headers=None):
-    """
-    Apply insurance coverage to an invoice if the patient has insurance.
+def get_insurance_coverage(patient_id, headers=None):
     """
-    from .models import InsuranceClaim
+    Look up the patient's active insurance policy and its provider.
 
+    Returns:
+        tuple: (active insurance policy, provider), or None if the patient has no usable insurance
+    """
     # Get patient's insurance information
     user_client = UserServiceClient()
-    insurance_info = user_client.get_patient_insurance(invoice.patient_id, headers)
+    insurance_info = user_client.get_patient_insurance(patient_id, headers)
 
     if not insurance_info or 'results' not in insurance_info or not insurance_info['results']:
-        logger.info(f"No insurance information found for patient {invoice.patient_id}")
+        logger.info(f"No insurance information found for patient {patient_id}")
         return None
 
     # Get the first active insurance policy
@@ -548,7 +533,7 @@ def apply_insurance_to_invoice(invoice, headers=None):
             break
 
     if not active_insurance:
-        logger.info(f"No active insurance found for patient {invoice.patient_id}")
+        logger.info(f"No active insurance found for patient {patient_id}")
         return None
 
     # Get insurance provider details
@@ -559,6 +544,28 @@ def apply_insurance_to_invoice(invoice, headers=None):
         logger.error(f"Could not retrieve insurance provider {provider_id}")
         return None
 
+    return active_insurance, provider
+
+
+def apply_insurance_to_invoice(invoice, headers=None, insurance_lookup=None):
+    """
+    Apply insurance coverage to an invoice if the patient has insurance.
+
+    Args:
+        invoice: Invoice to apply coverage to
+        headers: Headers forwarded to the other services
+        insurance_lookup: Callable (patient_id, headers) -> coverage, defaults to get_insurance_coverage.
+            Batch runs pass a per-run cache so each patient is looked up once.
+    """
+    from .models import InsuranceClaim
+
+    coverage = (insurance_lookup or get_insurance_coverage)(invoice.patient_id, headers)
+    if not coverage:
+        return None
+
+    active_insurance, provider = coverage
+    provider_id = active_insurance.get('provider')
+
     # Calculate coverage based on insurance policy
     # Try to get coverage_percentage directly, or calculate from coinsurance_rate
     coverage_percentage = Decimal('0')
@@ -577,53 +584,44 @@ def apply_insurance_to_invoice(invoice, headers=None):
     covered_amount = (invoice.total_amount * coverage_percentage) / Decimal('100')
     patient_responsibility = invoice.total_amount - covered_amount
 
-    # Update invoice with insurance discount
-    invoice.discount = covered_amount
-    invoice.final_amount = patient_responsibility
-    invoice.notes += f"\nInsurance coverage: {coverage_percentage}% by {provider.get('name', 'Unknown Provider')}"
-    invoice.save()
-
     # Generate a unique claim number
     import uuid
+    from django.db import transaction
     from django.utils import timezone
+    from .outbox import enqueue_notification
 
     # Format: CLM-{provider_id}-{invoice_id}-{timestamp}-{random_uuid}
     claim_number = f"CLM-{provider_id}-{invoice.id}-{int(timezone.now().timestamp())}-{str(uuid.uuid4())[:8]}"
 
-    # Create insurance claim
-    claim = InsuranceClaim.objects.create(
-        invoice=invoice,
-        insurance_provider_id=provider_id,
-        policy_number=active_insurance.get('policy_number', ''),
-        member_id=active_insurance.get('member_id', ''),
-        claim_number=claim_number,  # Add unique claim number
-        claim_amount=covered_amount,
-        status=InsuranceClaim.Status.SUBMITTED,
-        submission_date=invoice.issue_date,
-        notes=f"Automatic claim for invoice {invoice.invoice_number}"
-    )
+    with transaction.atomic():
+        # Update invoice with insurance discount
+        invoice.discount = covered_amount
+        invoice.final_amount = patient_responsibility
+        invoice.notes += f"\nInsurance coverage: {coverage_percentage}% by {provider.get('name', 'Unknown Provider')}"
+        invoice.save()
 
-    # Send notification about insurance claim
-    try:
-        notification_data = {
-            "service": "BILLING",
-            "event_type": "INSURANCE_CLAIM_SUBMITTED",
+        # Create insurance claim
+        claim = InsuranceClaim.objects.create(
+            invoice=invoice,
+            insurance_provider_id=provider_id,
+            policy_number=active_insurance.get('policy_number', ''),
+            member_id=active_insurance.get('member_id', ''),
+            claim_number=claim_number,  # Add unique claim number
+            claim_amount=covered_amount,
+            status=InsuranceClaim.Status.SUBMITTED,
+            submission_date=invoice.issue_date,
+            notes=f"Automatic claim for invoice {invoice.invoice_number}"
+        )
+
+        # Notification about the insurance claim is published by the outbox relay after commit
+        enqueue_notification('INSURANCE_CLAIM_SUBMITTED', {
             "patient_id": invoice.patient_id,
             "invoice_id": invoice.id,
             "claim_id": claim.id,
             "provider_name": provider.get('name', 'Unknown Provider'),
             "claim_amount": str(covered_amount),
-            "patient_responsibility": str(patient_responsibility)
-        }
-
-        # Send to notification service
-        requests.post(
-            f"{settings.API_GATEWAY_URL}/api/events",
-            json=notification_data,
-            headers=headers,
-            timeout=5
-        )
-    except Exception as e:
-        logger.error(f"Error sending insurance claim notification: {str(e)}")
+            "patient_responsibility": str(patient_responsibility),
+            "message": f"An insurance claim has been submitted for invoice {invoice.invoice_number}."
+        })
 
     return claim
@@ -1,8 +1,9 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from common_auth import register_health_check
 from .views import (
     InvoiceViewSet, InvoiceItemViewSet, PaymentViewSet, InsuranceClaimViewSet,
-    InvoiceCreationViewSet
+    InvoiceCreationViewSet, PriceCatalogViewSet, BillingRunViewSet
 )
 
 router = DefaultRouter()
@@ -11,6 +12,8 @@ router.register(r'invoice-items', InvoiceItemViewSet)
 router.register(r'payments', PaymentViewSet)
 router.register(r'insurance-claims', InsuranceClaimViewSet)
 router.register(r'invoice-creation', InvoiceCreationViewSet, basename='invoice-creation')
+router.register(r'price-catalog', PriceCatalogViewSet)
+router.register(r'billing-runs', BillingRunViewSet)
 
 urlpatterns = [
     path('', include(router.urls)),
@@ -23,3 +26,6 @@ urlpatterns = [
     path('create-from-medical-record/', InvoiceCreationViewSet.as_view({'post': 'from_medical_record'}), name='create-from-medical-record'),
     path('create-from-encounter/', InvoiceCreationViewSet.as_view({'post': 'from_encounter'}), name='create-from-encounter'),
 ]
+
+# Register health check and metrics endpoints
+urlpatterns = register_health_check(urlpatterns)
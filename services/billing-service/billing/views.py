@@ -1,4 +1,3 @@
-import requests
 import logging
 from rest_framework import viewsets, status, filters
 from rest_framework.decorators import action, api_view, permission_classes
@@ -7,14 +6,19 @@ from rest_framework.permissions import IsAuthenticated
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
 from django.conf import settings
-from django.http import HttpResponse
+from django.db import transaction
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils.http import parse_etags
+from concurrent.futures import TimeoutError as RenderTimeoutError
 
 logger = logging.getLogger(__name__)
-from .models import Invoice, InvoiceItem, Payment, InsuranceClaim
+from .models import Invoice, InvoiceItem, Payment, InsuranceClaim, PriceCatalogEntry, BillingRun
 from .serializers import (
     InvoiceSerializer, InvoiceDetailSerializer, InvoiceCreateSerializer,
     InvoiceItemSerializer, PaymentSerializer, PaymentCreateSerializer,
-    InsuranceClaimSerializer, InsuranceClaimCreateSerializer
+    InsuranceClaimSerializer, InsuranceClaimCreateSerializer,
+    PriceCatalogEntrySerializer, PriceCatalogSyncSerializer,
+    BillingRunSerializer, BillingRunItemSerializer, BillingRunCreateSerializer
 )
 from .authentication import HeaderAuthentication
 from .permissions import IsAdmin, IsAdminOrBillingStaff, IsPatientOwner, IsAdminOrOwner
@@ -23,7 +27,12 @@ from .services import (
     create_invoice_from_prescription, create_invoice_from_medical_record,
     create_invoice_from_encounter, apply_insurance_to_invoice
 )
-from .pdf_generator import generate_invoice_pdf
+from .outbox import enqueue_notification
+from .pdf_cache import (
+    invoice_pdf_etag, get_cached_pdf_path, request_invoice_pdf, with_pdf_state, iter_invoice_pdf_zip
+)
+from .catalog import upsert_prices, reconcile as reconcile_catalog
+from .batch import create_billing_run, claim_billing_run, retry_failed_items, start_billing_run_in_background
 
 
 class InvoiceViewSet(viewsets.ModelViewSet):
@@ -185,41 +194,29 @@ class InvoiceViewSet(viewsets.ModelViewSet):
         serializer = PaymentCreateSerializer(data=payment_data)
 
         if serializer.is_valid():
-            payment = serializer.save(invoice=invoice)
+            with transaction.atomic():
+                payment = serializer.save(invoice=invoice)
 
-            # Update invoice status
-            from decimal import Decimal
-            total_paid = sum(p.amount for p in invoice.payments.all())
+                # Update invoice status
+                total_paid = sum(p.amount for p in invoice.payments.all())
 
-            if total_paid >= invoice.final_amount:
-                invoice.status = Invoice.Status.PAID
-            elif total_paid > 0:
-                invoice.status = Invoice.Status.PARTIALLY_PAID
+                if total_paid >= invoice.final_amount:
+                    invoice.status = Invoice.Status.PAID
+                elif total_paid > 0:
+                    invoice.status = Invoice.Status.PARTIALLY_PAID
 
-            invoice.save()
+                invoice.save()
 
-            # Send notification
-            try:
-                notification_data = {
-                    "service": "BILLING",
-                    "event_type": "PAYMENT_RECEIVED",
+                # Notification is published by the outbox relay after commit
+                enqueue_notification('PAYMENT_RECEIVED', {
                     "patient_id": invoice.patient_id,
                     "invoice_id": invoice.id,
                     "payment_id": payment.id,
                     "amount": str(amount),
                     "payment_method": payment_method,
-                    "invoice_status": invoice.status
-                }
-
-                # Send to notification service
-                requests.post(
-                    f"{settings.API_GATEWAY_URL}/api/events",
-                    json=notification_data,
-                    headers=request.headers,
-                    timeout=5
-                )
-            except Exception as e:
-                logger.error(f"Error sending payment notification: {str(e)}")
+                    "invoice_status": invoice.status,
+                    "message": f"Payment of {amount} received for invoice {invoice.invoice_number}."
+                })
 
             # Return updated invoice
             serializer = InvoiceDetailSerializer(invoice)
@@ -231,24 +228,78 @@ class InvoiceViewSet(viewsets.ModelViewSet):
     def export_pdf(self, request, pk=None):
         """
         Export invoice as PDF.
+
+        PDFs are rendered in the background and cached per invoice version. If rendering
+        takes longer than INVOICE_PDF_RENDER_WAIT seconds, 202 is returned and the client
+        retries the same URL. Supports If-None-Match.
         """
         invoice = self.get_object()
+        etag = invoice_pdf_etag(invoice)
+        quoted_etag = f'"{etag}"'
 
-        # Generate PDF
-        pdf_file = generate_invoice_pdf(invoice.id)
+        if quoted_etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = HttpResponseNotModified()
+            response['ETag'] = quoted_etag
+            return response
+
+        pdf_path = get_cached_pdf_path(etag)
+        if pdf_path is None:
+            try:
+                pdf_path = request_invoice_pdf(invoice.id, etag).result(
+                    timeout=getattr(settings, 'INVOICE_PDF_RENDER_WAIT', 5)
+                )
+            except RenderTimeoutError:
+                return Response(
+                    {'status': 'rendering', 'message': 'PDF is being generated, retry shortly'},
+                    status=status.HTTP_202_ACCEPTED,
+                    headers={'Retry-After': '2'}
+                )
 
-        if not pdf_file:
+        if not pdf_path:
             return Response(
                 {'error': 'Failed to generate PDF'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
         # Create response with PDF
-        response = HttpResponse(pdf_file, content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename="invoice_{invoice.invoice_number}.pdf"'
+        response = FileResponse(
+            open(pdf_path, 'rb'),
+            content_type='application/pdf',
+            as_attachment=True,
+            filename=f'invoice_{invoice.invoice_number}.pdf'
+        )
+        response['ETag'] = quoted_etag
+        response['Cache-Control'] = 'private, no-cache'
 
         return response
 
+    @action(detail=False, methods=['post'])
+    def export_pdfs(self, request):
+        """
+        Export several invoices as a streamed zip of PDFs.
+        """
+        invoice_ids = request.data.get('invoice_ids')
+        if not isinstance(invoice_ids, list) or not invoice_ids:
+            return Response({'error': 'invoice_ids must be a non-empty list'}, status=status.HTTP_400_BAD_REQUEST)
+
+        max_invoices = getattr(settings, 'INVOICE_PDF_BULK_MAX', 500)
+        if len(invoice_ids) > max_invoices:
+            return Response({'error': f'At most {max_invoices} invoices can be exported at once'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            invoice_ids = [int(invoice_id) for invoice_id in invoice_ids]
+        except (TypeError, ValueError):
+            return Response({'error': 'invoice_ids must contain integers'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # get_queryset applies the patient restriction
+        invoices = list(with_pdf_state(self.get_queryset().filter(id__in=invoice_ids)).order_by('id'))
+        if not invoices:
+            return Response({'error': 'No invoices found'}, status=status.HTTP_404_NOT_FOUND)
+
+        response = StreamingHttpResponse(iter_invoice_pdf_zip(invoices), content_type='application/zip')
+        response['Content-Disposition'] = f'attachment; filename="invoices_{timezone.now().strftime("%Y%m%d%H%M%S")}.zip"'
+        return response
+
 
 class InvoiceItemViewSet(viewsets.ModelViewSet):
     """
@@ -421,40 +472,29 @@ class InsuranceClaimViewSet(viewsets.ModelViewSet):
         serializer = PaymentCreateSerializer(data=payment_data)
 
         if serializer.is_valid():
-            payment = serializer.save(invoice=claim.invoice)
+            with transaction.atomic():
+                payment = serializer.save(invoice=claim.invoice)
 
-            # Update invoice status
-            total_paid = sum(p.amount for p in claim.invoice.payments.all())
+                # Update invoice status
+                total_paid = sum(p.amount for p in claim.invoice.payments.all())
 
-            if total_paid >= claim.invoice.final_amount:
-                claim.invoice.status = Invoice.Status.PAID
-            elif total_paid > 0:
-                claim.invoice.status = Invoice.Status.PARTIALLY_PAID
+                if total_paid >= claim.invoice.final_amount:
+                    claim.invoice.status = Invoice.Status.PAID
+                elif total_paid > 0:
+                    claim.invoice.status = Invoice.Status.PARTIALLY_PAID
 
-            claim.invoice.save()
+                claim.invoice.save()
 
-            # Send notification
-            try:
-                notification_data = {
-                    "service": "BILLING",
-                    "event_type": "INSURANCE_PAYMENT_RECEIVED",
+                # Notification is published by the outbox relay after commit
+                enqueue_notification('INSURANCE_PAYMENT_RECEIVED', {
                     "patient_id": claim.invoice.patient_id,
                     "invoice_id": claim.invoice.id,
                     "claim_id": claim.id,
                     "payment_id": payment.id,
                     "amount": str(amount),
-                    "invoice_status": claim.invoice.status
-                }
-
-                # Send to notification service
-                requests.post(
-                    f"{settings.API_GATEWAY_URL}/api/events",
-                    json=notification_data,
-                    headers=request.headers,
-                    timeout=5
-                )
-            except Exception as e:
-                logger.error(f"Error sending insurance payment notification: {str(e)}")
+                    "invoice_status": claim.invoice.status,
+                    "message": f"Insurance payment of {amount} received for invoice {claim.invoice.invoice_number}."
+                })
 
             # Return updated claim
             serializer = InsuranceClaimSerializer(claim)
@@ -463,6 +503,121 @@ class InsuranceClaimViewSet(viewsets.ModelViewSet):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+class PriceCatalogViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    API endpoint for the local price catalog replica.
+    """
+    queryset = PriceCatalogEntry.objects.all().order_by('kind', 'external_id')
+    serializer_class = PriceCatalogEntrySerializer
+    authentication_classes = [HeaderAuthentication]
+    permission_classes = [IsAdminOrBillingStaff]
+    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
+    search_fields = ['kind', 'name']
+    ordering_fields = ['kind', 'external_id', 'price', 'synced_at']
+
+    @action(detail=False, methods=['post'])
+    def sync(self, request):
+        """
+        Bulk insert or update prices of one kind.
+        With full=true the items replace the whole catalog of that kind.
+        """
+        serializer = PriceCatalogSyncSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        written, removed = upsert_prices(
+            serializer.validated_data['kind'],
+            serializer.validated_data['items'],
+            full=serializer.validated_data['full']
+        )
+        return Response({'written': written, 'removed': removed}, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['get'])
+    def reconcile(self, request):
+        """
+        Report drift between the replica and the owning services.
+        """
+        kinds = request.query_params.getlist('kind') or None
+        if kinds and any(kind not in PriceCatalogEntry.Kind.values for kind in kinds):
+            return Response({'error': f"kind must be one of {', '.join(PriceCatalogEntry.Kind.values)}"}, status=status.HTTP_400_BAD_REQUEST)
+        report = reconcile_catalog(kinds, request.headers)
+        return Response(report, status=status.HTTP_200_OK)
+
+
+class BillingRunViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    API endpoint for batch invoice generation (e.g. month-end billing).
+    Runs are processed in the background; poll the run for progress.
+    """
+    queryset = BillingRun.objects.all().order_by('-created_at')
+    serializer_class = BillingRunSerializer
+    authentication_classes = [HeaderAuthentication]
+    permission_classes = [IsAdminOrBillingStaff]
+    filter_backends = [filters.OrderingFilter]
+    ordering_fields = ['created_at', 'status']
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        run_status = self.request.query_params.get('status')
+        if run_status:
+            queryset = queryset.filter(status=run_status)
+        return queryset
+
+    def create(self, request):
+        """
+        Create a billing run for a list of encounter or appointment IDs and start it.
+        """
+        serializer = BillingRunCreateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        run = create_billing_run(
+            serializer.validated_data['source_type'],
+            serializer.validated_data['ids'],
+            apply_insurance=serializer.validated_data['apply_insurance'],
+            created_by=getattr(request.user, 'id', None)
+        )
+        claim_billing_run(run)
+        start_billing_run_in_background(run, request.headers, serializer.validated_data.get('max_workers'))
+        return Response(BillingRunSerializer(run).data, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=True, methods=['post'])
+    def resume(self, request, pk=None):
+        """
+        Resume an interrupted run. With retry_failed=true, failed items are processed again.
+        """
+        run = self.get_object()
+        retry_failed = str(request.data.get('retry_failed', '')).lower() in ('true', '1')
+
+        # Atomic claim: concurrent resumes, or a resume of a run that is still alive, are rejected
+        if not claim_billing_run(run, include_completed=retry_failed):
+            run.refresh_from_db()
+            return Response(
+                {'error': f'Billing run is {run.status.lower()} and cannot be resumed'},
+                status=status.HTTP_409_CONFLICT
+            )
+
+        if retry_failed:
+            retry_failed_items(run)
+            run.refresh_from_db()
+        start_billing_run_in_background(run, request.headers)
+        return Response(BillingRunSerializer(run).data, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=True, methods=['get'])
+    def items(self, request, pk=None):
+        """
+        List the items of a run, optionally filtered by status.
+        """
+        run = self.get_object()
+        items = run.items.all().order_by('id')
+        item_status = request.query_params.get('status')
+        if item_status:
+            items = items.filter(status=item_status)
+
+        page = self.paginate_queryset(items)
+        if page is not None:
+            return self.get_paginated_response(BillingRunItemSerializer(page, many=True).data)
+        return Response(BillingRunItemSerializer(items, many=True).data)
+
+
 # API endpoints for creating invoices from other services
 class InvoiceCreationViewSet(viewsets.ViewSet):
     """
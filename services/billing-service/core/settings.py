@@ -43,12 +43,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'common_auth.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'billing.middleware.ServiceAPIKeyMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -133,6 +135,7 @@ CORS_ALLOW_ALL_ORIGINS = True
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
+        'billing.authentication.ServiceAPIKeyAuthentication',
         'common_auth.authentication.ServiceAuthentication',
         'rest_framework_simplejwt.authentication.JWTAuthentication',
     ),
@@ -152,8 +155,43 @@ APPOINTMENT_SERVICE_URL = os.environ.get('APPOINTMENT_SERVICE_URL', 'http://appo
 PHARMACY_SERVICE_URL = os.environ.get('PHARMACY_SERVICE_URL', 'http://pharmacy-service:8004')
 LABORATORY_SERVICE_URL = os.environ.get('LAB_SERVICE_URL', 'http://laboratory-service:8005')
 
+# Price resolution for invoice generation
+PRICE_CACHE_TTL = int(os.environ.get('PRICE_CACHE_TTL', 300))  # seconds
+PRICE_CACHE_SIZE = int(os.environ.get('PRICE_CACHE_SIZE', 10000))
+PRICE_RESOLUTION_MAX_WORKERS = int(os.environ.get('PRICE_RESOLUTION_MAX_WORKERS', 8))
+PRICE_CATALOG_ENABLED = os.environ.get('PRICE_CATALOG_ENABLED', 'True') == 'True'
+PRICE_CATALOG_REFRESH_INTERVAL = int(os.environ.get('PRICE_CATALOG_REFRESH_INTERVAL', 5))  # seconds
+
+# Batch invoice generation (billing runs)
+BILLING_RUN_MAX_WORKERS = int(os.environ.get('BILLING_RUN_MAX_WORKERS', 8))
+BILLING_RUN_CHUNK_SIZE = int(os.environ.get('BILLING_RUN_CHUNK_SIZE', 100))
+BILLING_RUN_STALE_AFTER = int(os.environ.get('BILLING_RUN_STALE_AFTER', 600))  # seconds
+BILLING_RUN_HEARTBEAT_INTERVAL = int(os.environ.get('BILLING_RUN_HEARTBEAT_INTERVAL', 30))  # seconds
+
+# Invoice PDF rendering
+INVOICE_PDF_CACHE_DIR = os.environ.get('INVOICE_PDF_CACHE_DIR', os.path.join(BASE_DIR, 'pdf_cache'))
+INVOICE_PDF_RENDER_WORKERS = int(os.environ.get('INVOICE_PDF_RENDER_WORKERS', 2))
+INVOICE_PDF_RENDER_WAIT = int(os.environ.get('INVOICE_PDF_RENDER_WAIT', 5))  # seconds
+INVOICE_PDF_BULK_MAX = int(os.environ.get('INVOICE_PDF_BULK_MAX', 500))
+INVOICE_PDF_CACHE_MAX_AGE = int(os.environ.get('INVOICE_PDF_CACHE_MAX_AGE', 30 * 24 * 3600))  # seconds
+
+# Notification event outbox (see common_auth.outbox)
+EVENT_OUTBOX_PUBLISH_ON_COMMIT = os.environ.get('EVENT_OUTBOX_PUBLISH_ON_COMMIT', 'False') == 'True'
+EVENT_OUTBOX_MAX_ATTEMPTS = int(os.environ.get('EVENT_OUTBOX_MAX_ATTEMPTS', 10))
+EVENT_OUTBOX_MAX_BACKOFF = int(os.environ.get('EVENT_OUTBOX_MAX_BACKOFF', 300))  # seconds
+EVENT_OUTBOX_DEDUPE_TTL = int(os.environ.get('EVENT_OUTBOX_DEDUPE_TTL', 7 * 24 * 3600))  # seconds
+
 # Common Auth settings
 REDIS_URL = os.environ.get('REDIS_URL', 'redis://redis:6379/0')
+
+# Bearer token for scraping /metrics/ (common_auth.metrics); unset = other services and localhost only
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+# Service API Keys (service-to-service requests, see billing.middleware.ServiceAPIKeyMiddleware)
+SERVICE_API_KEYS = {
+    'appointment-service': os.environ.get('APPOINTMENT_SERVICE_API_KEY', 'appointment-service-api-key'),
+}
+
 JWT_SECRET = os.environ.get('JWT_SECRET', SECRET_KEY)
 ACCESS_TOKEN_LIFETIME = timedelta(minutes=60)
 REFRESH_TOKEN_LIFETIME = timedelta(days=7)
@@ -34,6 +34,14 @@ fi
 echo "Collecting static files..."
 python manage.py collectstatic --noinput
 
+# Start price catalog event consumer
+echo "Starting price catalog event consumer..."
+python manage.py consume_price_events --sleep 1 &
+
+# Start notification outbox relay
+echo "Starting notification outbox relay..."
+python manage.py relay_event_outbox --loop &
+
 # Start server in background and fetch swagger spec
 echo "Starting server in background..."
 "$@" &
@@ -19,7 +19,7 @@ from common_auth.permissions import (
 )
 
 # Import service client
-from common_auth.service_client import ServiceClient
+from common_auth.service_client import ServiceClient, AsyncServiceClient
 
 # Import health check
 from common_auth.health_check import register_health_check
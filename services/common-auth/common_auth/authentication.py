@@ -7,9 +7,14 @@ import jwt
 import logging
 from django.conf import settings
 from django.contrib.auth.models import AnonymousUser
-import redis
 import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
 from datetime import datetime
+from .redis_client import get_redis_client, blacklist_cache
+from .session_management import SessionManager
 
 logger = logging.getLogger(__name__)
 
@@ -35,6 +40,72 @@ class ServiceUser:
         return f"{self.email} ({self.role})"
 
 
+class DecodedTokenCache:
+    """
+    Bounded LRU of decoded token claims keyed by token hash.
+    
+    Entries expire at the token's exp claim, so an expired token is always decoded
+    again and rejected by jwt.decode.
+    """
+    
+    def __init__(self, max_size=None, max_ttl=None):
+        """
+        Initialize the DecodedTokenCache.
+        
+        Args:
+            max_size: Maximum number of cached tokens. If None, uses settings.JWT_DECODE_CACHE_SIZE.
+            max_ttl: Maximum seconds to keep a token's claims. If None, uses settings.JWT_DECODE_CACHE_MAX_TTL.
+        """
+        self.max_size = max_size or getattr(settings, 'JWT_DECODE_CACHE_SIZE', 10000)
+        self.max_ttl = max_ttl or getattr(settings, 'JWT_DECODE_CACHE_MAX_TTL', 300)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            decoded, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return decoded
+    
+    def set(self, key, decoded, exp=None):
+        expires_at = time.time() + self.max_ttl
+        if isinstance(exp, (int, float)):
+            expires_at = min(expires_at, exp)
+        with self._lock:
+            self._entries[key] = (decoded, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+decoded_token_cache = DecodedTokenCache()
+
+
+def get_verification_key(token):
+    """
+    Select the key to verify a token with.
+    
+    Tokens carrying a kid header listed in settings.JWT_VERIFICATION_KEYS ({kid: secret})
+    are verified with that key; all others with settings.JWT_SECRET.
+    """
+    keys = getattr(settings, 'JWT_VERIFICATION_KEYS', None)
+    if keys:
+        kid = jwt.get_unverified_header(token).get('kid')
+        if kid in keys:
+            return keys[kid]
+    return getattr(settings, 'JWT_SECRET', None)
+
+
 class ServiceAuthentication(BaseAuthentication):
     """
     Unified authentication class for all services.
@@ -85,10 +156,10 @@ class ServiceAuthentication(BaseAuthentication):
             # Check if token is blacklisted
             token_jti = request.META.get('HTTP_X_TOKEN_JTI')
             if token_jti and self._is_token_blacklisted(token_jti):
-                logger.warning(f"Blacklisted token used: {token_jti}")
+                logger.warning("Blacklisted token used: %s", token_jti)
                 raise AuthenticationFailed('Token has been revoked')
             
-            logger.info(f"Authenticated user from headers: {user_id}, role: {user_role}")
+            logger.info("Authenticated user from headers: %s, role: %s", user_id, user_role)
             return user
         except Exception as e:
             logger.error(f"Header authentication error: {str(e)}")
@@ -107,56 +178,18 @@ class ServiceAuthentication(BaseAuthentication):
             # Extract token
             parts = auth_header.split()
             if len(parts) != 2 or parts[0].lower() != 'bearer':
-                logger.debug(f"Invalid Authorization header format: {auth_header}")
+                logger.debug("Invalid Authorization header format")
                 return None
             
             token = parts[1]
             
-            # Log a portion of the token for debugging (never log full tokens in production)
-            token_prefix = token[:10] if len(token) > 10 else token
-            logger.debug(f"Authenticating with token prefix: {token_prefix}...")
-            
-            # Get JWT secret from settings
-            jwt_secret = getattr(settings, 'JWT_SECRET', None)
-            if not jwt_secret:
-                logger.error("JWT_SECRET not configured")
+            decoded = self._decode_token(token)
+            if decoded is None:
                 return None
             
-            logger.debug(f"Using JWT_SECRET with length: {len(jwt_secret)}")
-            
-            # Verify and decode token - USE FIXED SECRET FOR DEBUGGING
-            verify_signature = getattr(settings, 'VERIFY_JWT_SIGNATURE', False)
-            options = {"verify_signature": verify_signature}
-            
-            logger.debug(f"Token verification options: {options}")
-            
-            try:
-                # FIXED JWT SECRET FOR DEBUGGING - HARDCODED FOR TESTING
-                decoded = jwt.decode(
-                    token,
-                    'healthcare_jwt_secret_key_2025',  # Fixed secret for debugging
-                    algorithms=['HS256'],
-                    options=options
-                )
-                logger.debug("Token decoded successfully with fixed secret")
-            except Exception as jwt_err:
-                logger.warning(f"Failed to decode with fixed secret: {str(jwt_err)}")
-                # Try with configured secret as fallback
-                decoded = jwt.decode(
-                    token,
-                    jwt_secret,
-                    algorithms=['HS256'],
-                    options=options
-                )
-                logger.debug("Token decoded successfully with configured secret")
-            
-            # Log decoded token (except sensitive parts)
-            safe_decoded = {k: v for k, v in decoded.items() if k not in ['jti']}
-            logger.debug(f"Decoded token: {safe_decoded}")
-            
             # Check if token is blacklisted
             if 'jti' in decoded and self._is_token_blacklisted(decoded['jti']):
-                logger.warning(f"Blacklisted token used: {decoded['jti']}")
+                logger.warning("Blacklisted token used: %s", decoded['jti'])
                 raise AuthenticationFailed('Token has been revoked')
             
             # Create user from token data
@@ -173,30 +206,56 @@ class ServiceAuthentication(BaseAuthentication):
                 last_name=decoded.get('last_name')
             )
             
-            logger.info(f"Authenticated user from token: {user_id}, role: {user.role}")
+            logger.info("Authenticated user from token: %s, role: %s", user_id, user.role)
             return (user, decoded)
         except jwt.ExpiredSignatureError:
             logger.warning("Token has expired")
             raise AuthenticationFailed('Token has expired')
         except jwt.InvalidTokenError as e:
-            logger.warning(f"Invalid token: {str(e)}")
+            logger.warning("Invalid token: %s", e)
             raise AuthenticationFailed('Invalid token')
         except Exception as e:
             logger.error(f"Token authentication error: {str(e)}")
             return None
     
+    def _decode_token(self, token):
+        """
+        Verify and decode a JWT token, reusing claims of recently verified tokens.
+        
+        Returns:
+            dict: Decoded claims, or None if JWT_SECRET is not configured.
+        """
+        token_key = hashlib.sha256(token.encode('utf-8')).digest()
+        decoded = decoded_token_cache.get(token_key)
+        if decoded is not None:
+            return dict(decoded)
+        
+        key = get_verification_key(token)
+        if not key:
+            logger.error("JWT_SECRET not configured")
+            return None
+        
+        verify_signature = getattr(settings, 'VERIFY_JWT_SIGNATURE', False)
+        decoded = jwt.decode(
+            token,
+            key,
+            algorithms=['HS256'],
+            options={"verify_signature": verify_signature}
+        )
+        
+        if logger.isEnabledFor(logging.DEBUG):
+            safe_decoded = {k: v for k, v in decoded.items() if k not in ['jti']}
+            logger.debug("Decoded token: %s", safe_decoded)
+        
+        decoded_token_cache.set(token_key, decoded, decoded.get('exp'))
+        return dict(decoded)
+    
     def _is_token_blacklisted(self, token_jti):
         """
         Check if a token is blacklisted in Redis.
         """
         try:
-            redis_url = getattr(settings, 'REDIS_URL', None)
-            if not redis_url:
-                return False
-            
-            r = redis.from_url(redis_url)
-            blacklisted = r.get(f"blacklist_token:{token_jti}")
-            return blacklisted is not None
+            return blacklist_cache.is_blacklisted(token_jti)
         except Exception as e:
             logger.error(f"Error checking token blacklist: {str(e)}")
             return False
@@ -230,17 +289,20 @@ class SessionAuthentication(ServiceAuthentication):
         Update user session information in Redis.
         """
         try:
-            redis_url = getattr(settings, 'REDIS_URL', None)
-            if not redis_url:
+            r = get_redis_client()
+            if r is None:
                 return
             
-            r = redis.from_url(redis_url)
-            
             # Get session ID from cookie or create a new one
             session_id = request.COOKIES.get('session_id')
             if not session_id:
                 return
             
+            session_manager = SessionManager()
+            if session_manager.use_hash_storage:
+                self._record_session_activity(request, session_manager, session_id, user)
+                return
+            
             # Update session data
             session_data = {
                 'user_id': user.id,
@@ -252,17 +314,36 @@ class SessionAuthentication(ServiceAuthentication):
             
             # Store session data in Redis with expiration
             session_ttl = getattr(settings, 'SESSION_TTL', 86400)  # Default: 1 day
-            r.setex(
+            pipe = r.pipeline(transaction=False)
+            pipe.setex(
                 f"session:{session_id}",
                 session_ttl,
                 json.dumps(session_data)
             )
             
             # Update user's active sessions list
-            r.sadd(f"user_sessions:{user.id}", session_id)
+            pipe.sadd(f"user_sessions:{user.id}", session_id)
+            pipe.execute()
         except Exception as e:
             logger.error(f"Error updating session: {str(e)}")
     
+    def _record_session_activity(self, request, session_manager, session_id, user):
+        """
+        Record session activity, joining the middleware's pending write for this request.
+        """
+        activity = getattr(request, 'session_activity', None)
+        if activity is not None and activity.session_id == session_id:
+            # Written by SessionMiddleware.process_response
+            activity.record(user=user)
+            return
+        
+        activity = session_manager.start_activity(session_id)
+        if activity is None:
+            # Session terminated or expired; activity never recreates it
+            return
+        activity.record(request=request, user=user)
+        activity.flush()
+    
     def _get_client_ip(self, request):
         """
         Get client IP address from request.
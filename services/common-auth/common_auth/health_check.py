@@ -39,11 +39,13 @@ def health_check(request):
 
 def register_health_check(urlpatterns):
     """
-    Register health check endpoint in URL patterns.
+    Register health check and metrics endpoints in URL patterns.
 
     Args:
         urlpatterns: URL patterns list
     """
     from django.urls import path
+    from .metrics import metrics
     urlpatterns.append(path('health/', health_check, name='health_check'))
+    urlpatterns.append(path('metrics/', metrics, name='metrics'))
     return urlpatterns
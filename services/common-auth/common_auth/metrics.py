@@ -0,0 +1,335 @@
+"""
+Request instrumentation for Django services.
+
+Metrics are collected per process by MetricsMiddleware and exposed by the metrics view
+(restricted to scrapers and other services, see _can_read_metrics):
+- Per-endpoint request latency histograms
+- ORM query count and time per endpoint
+- Redis command count and time per endpoint (through common_auth.redis_client)
+- Outbound ServiceClient call timings per target service
+"""
+import hmac
+import os
+import time
+import logging
+import threading
+from bisect import bisect_left
+from contextvars import ContextVar
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
+from django.views.decorators.http import require_GET
+
+logger = logging.getLogger(__name__)
+
+# Histogram bucket upper bounds in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_current_request = ContextVar('common_auth_request_metrics', default=None)
+
+
+class Histogram:
+    """
+    Cumulative-bucket latency histogram.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+
+    def to_dict(self):
+        cumulative = 0
+        buckets = {}
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            cumulative += count
+            buckets['+Inf' if bound == float('inf') else str(bound)] = cumulative
+        return {'count': self.count, 'sum': self.total, 'buckets': buckets}
+
+
+class RequestMetrics:
+    """
+    Counters for the request currently being processed.
+
+    ServiceClient.gather() runs calls on worker threads that share the request's
+    context, so the counters are updated under a lock.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.redis_commands = 0
+        self.redis_time = 0.0
+        self.outbound_calls = 0
+        self.outbound_time = 0.0
+
+    def add_db_query(self, duration):
+        with self._lock:
+            self.db_queries += 1
+            self.db_time += duration
+
+    def add_redis_commands(self, count, duration):
+        with self._lock:
+            self.redis_commands += count
+            self.redis_time += duration
+
+    def add_outbound_call(self, duration):
+        with self._lock:
+            self.outbound_calls += 1
+            self.outbound_time += duration
+
+
+class EndpointStats:
+    """
+    Aggregated metrics for one endpoint.
+    """
+
+    def __init__(self):
+        self.latency = Histogram()
+        self.status_codes = {}
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.max_db_queries = 0
+        self.redis_commands = 0
+        self.redis_time = 0.0
+        self.outbound_calls = 0
+        self.outbound_time = 0.0
+
+
+class MetricsRegistry:
+    """
+    Process-wide metrics store.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.endpoints = {}
+        self.outbound = {}
+
+    def record_request(self, endpoint, method, status_code, duration, request_metrics):
+        key = (method, endpoint)
+        with self._lock:
+            stats = self.endpoints.get(key)
+            if stats is None:
+                stats = self.endpoints[key] = EndpointStats()
+            stats.latency.observe(duration)
+            stats.status_codes[status_code] = stats.status_codes.get(status_code, 0) + 1
+            stats.db_queries += request_metrics.db_queries
+            stats.db_time += request_metrics.db_time
+            stats.max_db_queries = max(stats.max_db_queries, request_metrics.db_queries)
+            stats.redis_commands += request_metrics.redis_commands
+            stats.redis_time += request_metrics.redis_time
+            stats.outbound_calls += request_metrics.outbound_calls
+            stats.outbound_time += request_metrics.outbound_time
+
+    def record_outbound(self, service_name, method, duration, status_code=None):
+        key = (service_name, method.upper())
+        with self._lock:
+            entry = self.outbound.get(key)
+            if entry is None:
+                entry = self.outbound[key] = {'latency': Histogram(), 'errors': 0}
+            entry['latency'].observe(duration)
+            if status_code is None or status_code >= 500:
+                entry['errors'] += 1
+
+    def snapshot(self):
+        """
+        Get all metrics as a JSON-serializable dict.
+        """
+        with self._lock:
+            endpoints = []
+            for (method, endpoint), stats in sorted(self.endpoints.items()):
+                endpoints.append({
+                    'method': method,
+                    'endpoint': endpoint,
+                    'latency': stats.latency.to_dict(),
+                    'status_codes': {str(code): count for code, count in stats.status_codes.items()},
+                    'db_queries': stats.db_queries,
+                    'db_time': stats.db_time,
+                    'max_db_queries': stats.max_db_queries,
+                    'redis_commands': stats.redis_commands,
+                    'redis_time': stats.redis_time,
+                    'outbound_calls': stats.outbound_calls,
+                    'outbound_time': stats.outbound_time,
+                })
+            outbound = []
+            for (service_name, method), entry in sorted(self.outbound.items()):
+                outbound.append({
+                    'service': service_name,
+                    'method': method,
+                    'latency': entry['latency'].to_dict(),
+                    'errors': entry['errors'],
+                })
+        return {
+            'service': getattr(settings, 'SERVICE_NAME', 'unknown'),
+            'pid': os.getpid(),
+            'endpoints': endpoints,
+            'outbound': outbound,
+        }
+
+    def reset(self):
+        with self._lock:
+            self.endpoints.clear()
+            self.outbound.clear()
+
+
+registry = MetricsRegistry()
+
+
+def start_request():
+    """
+    Start collecting metrics for the current request.
+
+    Returns:
+        tuple: (RequestMetrics, token to pass to end_request)
+    """
+    request_metrics = RequestMetrics()
+    return request_metrics, _current_request.set(request_metrics)
+
+
+def end_request(token):
+    _current_request.reset(token)
+
+
+def db_execute_wrapper(execute, sql, params, many, context):
+    """
+    connection.execute_wrapper hook counting ORM queries of the current request.
+    """
+    request_metrics = _current_request.get()
+    if request_metrics is None:
+        return execute(sql, params, many, context)
+
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        request_metrics.add_db_query(time.perf_counter() - start)
+
+
+def record_redis_commands(count, duration):
+    """
+    Record Redis commands sent during the current request.
+    """
+    request_metrics = _current_request.get()
+    if request_metrics is not None:
+        request_metrics.add_redis_commands(count, duration)
+
+
+def record_outbound_call(service_name, method, duration, status_code=None):
+    """
+    Record an outbound call to another service.
+
+    Args:
+        service_name: Target service (e.g., 'BILLING_SERVICE')
+        method: HTTP method
+        duration: Call duration in seconds
+        status_code: Response status code, or None if the call failed
+    """
+    registry.record_outbound(service_name, method, duration, status_code)
+    request_metrics = _current_request.get()
+    if request_metrics is not None:
+        request_metrics.add_outbound_call(duration)
+
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_histogram(lines, name, labels, histogram):
+    label_str = ','.join(f'{key}="{_escape_label(value)}"' for key, value in labels.items())
+    for bound, count in histogram['buckets'].items():
+        lines.append(f'{name}_bucket{{{label_str},le="{bound}"}} {count}')
+    lines.append(f'{name}_sum{{{label_str}}} {histogram["sum"]}')
+    lines.append(f'{name}_count{{{label_str}}} {histogram["count"]}')
+
+
+def format_prometheus(snapshot):
+    """
+    Render a metrics snapshot in the Prometheus text exposition format.
+    """
+    service = snapshot['service']
+    lines = [
+        '# TYPE http_request_duration_seconds histogram',
+    ]
+    for entry in snapshot['endpoints']:
+        labels = {'service': service, 'method': entry['method'], 'endpoint': entry['endpoint']}
+        _format_histogram(lines, 'http_request_duration_seconds', labels, entry['latency'])
+
+    counters = (
+        ('http_request_db_queries_total', 'db_queries'),
+        ('http_request_db_seconds_total', 'db_time'),
+        ('http_request_redis_commands_total', 'redis_commands'),
+        ('http_request_redis_seconds_total', 'redis_time'),
+        ('http_request_outbound_calls_total', 'outbound_calls'),
+        ('http_request_outbound_seconds_total', 'outbound_time'),
+    )
+    for name, field in counters:
+        lines.append(f'# TYPE {name} counter')
+        for entry in snapshot['endpoints']:
+            lines.append(
+                f'{name}{{service="{_escape_label(service)}",method="{entry["method"]}",'
+                f'endpoint="{_escape_label(entry["endpoint"])}"}} {entry[field]}'
+            )
+
+    lines.append('# TYPE http_requests_total counter')
+    for entry in snapshot['endpoints']:
+        for status_code, count in entry['status_codes'].items():
+            lines.append(
+                f'http_requests_total{{service="{_escape_label(service)}",method="{entry["method"]}",'
+                f'endpoint="{_escape_label(entry["endpoint"])}",status="{status_code}"}} {count}'
+            )
+
+    lines.append('# TYPE service_client_request_duration_seconds histogram')
+    for entry in snapshot['outbound']:
+        labels = {'service': service, 'target': entry['service'], 'method': entry['method']}
+        _format_histogram(lines, 'service_client_request_duration_seconds', labels, entry['latency'])
+    lines.append('# TYPE service_client_errors_total counter')
+    for entry in snapshot['outbound']:
+        lines.append(
+            f'service_client_errors_total{{service="{_escape_label(service)}",target="{entry["service"]}",'
+            f'method="{entry["method"]}"}} {entry["errors"]}'
+        )
+
+    return '\n'.join(lines) + '\n'
+
+
+def _can_read_metrics(request):
+    """
+    Whether a request may read metrics.
+
+    Allowed are requests with the METRICS_TOKEN bearer token (for Prometheus),
+    requests authenticated as another service (request.is_service_request, set by
+    services with a service API key middleware), and requests from
+    METRICS_ALLOWED_IPS. The remote address is used, not X-Forwarded-For, so
+    requests through the API gateway are never allowed by address.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    auth_header = request.META.get('HTTP_AUTHORIZATION', '')
+    if token and auth_header.startswith('Bearer ') and hmac.compare_digest(auth_header[7:], token):
+        return True
+    if getattr(request, 'is_service_request', False):
+        return True
+    return request.META.get('REMOTE_ADDR') in getattr(settings, 'METRICS_ALLOWED_IPS', ('127.0.0.1', '::1'))
+
+
+@require_GET
+def metrics(request):
+    """
+    Metrics endpoint for Django services.
+
+    Returns Prometheus text format by default, or JSON with ?format=json.
+    Metrics are per process; each worker reports its own.
+    """
+    if not _can_read_metrics(request):
+        return JsonResponse({'detail': 'Not allowed to read metrics.'}, status=403)
+
+    snapshot = registry.snapshot()
+    if request.GET.get('format') == 'json':
+        return JsonResponse(snapshot)
+    return HttpResponse(format_prometheus(snapshot), content_type='text/plain; version=0.0.4')
@@ -3,8 +3,15 @@ Middleware for session and authentication management.
 """
 import logging
 import json
+import os
+import random
+import time
+from contextlib import ExitStack
+from datetime import datetime
 from django.utils.deprecation import MiddlewareMixin
 from django.conf import settings
+from django.db import connections
+from . import metrics
 from .session_management import SessionManager
 from .token_management import TokenManager
 
@@ -53,8 +60,14 @@ class SessionMiddleware(MiddlewareMixin):
             request.session_data = None
             return
         
-        # Update session with current request info
-        self.session_manager.update_session(session_id, request=request)
+        if self.session_manager.use_hash_storage:
+            # Collect activity for this request, written once in process_response
+            activity = self.session_manager.start_activity(session_id, session_data)
+            activity.record(request=request)
+            request.session_activity = activity
+        else:
+            # Update session with current request info
+            self.session_manager.update_session(session_id, request=request)
         
         # Add session data to request
         request.session_id = session_id
@@ -71,6 +84,14 @@ class SessionMiddleware(MiddlewareMixin):
         Returns:
             The processed HTTP response object.
         """
+        # Write session activity collected during the request
+        activity = getattr(request, 'session_activity', None)
+        if activity is not None:
+            try:
+                activity.flush()
+            except Exception as e:
+                logger.error(f"Error updating session activity: {str(e)}")
+        
         # Check if we need to set a session cookie
         if hasattr(request, 'session_id') and request.session_id:
             # Set session cookie
@@ -141,3 +162,83 @@ class TokenRefreshMiddleware(MiddlewareMixin):
                     logger.error(f"Error refreshing token: {str(e)}")
         
         return response
+
+
+class MetricsMiddleware:
+    """
+    Middleware for request instrumentation.
+    
+    This middleware records, per endpoint (URL route):
+    1. Request latency histogram and status codes
+    2. ORM query count and time
+    3. Redis command count and time
+    4. Outbound ServiceClient call count and time
+    
+    Metrics are exposed by common_auth.metrics.metrics (registered with register_health_check).
+    
+    With METRICS_PROFILE_SAMPLE_RATE > 0, that fraction of requests is run under cProfile
+    and the profile is dumped to METRICS_PROFILE_DIR when the request takes longer than
+    METRICS_PROFILE_SLOW_MS.
+    
+    Should be placed first in MIDDLEWARE so that it measures the whole request.
+    """
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.profile_sample_rate = getattr(settings, 'METRICS_PROFILE_SAMPLE_RATE', 0)
+        self.profile_slow_ms = getattr(settings, 'METRICS_PROFILE_SLOW_MS', 1000)
+        self.profile_dir = getattr(settings, 'METRICS_PROFILE_DIR', '/tmp/profiles')
+    
+    def __call__(self, request):
+        request_metrics, token = metrics.start_request()
+        profiler = None
+        if self.profile_sample_rate and random.random() < self.profile_sample_rate:
+            import cProfile
+            profiler = cProfile.Profile()
+        
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(metrics.db_execute_wrapper))
+                if profiler is not None:
+                    profiler.enable()
+                try:
+                    response = self.get_response(request)
+                finally:
+                    if profiler is not None:
+                        profiler.disable()
+        finally:
+            metrics.end_request(token)
+        duration = time.perf_counter() - start
+        
+        endpoint = self._get_endpoint(request)
+        metrics.registry.record_request(endpoint, request.method, response.status_code, duration, request_metrics)
+        
+        if profiler is not None and duration * 1000 >= self.profile_slow_ms:
+            self._dump_profile(profiler, request, endpoint, duration)
+        
+        return response
+    
+    def _get_endpoint(self, request):
+        """
+        Get the URL route of the request, so that metrics are grouped per endpoint
+        rather than per URL.
+        """
+        resolver_match = getattr(request, 'resolver_match', None)
+        if resolver_match is None:
+            return 'unmatched'
+        return resolver_match.route or resolver_match.view_name or 'unknown'
+    
+    def _dump_profile(self, profiler, request, endpoint, duration):
+        try:
+            os.makedirs(self.profile_dir, exist_ok=True)
+            name = endpoint.strip('/').replace('/', '_').replace('<', '').replace('>', '') or 'root'
+            filename = os.path.join(
+                self.profile_dir,
+                f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{request.method}-{name}-{int(duration * 1000)}ms.prof"
+            )
+            profiler.dump_stats(filename)
+            logger.warning(f"Slow request {request.method} {request.path} took {duration * 1000:.0f}ms, profile saved to {filename}")
+        except Exception as e:
+            logger.error(f"Error saving request profile: {str(e)}")
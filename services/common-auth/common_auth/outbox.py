@@ -0,0 +1,172 @@
+"""
+Transactional outbox for notification events.
+
+Services subclass EventOutboxBase and call enqueue_event() inside the transaction that
+makes the business change, so an event is stored if and only if the change commits.
+A relay (relay_pending, run by each service's relay_event_outbox command) publishes
+stored events to the notification Redis stream in batches, retrying with backoff.
+Every event has a UUID; publishing is de-duplicated on it, so an event published twice
+(e.g. the relay crashed before marking it published) reaches consumers once.
+"""
+import logging
+import uuid
+from datetime import timedelta
+from django.conf import settings
+from django.db import models, transaction
+from django.utils import timezone
+from .redis_notifications import RedisNotificationClient
+
+logger = logging.getLogger(__name__)
+
+
+class EventOutboxBase(models.Model):
+    """
+    Abstract outbox table; each service defines a concrete EventOutbox model.
+    """
+    class Status(models.TextChoices):
+        PENDING = 'PENDING', 'Pending'
+        PUBLISHED = 'PUBLISHED', 'Published'
+        FAILED = 'FAILED', 'Failed'
+
+    event_id = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    service = models.CharField(max_length=50)
+    event_type = models.CharField(max_length=100)
+    data = models.JSONField(default=dict, blank=True)
+    recipients = models.JSONField(default=list, blank=True)
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING)
+    attempts = models.IntegerField(default=0)
+    last_error = models.TextField(blank=True, null=True)
+    available_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+    published_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        abstract = True
+
+    def __str__(self):
+        return f"{self.service}.{self.event_type} ({self.status})"
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def enqueue_event(model, service, event_type, data, recipients=None):
+    """
+    Store an event in the outbox as part of the current transaction.
+
+    Args:
+        model: Concrete EventOutboxBase subclass
+        service: Publishing service, e.g. 'BILLING'
+        event_type: Event type, e.g. 'PAYMENT_RECEIVED'
+        data: JSON-serializable event data
+        recipients: Optional explicit recipients
+
+    Returns:
+        EventOutboxBase: The stored event
+    """
+    event = model.objects.create(
+        service=service,
+        event_type=event_type,
+        data=data or {},
+        recipients=recipients or []
+    )
+    if _setting('EVENT_OUTBOX_PUBLISH_ON_COMMIT', False):
+        # Publish right after commit (adds one Redis round trip to the request);
+        # the relay picks the event up if this fails
+        transaction.on_commit(lambda: _publish_after_commit(model, event.id))
+    return event
+
+
+def _publish_after_commit(model, event_id):
+    try:
+        relay_pending(model, ids=[event_id])
+    except Exception as e:
+        logger.error(f"Error publishing outbox event {event_id} after commit: {str(e)}")
+
+
+def _backoff(attempts):
+    return timedelta(seconds=min(2 ** attempts, _setting('EVENT_OUTBOX_MAX_BACKOFF', 300)))
+
+
+def relay_pending(model, limit=100, ids=None, client=None):
+    """
+    Publish a batch of pending events to the notification stream.
+
+    Rows are locked with SKIP LOCKED, so several relays (and post-commit publishes)
+    can run concurrently without publishing the same row at the same time.
+
+    Args:
+        model: Concrete EventOutboxBase subclass
+        limit: Maximum number of events in the batch
+        ids: Only publish these event row IDs
+        client: RedisNotificationClient to publish with
+
+    Returns:
+        tuple: (number published, number of events in the batch)
+    """
+    client = client or RedisNotificationClient()
+    max_attempts = _setting('EVENT_OUTBOX_MAX_ATTEMPTS', 10)
+    dedupe_ttl = _setting('EVENT_OUTBOX_DEDUPE_TTL', 7 * 24 * 3600)
+
+    with transaction.atomic():
+        events = model.objects.select_for_update(skip_locked=True).filter(
+            status=model.Status.PENDING,
+            available_at__lte=timezone.now()
+        )
+        if ids is not None:
+            events = events.filter(id__in=ids)
+        events = list(events.order_by('id')[:limit])
+
+        published = 0
+        for event in events:
+            message_id = client.publish_notification_once(
+                event.event_id, event.service, event.event_type, event.data, event.recipients,
+                timestamp=event.created_at.isoformat(), dedupe_ttl=dedupe_ttl
+            )
+            event.attempts += 1
+            if message_id is not None:
+                # False means an earlier attempt already published it
+                event.status = model.Status.PUBLISHED
+                event.published_at = timezone.now()
+                event.last_error = None
+                published += 1
+            else:
+                event.last_error = 'Could not publish to the notification stream'
+                event.available_at = timezone.now() + _backoff(event.attempts)
+                if event.attempts >= max_attempts:
+                    event.status = model.Status.FAILED
+                    logger.error(f"Giving up on outbox event {event.event_id} ({event.event_type}) after {event.attempts} attempts")
+
+        if events:
+            model.objects.bulk_update(events, ['status', 'attempts', 'last_error', 'available_at', 'published_at'])
+
+    if events:
+        logger.info(f"Published {published}/{len(events)} outbox events")
+    return published, len(events)
+
+
+def retry_failed(model):
+    """
+    Move FAILED events back to PENDING.
+
+    Returns:
+        int: Number of events reset
+    """
+    return model.objects.filter(status=model.Status.FAILED).update(
+        status=model.Status.PENDING, attempts=0, available_at=timezone.now()
+    )
+
+
+def prune_published(model, older_than):
+    """
+    Delete events published before now - older_than (a timedelta).
+
+    Returns:
+        int: Number of events deleted
+    """
+    deleted, _ = model.objects.filter(
+        status=model.Status.PUBLISHED,
+        published_at__lt=timezone.now() - older_than
+    ).delete()
+    return deleted
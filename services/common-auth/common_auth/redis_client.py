@@ -0,0 +1,268 @@
+"""
+Shared Redis connections and token blacklist cache for the Healthcare System.
+"""
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+import redis
+from django.conf import settings
+from .metrics import record_redis_commands
+
+logger = logging.getLogger(__name__)
+
+BLACKLIST_KEY_PREFIX = "blacklist_token:"
+BLACKLIST_CHANNEL = "token_blacklist"
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+class InstrumentedRedis(redis.Redis):
+    """
+    Redis client that records command counts and time for request metrics.
+    """
+
+    def execute_command(self, *args, **options):
+        start = time.perf_counter()
+        try:
+            return super().execute_command(*args, **options)
+        finally:
+            record_redis_commands(1, time.perf_counter() - start)
+
+    def pipeline(self, transaction=True, shard_hint=None):
+        pipe = super().pipeline(transaction, shard_hint)
+        execute = pipe.execute
+
+        def instrumented_execute(raise_on_error=True):
+            count = len(pipe.command_stack)
+            start = time.perf_counter()
+            try:
+                return execute(raise_on_error)
+            finally:
+                record_redis_commands(count, time.perf_counter() - start)
+
+        pipe.execute = instrumented_execute
+        return pipe
+
+
+def get_redis_url(redis_url=None):
+    """
+    Resolve the Redis URL to use.
+
+    Args:
+        redis_url: Explicit Redis URL. If None, uses settings.REDIS_URL.
+
+    Returns:
+        str: Redis URL or None if not configured.
+    """
+    return redis_url or getattr(settings, 'REDIS_URL', None)
+
+
+def get_redis_client(redis_url=None):
+    """
+    Get the process-wide Redis client for a URL.
+
+    All clients for the same URL share one connection pool, so callers must not
+    close them. The pool is reset automatically in forked worker processes.
+
+    Args:
+        redis_url: Redis URL. If None, uses settings.REDIS_URL.
+
+    Returns:
+        redis.Redis: Shared client, or None if Redis is not configured.
+    """
+    redis_url = get_redis_url(redis_url)
+    if not redis_url:
+        return None
+
+    client = _clients.get(redis_url)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(redis_url)
+            if client is None:
+                pool = redis.ConnectionPool.from_url(
+                    redis_url,
+                    max_connections=getattr(settings, 'REDIS_MAX_CONNECTIONS', 50),
+                    socket_timeout=getattr(settings, 'REDIS_SOCKET_TIMEOUT', None)
+                )
+                client = InstrumentedRedis(connection_pool=pool)
+                _clients[redis_url] = client
+    return client
+
+
+class BlacklistCache:
+    """
+    In-process cache of token blacklist lookups.
+
+    Results are kept for a short TTL. Revocations are published on a Redis pub/sub
+    channel and evicted from every process's cache as soon as they are received, so
+    the TTL only bounds staleness when the subscription is down.
+    """
+
+    def __init__(self, redis_url=None, ttl=None, max_size=None):
+        """
+        Initialize the BlacklistCache.
+
+        Args:
+            redis_url: Redis URL. If None, uses settings.REDIS_URL.
+            ttl: Seconds a lookup result is trusted. If None, uses settings.TOKEN_BLACKLIST_CACHE_TTL.
+            max_size: Maximum number of cached JTIs. If None, uses settings.TOKEN_BLACKLIST_CACHE_SIZE.
+        """
+        self.redis_url = redis_url
+        self.ttl = ttl if ttl is not None else getattr(settings, 'TOKEN_BLACKLIST_CACHE_TTL', 5)
+        self.max_size = max_size or getattr(settings, 'TOKEN_BLACKLIST_CACHE_SIZE', 10000)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._listener_pid = None
+
+    def is_blacklisted(self, jti):
+        """
+        Check if a token JTI is blacklisted.
+
+        Args:
+            jti: The JWT ID.
+
+        Returns:
+            bool: True if blacklisted, False otherwise.
+        """
+        self._ensure_listener()
+
+        cached = self._get(jti)
+        if cached is not None:
+            return cached
+
+        r = get_redis_client(self.redis_url)
+        if r is None:
+            return False
+        blacklisted = r.exists(f"{BLACKLIST_KEY_PREFIX}{jti}") > 0
+        self._set(jti, blacklisted)
+        return blacklisted
+
+    def blacklist(self, jti, ttl):
+        """
+        Add a token JTI to the blacklist and notify all processes.
+
+        Args:
+            jti: The JWT ID.
+            ttl: Time to live in seconds.
+
+        Returns:
+            bool: True if successful, False otherwise.
+        """
+        r = get_redis_client(self.redis_url)
+        if r is None:
+            return False
+
+        pipe = r.pipeline(transaction=False)
+        pipe.setex(f"{BLACKLIST_KEY_PREFIX}{jti}", ttl, "1")
+        pipe.publish(BLACKLIST_CHANNEL, jti)
+        pipe.execute()
+
+        self._set(jti, True)
+        return True
+
+    def blacklist_many(self, entries):
+        """
+        Add many token JTIs to the blacklist in one pipeline.
+
+        Args:
+            entries: dict {jti: ttl in seconds}. Entries with no remaining TTL are skipped.
+
+        Returns:
+            int: Number of JTIs blacklisted.
+        """
+        entries = {jti: ttl for jti, ttl in entries.items() if ttl > 0}
+        if not entries:
+            return 0
+
+        r = get_redis_client(self.redis_url)
+        if r is None:
+            return 0
+
+        pipe = r.pipeline(transaction=False)
+        for jti, ttl in entries.items():
+            pipe.setex(f"{BLACKLIST_KEY_PREFIX}{jti}", ttl, "1")
+            pipe.publish(BLACKLIST_CHANNEL, jti)
+        pipe.execute()
+
+        for jti in entries:
+            self._set(jti, True)
+        return len(entries)
+
+    def invalidate(self, jti=None):
+        """
+        Drop a cached lookup, or the whole cache if jti is None.
+
+        Args:
+            jti: The JWT ID.
+        """
+        with self._lock:
+            if jti is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(jti, None)
+
+    def _get(self, jti):
+        with self._lock:
+            entry = self._entries.get(jti)
+            if entry is None:
+                return None
+            blacklisted, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[jti]
+                return None
+            return blacklisted
+
+    def _set(self, jti, blacklisted):
+        with self._lock:
+            self._entries[jti] = (blacklisted, time.monotonic() + self.ttl)
+            self._entries.move_to_end(jti)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def _ensure_listener(self):
+        """
+        Start the invalidation listener once per process.
+        """
+        pid = os.getpid()
+        if self._listener_pid == pid:
+            return
+        with self._lock:
+            if self._listener_pid == pid:
+                return
+            self._listener_pid = pid
+            # Entries inherited from a parent process missed its invalidations
+            self._entries.clear()
+        thread = threading.Thread(target=self._listen, name='token-blacklist-listener', daemon=True)
+        thread.start()
+
+    def _listen(self):
+        """
+        Evict cached lookups for JTIs published on the blacklist channel.
+        """
+        while True:
+            try:
+                r = get_redis_client(self.redis_url)
+                if r is None:
+                    return
+                pubsub = r.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(BLACKLIST_CHANNEL)
+                # Anything revoked while we were disconnected was not received
+                self.invalidate()
+                for message in pubsub.listen():
+                    if message.get('type') != 'message':
+                        continue
+                    jti = message['data']
+                    if isinstance(jti, bytes):
+                        jti = jti.decode('utf-8')
+                    self.invalidate(jti)
+            except Exception as e:
+                logger.error(f"Token blacklist listener error: {str(e)}")
+            # Cached lookups are not kept coherent while disconnected
+            self.invalidate()
+            time.sleep(1)
+
+
+blacklist_cache = BlacklistCache()
@@ -4,6 +4,7 @@ import redis
 import os
 from datetime import datetime
 from django.conf import settings
+from .redis_client import get_redis_client
 
 logger = logging.getLogger(__name__)
 
@@ -15,6 +16,7 @@ class RedisNotificationClient:
         self.stream_name = stream_name
         self._redis_client = None
         self.redis_url = redis_url
+        self._created_groups = set()
 
     @property
     def redis_client(self):
@@ -24,7 +26,7 @@ class RedisNotificationClient:
                 self.redis_url = getattr(settings, 'REDIS_URL', None)
             if not self.redis_url:
                 self.redis_url = os.environ.get('REDIS_URL', 'redis://redis:6379/0')
-            self._redis_client = redis.from_url(self.redis_url)
+            self._redis_client = get_redis_client(self.redis_url)
         return self._redis_client
 
     def publish_notification(self, service, event_type, data, recipients=None):
@@ -51,10 +53,58 @@ class RedisNotificationClient:
             logger.error(f"Error publishing notification to Redis: {str(e)}")
             return None
 
+    # SET NX khóa chống trùng và XADD trong một lệnh nguyên tử
+    PUBLISH_ONCE_SCRIPT = """
+if redis.call('SET', KEYS[1], '1', 'NX', 'EX', ARGV[1]) then
+    local fields = {}
+    for i = 3, #ARGV do
+        fields[#fields + 1] = ARGV[i]
+    end
+    return redis.call('XADD', KEYS[2], 'MAXLEN', '~', ARGV[2], '*', unpack(fields))
+end
+return false
+"""
+
+    def publish_notification_once(self, event_id, service, event_type, data, recipients=None, timestamp=None, dedupe_ttl=86400):
+        """
+        Gửi thông báo đến Redis Stream đúng một lần cho mỗi event_id (dùng cho outbox relay)
+
+        Returns:
+        - message ID nếu đã gửi, False nếu event_id đã được gửi trước đó, None nếu lỗi
+        """
+        try:
+            notification = {
+                "service": service,
+                "event_type": event_type,
+                "event_id": str(event_id),
+                "timestamp": timestamp or datetime.now().isoformat(),
+                "recipients": json.dumps(recipients or []),
+                "data": json.dumps(data or {})
+            }
+            fields = [item for pair in notification.items() for item in pair]
+            message_id = self.redis_client.eval(
+                self.PUBLISH_ONCE_SCRIPT,
+                2,
+                f"notification_event:{event_id}",
+                self.stream_name,
+                dedupe_ttl,
+                100000,
+                *fields
+            )
+            if not message_id:
+                logger.info(f"Skipped duplicate notification {event_id}")
+                return False
+            return message_id
+        except Exception as e:
+            logger.error(f"Error publishing notification {event_id} to Redis: {str(e)}")
+            return None
+
     def create_consumer_group(self, group_name):
         """
         Tạo consumer group để xử lý thông báo
         """
+        if group_name in self._created_groups:
+            return
         try:
             self.redis_client.xgroup_create(
                 self.stream_name,
@@ -68,6 +118,7 @@ class RedisNotificationClient:
                 logger.debug(f"Consumer group {group_name} already exists")
             else:
                 raise
+        self._created_groups.add(group_name)
 
     def read_notifications(self, group_name, consumer_name, count=10, block=2000):
         """
@@ -96,6 +147,107 @@ class RedisNotificationClient:
         except Exception as e:
             logger.error(f"Error acknowledging message {message_id}: {str(e)}")
 
+    def acknowledge_messages(self, group_name, message_ids):
+        """
+        Xác nhận đã xử lý nhiều tin nhắn bằng một lệnh XACK
+        """
+        if not message_ids:
+            return 0
+        try:
+            return self.redis_client.xack(self.stream_name, group_name, *message_ids)
+        except Exception as e:
+            logger.error(f"Error acknowledging {len(message_ids)} messages: {str(e)}")
+            return 0
+
+    def claim_stale_messages(self, group_name, consumer_name, min_idle_time=60000, count=100, start_id="0-0"):
+        """
+        Nhận lại các tin nhắn đang chờ xử lý quá min_idle_time (ms) từ consumer khác (XAUTOCLAIM)
+
+        Returns:
+        - tuple: (next_start_id, danh sách (message_id, message_data))
+        """
+        try:
+            self.create_consumer_group(group_name)
+            result = self.redis_client.xautoclaim(
+                self.stream_name,
+                group_name,
+                consumer_name,
+                min_idle_time,
+                start_id=start_id,
+                count=count
+            )
+            # Redis 7 trả thêm danh sách ID đã bị xóa khỏi stream
+            next_start_id, messages = result[0], result[1]
+            # Bỏ qua các mục đã bị xóa khỏi stream (message_data rỗng)
+            return next_start_id, [(message_id, data) for message_id, data in messages if data]
+        except Exception as e:
+            logger.error(f"Error claiming stale notifications from Redis: {str(e)}")
+            return start_id, []
+
+    def get_delivery_counts(self, group_name, message_ids):
+        """
+        Lấy số lần đã giao của các tin nhắn đang chờ xác nhận (XPENDING)
+
+        Returns:
+        - dict: {message_id: số lần giao}; tin nhắn không còn pending sẽ không có trong kết quả
+        """
+        if not message_ids:
+            return {}
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            for message_id in message_ids:
+                pipe.xpending_range(self.stream_name, group_name, min=message_id, max=message_id, count=1)
+            counts = {}
+            for message_id, entries in zip(message_ids, pipe.execute()):
+                if entries:
+                    counts[message_id] = entries[0]['times_delivered']
+            return counts
+        except Exception as e:
+            logger.error(f"Error getting delivery counts from Redis: {str(e)}")
+            return {}
+
+    def dead_letter_messages(self, group_name, messages, dead_letter_stream, reason=''):
+        """
+        Chuyển tin nhắn không xử lý được sang dead-letter stream và xác nhận chúng trong một pipeline
+
+        Parameters:
+        - messages: danh sách (message_id, message_data)
+        """
+        if not messages:
+            return 0
+        try:
+            pipe = self.redis_client.pipeline(transaction=True)
+            for message_id, message_data in messages:
+                fields = dict(message_data)
+                fields['original_id'] = message_id
+                fields['dead_letter_reason'] = reason
+                pipe.xadd(dead_letter_stream, fields, maxlen=100000, approximate=True)
+            pipe.xack(self.stream_name, group_name, *[message_id for message_id, _ in messages])
+            pipe.execute()
+            return len(messages)
+        except Exception as e:
+            logger.error(f"Error moving {len(messages)} messages to {dead_letter_stream}: {str(e)}")
+            return 0
+
+    def get_group_lag(self, group_name):
+        """
+        Lấy số tin nhắn chưa được đọc (lag) và đang chờ xác nhận (pending) của consumer group
+        """
+        try:
+            for group in self.redis_client.xinfo_groups(self.stream_name):
+                name = group.get('name')
+                if isinstance(name, bytes):
+                    name = name.decode('utf-8')
+                if name == group_name:
+                    # Trường 'lag' chỉ có từ Redis 7
+                    return {
+                        'lag': group.get('lag'),
+                        'pending': group.get('pending', 0)
+                    }
+        except Exception as e:
+            logger.error(f"Error getting consumer group info from Redis: {str(e)}")
+        return {'lag': None, 'pending': None}
+
 # Helper functions
 def get_notification_client():
     return RedisNotificationClient()
@@ -2,13 +2,91 @@
 Service Client for inter-service communication in Healthcare System.
 """
 import requests
+import asyncio
+import contextvars
 import logging
+import random
+import threading
 import time
 import os
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from urllib.parse import urljoin
+from requests.adapters import HTTPAdapter
+from .metrics import record_outbound_call
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
 
 logger = logging.getLogger(__name__)
 
+# Connections kept alive per host by the shared session
+POOL_MAXSIZE = int(os.environ.get("API_POOL_MAXSIZE", "20"))
+# Maximum concurrent requests from this process to one service
+MAX_CONCURRENCY = int(os.environ.get("API_MAX_CONCURRENCY", "10"))
+# Threads used by gather() and hedged requests
+MAX_WORKERS = int(os.environ.get("API_MAX_WORKERS", "16"))
+# Upper bound for the retry backoff delay (seconds)
+MAX_RETRY_DELAY = float(os.environ.get("API_MAX_RETRY_DELAY", "8"))
+
+_session = None
+_executor = None
+_hedge_executor = None
+_semaphores = {}
+_shared_lock = threading.Lock()
+
+
+def get_session():
+    """
+    Get the requests.Session shared by all service clients in this process.
+    """
+    global _session
+    if _session is None:
+        with _shared_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=10, pool_maxsize=POOL_MAXSIZE)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                _session = session
+    return _session
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _shared_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix='service-client')
+    return _executor
+
+
+def _get_hedge_executor():
+    # Separate from _executor so that hedged requests made from gather() never wait
+    # on the pool they are running in
+    global _hedge_executor
+    if _hedge_executor is None:
+        with _shared_lock:
+            if _hedge_executor is None:
+                _hedge_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix='service-client-hedge')
+    return _hedge_executor
+
+
+def _get_semaphore(service_name, limit):
+    semaphore = _semaphores.get(service_name)
+    if semaphore is None:
+        with _shared_lock:
+            semaphore = _semaphores.setdefault(service_name, threading.BoundedSemaphore(limit))
+    return semaphore
+
+
+def backoff_delay(retry, retry_delay):
+    """
+    Delay before a retry: exponential backoff with full jitter.
+    """
+    return random.uniform(0, min(MAX_RETRY_DELAY, retry_delay * (2 ** retry)))
+
 class ServiceClient:
     """
     Base client for inter-service communication.
@@ -16,13 +94,16 @@ class ServiceClient:
     This client provides a standardized way for services to communicate with each other,
     with built-in support for:
     - Authentication token handling
-    - Retry mechanism
+    - Retry mechanism with exponential backoff
+    - Keep-alive connections shared by all clients in the process
+    - Per-service concurrency limits
+    - Concurrent requests with gather() and hedged GETs
     - Health checks
     - Pagination
     - Error handling
     """
 
-    def __init__(self, service_name, base_url=None, api_gateway_url=None):
+    def __init__(self, service_name, base_url=None, api_gateway_url=None, max_concurrency=None, hedge_delay=None):
         """
         Initialize the service client.
 
@@ -32,6 +113,10 @@ class ServiceClient:
                                      will try to get from environment variables.
             api_gateway_url (str, optional): URL of the API Gateway. If not provided,
                                            will try to get from environment variables.
+            max_concurrency (int, optional): Maximum concurrent requests to this service
+                                             from this process.
+            hedge_delay (float, optional): Seconds to wait before sending a hedged copy
+                                           of a GET request. Hedging is disabled if not set.
         """
         self.service_name = service_name
 
@@ -53,6 +138,10 @@ class ServiceClient:
         self.retry_delay = int(os.environ.get("API_RETRY_DELAY", "1"))
         self.timeout = int(os.environ.get("API_TIMEOUT", "5"))
         self.use_api_gateway = os.environ.get("USE_API_GATEWAY", "true").lower() == "true"
+        self.max_concurrency = max_concurrency or int(os.environ.get(f"{service_name}_MAX_CONCURRENCY", MAX_CONCURRENCY))
+        if hedge_delay is None and os.environ.get("API_HEDGE_DELAY"):
+            hedge_delay = float(os.environ["API_HEDGE_DELAY"])
+        self.hedge_delay = hedge_delay
 
         logger.info(f"Initialized {service_name} client with base_url={self.base_url}, "
                    f"api_gateway_url={self.api_gateway_url}, use_api_gateway={self.use_api_gateway}")
@@ -81,102 +170,181 @@ class ServiceClient:
 
         return headers
 
-    def make_api_request(self, method, endpoint, data=None, params=None, token=None,
-                        use_api_gateway=None, retry=0, paginate=False, page=1, page_size=10):
+    def build_url(self, endpoint, use_api_gateway=None):
         """
-        Make an API request to another service.
+        Build the full URL for an endpoint.
 
         Args:
-            method (str): HTTP method ('get', 'post', 'put', 'patch', 'delete')
             endpoint (str): API endpoint (e.g., '/api/users/')
-            data (dict, optional): Data to send in the request body
-            params (dict, optional): Query parameters
-            token (str, optional): JWT token for authentication
             use_api_gateway (bool, optional): Whether to use the API Gateway
-            retry (int, optional): Current retry attempt
-            paginate (bool, optional): Whether to use pagination
-            page (int, optional): Page number for pagination
-            page_size (int, optional): Page size for pagination
 
         Returns:
-            dict or None: Response data or None if the request failed
+            str: Full URL
         """
-        # Determine whether to use API Gateway
         if use_api_gateway is None:
             use_api_gateway = self.use_api_gateway
 
-        # Build URL
+        # Remove leading slash if present
+        if endpoint.startswith('/'):
+            endpoint = endpoint[1:]
+
         if use_api_gateway:
-            # Remove leading slash if present
-            if endpoint.startswith('/'):
-                endpoint = endpoint[1:]
-            url = urljoin(self.api_gateway_url, endpoint)
-        else:
-            # Remove leading slash if present
-            if endpoint.startswith('/'):
-                endpoint = endpoint[1:]
-            url = urljoin(self.base_url, endpoint)
+            return urljoin(self.api_gateway_url, endpoint)
+        return urljoin(self.base_url, endpoint)
 
-        # Get authentication headers
+    def _prepare_request(self, endpoint, params, token, use_api_gateway, paginate, page, page_size):
+        url = self.build_url(endpoint, use_api_gateway)
         headers = self.get_auth_headers(token)
 
         # Add pagination parameters if needed
         if paginate:
-            if params is None:
-                params = {}
+            params = dict(params or {})
             params['page'] = page
             params['page_size'] = page_size
 
-        try:
-            logger.debug(f"Making {method.upper()} request to {url}")
-
-            # Make the request
-            response = getattr(requests, method.lower())(
-                url,
-                json=data,
-                params=params,
-                headers=headers,
-                timeout=self.timeout
-            )
+        return url, params, headers
 
-            # Log response status
-            logger.debug(f"Response status: {response.status_code}")
-
-            # Handle response
-            if response.status_code in [200, 201, 204]:
-                if response.status_code == 204 or not response.content:
-                    return {}
-                return response.json()
-            elif response.status_code == 404:
-                logger.warning(f"Resource not found: {url}")
-                return None
-            else:
-                logger.error(f"API request failed: {response.status_code} - {response.text}")
+    def _handle_response(self, response, url):
+        """
+        Convert a response into result data.
+
+        Returns:
+            tuple: (result, retryable)
+        """
+        # Log response status
+        logger.debug("Response status: %s", response.status_code)
 
-                # Retry on server errors
-                if response.status_code >= 500 and retry < self.max_retries:
-                    logger.warning(f"Retrying {retry+1}/{self.max_retries} after server error")
-                    time.sleep(self.retry_delay)
-                    return self.make_api_request(
-                        method, endpoint, data, params, token,
-                        use_api_gateway, retry+1, paginate, page, page_size
-                    )
+        if response.status_code in [200, 201, 204]:
+            if response.status_code == 204 or not response.content:
+                return {}, False
+            return response.json(), False
+        elif response.status_code == 404:
+            logger.warning(f"Resource not found: {url}")
+            return None, False
 
-                return None
+        logger.error(f"API request failed: {response.status_code} - {response.text}")
+        # Retry on server errors
+        return None, response.status_code >= 500
 
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Request exception: {str(e)}")
+    def make_api_request(self, method, endpoint, data=None, params=None, token=None,
+                        use_api_gateway=None, retry=0, paginate=False, page=1, page_size=10,
+                        hedge=None):
+        """
+        Make an API request to another service.
+
+        Args:
+            method (str): HTTP method ('get', 'post', 'put', 'patch', 'delete')
+            endpoint (str): API endpoint (e.g., '/api/users/')
+            data (dict, optional): Data to send in the request body
+            params (dict, optional): Query parameters
+            token (str, optional): JWT token for authentication
+            use_api_gateway (bool, optional): Whether to use the API Gateway
+            retry (int, optional): Number of retry attempts already used
+            paginate (bool, optional): Whether to use pagination
+            page (int, optional): Page number for pagination
+            page_size (int, optional): Page size for pagination
+            hedge (bool, optional): Send a hedged copy of a slow GET request.
+                                    Defaults to True when hedge_delay is configured.
 
-            # Retry on connection errors
-            if retry < self.max_retries:
+        Returns:
+            dict or None: Response data or None if the request failed
+        """
+        url, params, headers = self._prepare_request(endpoint, params, token, use_api_gateway, paginate, page, page_size)
+
+        if hedge is None:
+            hedge = self.hedge_delay is not None
+        if hedge and method.lower() == 'get' and self.hedge_delay is not None:
+            return self._hedged_request(url, params, headers, retry)
+
+        return self._request_with_retry(method, url, data, params, headers, retry)
+
+    def _request_with_retry(self, method, url, data, params, headers, retry=0):
+        while True:
+            try:
+                logger.debug("Making %s request to %s", method.upper(), url)
+                with _get_semaphore(self.service_name, self.max_concurrency):
+                    start = time.perf_counter()
+                    try:
+                        response = get_session().request(
+                            method.upper(),
+                            url,
+                            json=data,
+                            params=params,
+                            headers=headers,
+                            timeout=self.timeout
+                        )
+                    except requests.exceptions.RequestException:
+                        record_outbound_call(self.service_name, method, time.perf_counter() - start)
+                        raise
+                record_outbound_call(self.service_name, method, time.perf_counter() - start, response.status_code)
+                result, retryable = self._handle_response(response, url)
+                if not retryable or retry >= self.max_retries:
+                    return result
+                logger.warning(f"Retrying {retry+1}/{self.max_retries} after server error")
+
+            except requests.exceptions.RequestException as e:
+                logger.error(f"Request exception: {str(e)}")
+
+                # Retry on connection errors
+                if retry >= self.max_retries:
+                    return None
                 logger.warning(f"Retrying {retry+1}/{self.max_retries} after connection error")
-                time.sleep(self.retry_delay)
-                return self.make_api_request(
-                    method, endpoint, data, params, token,
-                    use_api_gateway, retry+1, paginate, page, page_size
-                )
 
-            return None
+            time.sleep(backoff_delay(retry, self.retry_delay))
+            retry += 1
+
+    def _hedged_request(self, url, params, headers, retry=0):
+        """
+        Send a GET request and, if it has not completed after hedge_delay seconds,
+        a second identical one. The first successful result wins.
+        """
+        executor = _get_hedge_executor()
+        futures = [executor.submit(contextvars.copy_context().run, self._request_with_retry, 'get', url, None, params, headers, retry)]
+        done, _ = wait(futures, timeout=self.hedge_delay)
+        if not done:
+            logger.debug("Sending hedged request to %s", url)
+            futures.append(executor.submit(contextvars.copy_context().run, self._request_with_retry, 'get', url, None, params, headers, retry))
+
+        pending = set(futures)
+        result = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                if result is not None:
+                    # The losing request finishes in the background
+                    return result
+        return result
+
+    def gather(self, calls):
+        """
+        Make many API requests concurrently.
+
+        Args:
+            calls (list): Requests as (method, endpoint) or (method, endpoint, kwargs) tuples,
+                          where kwargs are keyword arguments of make_api_request.
+
+        Returns:
+            list: Response data (or None) for each request, in the same order
+        """
+        if not calls:
+            return []
+
+        executor = _get_executor()
+        futures = []
+        for call in calls:
+            method, endpoint = call[0], call[1]
+            kwargs = call[2] if len(call) > 2 else {}
+            futures.append(executor.submit(contextvars.copy_context().run, self.make_api_request, method, endpoint, **kwargs))
+
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                logger.error(f"Error in concurrent request to {self.service_name}: {str(e)}")
+                results.append(None)
+        return results
 
     def check_health(self):
         """
@@ -189,7 +357,7 @@ class ServiceClient:
             # Simplified health check - direct request to avoid token issues
             service_path = self.service_name.lower().replace('_', '-')
             url = f"{self.api_gateway_url}/api/{service_path}/health"
-            response = requests.get(url, timeout=2)
+            response = get_session().get(url, timeout=2)
             return response.status_code == 200
         except Exception as e:
             logger.error(f"Health check failed: {str(e)}")
@@ -197,7 +365,7 @@ class ServiceClient:
 
     # Convenience methods for common HTTP methods
 
-    def get(self, endpoint, params=None, token=None, paginate=False, page=1, page_size=10):
+    def get(self, endpoint, params=None, token=None, paginate=False, page=1, page_size=10, hedge=None):
         """
         Make a GET request to the service.
 
@@ -208,13 +376,14 @@ class ServiceClient:
             paginate (bool, optional): Whether to use pagination
             page (int, optional): Page number for pagination
             page_size (int, optional): Page size for pagination
+            hedge (bool, optional): Send a hedged copy if the request is slow
 
         Returns:
             dict or None: Response data or None if the request failed
         """
         return self.make_api_request(
             'get', endpoint, params=params, token=token,
-            paginate=paginate, page=page, page_size=page_size
+            paginate=paginate, page=page, page_size=page_size, hedge=hedge
         )
 
     def post(self, endpoint, data=None, token=None):
@@ -271,3 +440,176 @@ class ServiceClient:
             dict or None: Response data or None if the request failed
         """
         return self.make_api_request('delete', endpoint, token=token)
+
+
+class AsyncServiceClient(ServiceClient):
+    """
+    asyncio variant of ServiceClient based on httpx, for use from Channels consumers
+    and other async code.
+
+    Each client keeps one httpx.AsyncClient (with keep-alive connections) for the
+    event loop it is first used in; call aclose() when the loop shuts down.
+    """
+
+    def __init__(self, service_name, base_url=None, api_gateway_url=None, max_concurrency=None, hedge_delay=None):
+        if httpx is None:
+            raise ImportError("httpx is required for AsyncServiceClient (pip install common-auth[async])")
+        super().__init__(service_name, base_url, api_gateway_url, max_concurrency, hedge_delay)
+        self._client = None
+        self._semaphore = None
+
+    def _get_client(self):
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.max_concurrency, max_keepalive_connections=POOL_MAXSIZE)
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._client
+
+    async def aclose(self):
+        """
+        Close the underlying connections.
+        """
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            self._semaphore = None
+
+    async def make_api_request(self, method, endpoint, data=None, params=None, token=None,
+                               use_api_gateway=None, retry=0, paginate=False, page=1, page_size=10,
+                               hedge=None):
+        """
+        Make an API request to another service.
+
+        Takes the same arguments as ServiceClient.make_api_request.
+
+        Returns:
+            dict or None: Response data or None if the request failed
+        """
+        url, params, headers = self._prepare_request(endpoint, params, token, use_api_gateway, paginate, page, page_size)
+
+        if hedge is None:
+            hedge = self.hedge_delay is not None
+        if hedge and method.lower() == 'get' and self.hedge_delay is not None:
+            return await self._hedged_request(url, params, headers, retry)
+
+        return await self._request_with_retry(method, url, data, params, headers, retry)
+
+    async def _request_with_retry(self, method, url, data, params, headers, retry=0):
+        client = self._get_client()
+        while True:
+            try:
+                logger.debug("Making %s request to %s", method.upper(), url)
+                async with self._semaphore:
+                    start = time.perf_counter()
+                    try:
+                        response = await client.request(
+                            method.upper(),
+                            url,
+                            json=data,
+                            params=params,
+                            headers=headers
+                        )
+                    except httpx.HTTPError:
+                        record_outbound_call(self.service_name, method, time.perf_counter() - start)
+                        raise
+                record_outbound_call(self.service_name, method, time.perf_counter() - start, response.status_code)
+                result, retryable = self._handle_response(response, url)
+                if not retryable or retry >= self.max_retries:
+                    return result
+                logger.warning(f"Retrying {retry+1}/{self.max_retries} after server error")
+
+            except httpx.HTTPError as e:
+                logger.error(f"Request exception: {str(e)}")
+
+                # Retry on connection errors
+                if retry >= self.max_retries:
+                    return None
+                logger.warning(f"Retrying {retry+1}/{self.max_retries} after connection error")
+
+            await asyncio.sleep(backoff_delay(retry, self.retry_delay))
+            retry += 1
+
+    async def _hedged_request(self, url, params, headers, retry=0):
+        """
+        Send a GET request and, if it has not completed after hedge_delay seconds,
+        a second identical one. The first successful result wins.
+        """
+        tasks = {asyncio.ensure_future(self._request_with_retry('get', url, None, params, headers, retry))}
+        done, _ = await asyncio.wait(tasks, timeout=self.hedge_delay)
+        if not done:
+            logger.debug("Sending hedged request to %s", url)
+            tasks.add(asyncio.ensure_future(self._request_with_retry('get', url, None, params, headers, retry)))
+
+        pending = tasks
+        result = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    result = task.result()
+                    if result is not None:
+                        return result
+            return result
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def gather(self, calls):
+        """
+        Make many API requests concurrently.
+
+        Args:
+            calls (list): Requests as (method, endpoint) or (method, endpoint, kwargs) tuples,
+                          where kwargs are keyword arguments of make_api_request.
+
+        Returns:
+            list: Response data (or None) for each request, in the same order
+        """
+        coroutines = []
+        for call in calls:
+            method, endpoint = call[0], call[1]
+            kwargs = call[2] if len(call) > 2 else {}
+            coroutines.append(self.make_api_request(method, endpoint, **kwargs))
+
+        results = await asyncio.gather(*coroutines, return_exceptions=True)
+        for index, result in enumerate(results):
+            if isinstance(result, Exception):
+                logger.error(f"Error in concurrent request to {self.service_name}: {str(result)}")
+                results[index] = None
+        return results
+
+    async def check_health(self):
+        """
+        Check the health of the service.
+
+        Returns:
+            bool: True if the service is healthy, False otherwise
+        """
+        try:
+            service_path = self.service_name.lower().replace('_', '-')
+            url = f"{self.api_gateway_url}/api/{service_path}/health"
+            response = await self._get_client().get(url, timeout=2)
+            return response.status_code == 200
+        except Exception as e:
+            logger.error(f"Health check failed: {str(e)}")
+            return False
+
+    async def get(self, endpoint, params=None, token=None, paginate=False, page=1, page_size=10, hedge=None):
+        return await self.make_api_request(
+            'get', endpoint, params=params, token=token,
+            paginate=paginate, page=page, page_size=page_size, hedge=hedge
+        )
+
+    async def post(self, endpoint, data=None, token=None):
+        return await self.make_api_request('post', endpoint, data=data, token=token)
+
+    async def put(self, endpoint, data=None, token=None):
+        return await self.make_api_request('put', endpoint, data=data, token=token)
+
+    async def patch(self, endpoint, data=None, token=None):
+        return await self.make_api_request('patch', endpoint, data=data, token=token)
+
+    async def delete(self, endpoint, token=None):
+        return await self.make_api_request('delete', endpoint, token=token)
@@ -1,12 +1,13 @@
 """
 Session management utilities for the Healthcare System.
 """
-import redis
 import json
 import uuid
 import logging
 from datetime import datetime, timedelta
 from django.conf import settings
+from redis.exceptions import ResponseError
+from .redis_client import get_redis_client
 
 logger = logging.getLogger(__name__)
 
@@ -25,6 +26,14 @@ class SessionManager:
         self.redis_url = redis_url or getattr(settings, 'REDIS_URL', None)
         self.session_ttl = getattr(settings, 'SESSION_TTL', 86400)  # Default: 1 day
         self.max_sessions_per_user = getattr(settings, 'MAX_SESSIONS_PER_USER', 5)
+        # 'json' stores each session as one JSON string, 'hash' as a Redis hash whose
+        # activity fields are only written when they change (see SessionActivity)
+        self.storage = getattr(settings, 'SESSION_STORAGE', 'json')
+        self.activity_granularity = getattr(settings, 'SESSION_ACTIVITY_GRANULARITY', 60)
+    
+    @property
+    def use_hash_storage(self):
+        return self.storage == 'hash'
     
     def create_session(self, user_id, user_data=None, request=None):
         """
@@ -43,7 +52,7 @@ class SessionManager:
                 logger.warning("Redis URL not configured")
                 return None, None
             
-            r = redis.from_url(self.redis_url)
+            r = get_redis_client(self.redis_url)
             
             # Generate session ID
             session_id = str(uuid.uuid4())
@@ -65,15 +74,11 @@ class SessionManager:
                     'user_agent': request.META.get('HTTP_USER_AGENT', '')
                 })
             
-            # Store session in Redis
-            r.setex(
-                f"session:{session_id}",
-                self.session_ttl,
-                json.dumps(session_data)
-            )
-            
-            # Add to user's sessions set
-            r.sadd(f"user_sessions:{user_id}", session_id)
+            # Store session in Redis and add to user's sessions set
+            pipe = r.pipeline(transaction=False)
+            self._write_session(pipe, session_id, session_data)
+            pipe.sadd(f"user_sessions:{user_id}", session_id)
+            pipe.execute()
             
             # Enforce maximum sessions per user
             self._enforce_max_sessions(user_id, r)
@@ -98,14 +103,10 @@ class SessionManager:
             if not self.redis_url or not session_id:
                 return None
             
-            r = redis.from_url(self.redis_url)
+            r = get_redis_client(self.redis_url)
             
             # Get session data
-            session_data = r.get(f"session:{session_id}")
-            if not session_data:
-                return None
-            
-            return json.loads(session_data)
+            return self._read_session(r, session_id)
         
         except Exception as e:
             logger.error(f"Error getting session: {str(e)}")
@@ -127,15 +128,13 @@ class SessionManager:
             if not self.redis_url or not session_id:
                 return False
             
-            r = redis.from_url(self.redis_url)
+            r = get_redis_client(self.redis_url)
             
             # Get current session data
-            session_data = r.get(f"session:{session_id}")
-            if not session_data:
+            data = self._read_session(r, session_id)
+            if not data:
                 return False
             
-            data = json.loads(session_data)
-            
             # Update last activity
             data['last_activity'] = datetime.now().isoformat()
             
@@ -151,11 +150,9 @@ class SessionManager:
                 })
             
             # Store updated session in Redis
-            r.setex(
-                f"session:{session_id}",
-                self.session_ttl,
-                json.dumps(data)
-            )
+            pipe = r.pipeline(transaction=False)
+            self._write_session(pipe, session_id, data)
+            pipe.execute()
             
             return True
         
@@ -177,12 +174,11 @@ class SessionManager:
             if not self.redis_url or not session_id:
                 return False
             
-            r = redis.from_url(self.redis_url)
+            r = get_redis_client(self.redis_url)
             
             # Get session data to find user_id
-            session_data = r.get(f"session:{session_id}")
-            if session_data:
-                data = json.loads(session_data)
+            data = self._read_session(r, session_id)
+            if data:
                 user_id = data.get('user_id')
                 
                 if user_id:
@@ -208,29 +204,46 @@ class SessionManager:
         Returns:
             int: Number of sessions terminated.
         """
+        return self.terminate_users_sessions([user_id]).get(str(user_id), 0)
+    
+    def terminate_users_sessions(self, user_ids):
+        """
+        Terminate all sessions for many users at once.
+        
+        Args:
+            user_ids: List of user IDs.
+        
+        Returns:
+            dict: {user_id (str): number of sessions terminated}
+        """
         try:
             if not self.redis_url:
-                return 0
-            
-            r = redis.from_url(self.redis_url)
-            
-            # Get all sessions for the user
-            session_ids = r.smembers(f"user_sessions:{user_id}")
-            count = 0
-            
-            # Delete each session
-            for session_id in session_ids:
-                r.delete(f"session:{session_id.decode('utf-8')}")
-                count += 1
-            
-            # Delete the set
-            r.delete(f"user_sessions:{user_id}")
-            
-            return count
+                return {}
+            
+            r = get_redis_client(self.redis_url)
+            user_ids = [str(user_id) for user_id in user_ids]
+            if not user_ids:
+                return {}
+            
+            # Get all sessions for the users
+            pipe = r.pipeline(transaction=False)
+            for user_id in user_ids:
+                pipe.smembers(f"user_sessions:{user_id}")
+            session_sets = pipe.execute()
+            
+            # Delete the sessions and the sets
+            keys = [f"user_sessions:{user_id}" for user_id in user_ids]
+            counts = {}
+            for user_id, session_ids in zip(user_ids, session_sets):
+                keys.extend(self._session_key(session_id.decode('utf-8')) for session_id in session_ids)
+                counts[user_id] = len(session_ids)
+            r.delete(*keys)
+            
+            return counts
         
         except Exception as e:
             logger.error(f"Error terminating user sessions: {str(e)}")
-            return 0
+            return {}
     
     def get_user_sessions(self, user_id):
         """
@@ -246,7 +259,7 @@ class SessionManager:
             if not self.redis_url:
                 return []
             
-            r = redis.from_url(self.redis_url)
+            r = get_redis_client(self.redis_url)
             
             # Get all sessions for the user
             session_ids = r.smembers(f"user_sessions:{user_id}")
@@ -254,11 +267,9 @@ class SessionManager:
             
             # Get data for each session
             for session_id in session_ids:
-                session_key = f"session:{session_id.decode('utf-8')}"
-                session_data = r.get(session_key)
+                data = self._read_session(r, session_id.decode('utf-8'))
                 
-                if session_data:
-                    data = json.loads(session_data)
+                if data:
                     data['session_id'] = session_id.decode('utf-8')
                     sessions.append(data)
             
@@ -287,11 +298,9 @@ class SessionManager:
             # Get session data for all sessions
             sessions = []
             for session_id in session_ids:
-                session_key = f"session:{session_id.decode('utf-8')}"
-                session_data = redis_conn.get(session_key)
+                data = self._read_session(redis_conn, session_id.decode('utf-8'))
                 
-                if session_data:
-                    data = json.loads(session_data)
+                if data:
                     data['session_id'] = session_id.decode('utf-8')
                     
                     # Parse last activity timestamp
@@ -319,6 +328,122 @@ class SessionManager:
         except Exception as e:
             logger.error(f"Error enforcing max sessions: {str(e)}")
     
+    def start_activity(self, session_id, session_data=None):
+        """
+        Start tracking activity for a session during one request.
+        
+        Args:
+            session_id: The session ID.
+            session_data: Session data if already loaded.
+        
+        Returns:
+            SessionActivity or None if the session does not exist.
+        """
+        if session_data is None:
+            session_data = self.get_session(session_id)
+        if not session_data:
+            return None
+        return SessionActivity(self, session_id, session_data)
+    
+    def _session_key(self, session_id):
+        return f"session:{session_id}"
+    
+    def _write_session(self, pipe, session_id, data):
+        """
+        Queue a full write of a session on a pipeline.
+        
+        Args:
+            pipe: Redis pipeline.
+            session_id: The session ID.
+            data: Session data.
+        """
+        key = self._session_key(session_id)
+        if self.use_hash_storage:
+            pipe.delete(key)
+            pipe.hset(key, mapping={field: json.dumps(value) for field, value in data.items()})
+            pipe.expire(key, self.session_ttl)
+        else:
+            pipe.setex(key, self.session_ttl, json.dumps(data))
+    
+    def _read_session(self, redis_conn, session_id):
+        """
+        Read a session in either storage format.
+        
+        Args:
+            redis_conn: Redis connection.
+            session_id: The session ID.
+        
+        Returns:
+            dict: Session data or None if not found.
+        """
+        key = self._session_key(session_id)
+        if self.use_hash_storage:
+            try:
+                fields = redis_conn.hgetall(key)
+            except ResponseError:
+                # Session written as JSON before hash storage was enabled
+                fields = None
+            if fields:
+                return {field.decode('utf-8'): json.loads(value) for field, value in fields.items()}
+            if fields is not None:
+                return None
+        
+        try:
+            session_data = redis_conn.get(key)
+        except ResponseError:
+            # Session written as a hash, read while json storage is configured
+            fields = redis_conn.hgetall(key)
+            return {field.decode('utf-8'): json.loads(value) for field, value in fields.items()} or None
+        if not session_data:
+            return None
+        
+        data = json.loads(session_data)
+        if self.use_hash_storage:
+            # Convert to a hash so later activity updates can write single fields
+            pipe = redis_conn.pipeline(transaction=False)
+            self._write_session(pipe, session_id, data)
+            pipe.execute()
+        return data
+    
+    # Update session fields only while the session exists, so activity flushed after
+    # the session was terminated or expired does not recreate it
+    FLUSH_ACTIVITY_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    redis.call('HSET', KEYS[1], unpack(ARGV, 2))
+    redis.call('EXPIRE', KEYS[1], ARGV[1])
+    return 1
+end
+return 0
+"""
+    
+    def _flush_activity(self, session_id, changes, user_id=None):
+        """
+        Write pending session activity, unless the session no longer exists.
+        
+        Args:
+            session_id: The session ID.
+            changes: Changed session fields.
+            user_id: User to register the session for, if newly associated.
+        """
+        r = get_redis_client(self.redis_url)
+        if r is None:
+            return
+        
+        key = self._session_key(session_id)
+        if self.use_hash_storage:
+            fields = [item for field, value in changes.items() for item in (field, json.dumps(value))]
+            written = r.eval(self.FLUSH_ACTIVITY_SCRIPT, 1, key, self.session_ttl, *fields)
+        else:
+            data = self._read_session(r, session_id)
+            if not data:
+                return
+            data.update(changes)
+            # XX: do not recreate a session deleted since it was read
+            written = r.set(key, json.dumps(data), ex=self.session_ttl, xx=True)
+        
+        if written and user_id is not None:
+            r.sadd(f"user_sessions:{user_id}", session_id)
+    
     def _get_client_ip(self, request):
         """
         Get client IP address from request.
@@ -335,3 +460,67 @@ class SessionManager:
         else:
             ip = request.META.get('REMOTE_ADDR')
         return ip
+
+
+class SessionActivity:
+    """
+    Pending activity updates for one session during a request.
+    
+    Changes are collected from the middleware and the authentication class and written
+    by flush(), only if the session still exists. last_activity is only rewritten once it
+    is older than SESSION_ACTIVITY_GRANULARITY seconds, and request fields only when they
+    change, so most requests do not write to Redis at all.
+    """
+    
+    def __init__(self, manager, session_id, session_data):
+        self.manager = manager
+        self.session_id = session_id
+        self.session_data = session_data
+        self.changes = {}
+        self.new_user_id = None
+    
+    def record(self, request=None, user=None):
+        """
+        Record activity for the current request.
+        
+        Args:
+            request: The HTTP request object (for IP and user agent).
+            user: The authenticated user, if any.
+        """
+        now = datetime.now()
+        last_activity = self.session_data.get('last_activity')
+        try:
+            stale = last_activity is None or (now - datetime.fromisoformat(last_activity)).total_seconds() >= self.manager.activity_granularity
+        except (ValueError, TypeError):
+            stale = True
+        if stale:
+            self._set('last_activity', now.isoformat())
+        
+        if request is not None:
+            self._set('ip_address', self.manager._get_client_ip(request))
+            self._set('user_agent', request.META.get('HTTP_USER_AGENT', ''))
+        
+        if user is not None:
+            if str(self.session_data.get('user_id')) != str(user.id):
+                self.new_user_id = user.id
+            self._set('user_id', user.id)
+            self._set('role', user.role)
+    
+    def flush(self):
+        """
+        Write recorded changes, if any.
+        
+        Returns:
+            bool: True if anything was written.
+        """
+        if not self.changes and self.new_user_id is None:
+            return False
+        self.manager._flush_activity(self.session_id, self.changes, self.new_user_id)
+        self.changes = {}
+        self.new_user_id = None
+        return True
+    
+    def _set(self, field, value):
+        if self.session_data.get(field) != value:
+            self.session_data[field] = value
+            self.changes[field] = value
@@ -3,11 +3,11 @@ Token management utilities for the Healthcare System.
 """
 import jwt
 import uuid
-import redis
 import json
 import logging
 from datetime import datetime, timedelta
 from django.conf import settings
+from .redis_client import get_redis_client, blacklist_cache
 
 logger = logging.getLogger(__name__)
 
@@ -16,6 +16,9 @@ class TokenManager:
     Manages JWT tokens, including creation, validation, and blacklisting.
     """
     
+    # When tokens were first added to the user_tokens index
+    INDEX_STARTED_KEY = "user_tokens_index:started_at"
+    
     def __init__(self, redis_url=None):
         """
         Initialize the TokenManager.
@@ -217,48 +220,102 @@ class TokenManager:
         Returns:
             int: Number of tokens blacklisted.
         """
+        return self.blacklist_users_tokens([user_id]).get(str(user_id), 0)
+    
+    def blacklist_users_tokens(self, user_ids):
+        """
+        Blacklist all tokens for many users at once, e.g. during incident response.
+        
+        Tokens are found through the per-user index sets maintained when tokens are
+        created, and all blacklist entries are written in one pipeline.
+        
+        Args:
+            user_ids: List of user IDs.
+        
+        Returns:
+            dict: {user_id (str): number of tokens blacklisted}
+        """
         try:
             if not self.redis_url:
                 logger.warning("Redis URL not configured")
-                return 0
+                return {}
+            
+            r = get_redis_client(self.redis_url)
+            user_ids = [str(user_id) for user_id in user_ids]
+            if not user_ids:
+                return {}
             
-            r = redis.from_url(self.redis_url)
+            # Get the indexed tokens of every user
+            pipe = r.pipeline(transaction=False)
+            for user_id in user_ids:
+                pipe.smembers(f"user_tokens:{user_id}")
+            jtis_by_user = {
+                user_id: {jti.decode('utf-8') for jti in jtis}
+                for user_id, jtis in zip(user_ids, pipe.execute())
+            }
             
-            # Get all tokens for the user
-            token_keys = r.keys(f"token:user:{user_id}:*")
-            count = 0
+            # Tokens issued before the index existed are only found by scanning. A user can
+            # have both, so scan for every user until those tokens have all expired.
+            if getattr(settings, 'TOKEN_INDEX_SCAN_FALLBACK', True) and self._has_unindexed_tokens(r):
+                for key in r.scan_iter(match="token:user:*", count=1000):
+                    _, _, user_id, jti = key.decode('utf-8').split(':', 3)
+                    if user_id in jtis_by_user:
+                        jtis_by_user[user_id].add(jti)
             
-            for key in token_keys:
-                try:
-                    # Get token metadata
-                    token_data = r.get(key)
-                    if not token_data:
+            # Get token metadata for all tokens in one round trip
+            owners = [(user_id, jti) for user_id, jtis in jtis_by_user.items() for jti in jtis]
+            entries = {}
+            counts = {user_id: 0 for user_id in user_ids}
+            if owners:
+                token_data = r.mget([f"token:jti:{jti}" for _, jti in owners])
+                for (user_id, jti), data in zip(owners, token_data):
+                    if not data:
+                        # Token already expired
+                        continue
+                    try:
+                        exp = json.loads(data).get('exp')
+                    except ValueError as e:
+                        logger.error(f"Error processing token: {str(e)}")
+                        continue
+                    if not exp:
                         continue
                     
-                    data = json.loads(token_data)
-                    jti = data.get('jti')
-                    
-                    if jti:
-                        # Calculate remaining time until token expiry
-                        exp = data.get('exp')
-                        if not exp:
-                            continue
-                        
-                        now = datetime.utcnow()
-                        expiry = datetime.fromtimestamp(exp)
-                        ttl = max(0, int((expiry - now).total_seconds()))
-                        
-                        # Add to blacklist
-                        if self._blacklist_token_jti(jti, ttl):
-                            count += 1
-                except Exception as e:
-                    logger.error(f"Error processing token: {str(e)}")
+                    ttl = self._remaining_ttl(exp)
+                    if ttl > 0:
+                        entries[jti] = ttl
+                        counts[user_id] += 1
+            
+            blacklist_cache.blacklist_many(entries)
+            
+            # Revoked tokens no longer need indexing
+            r.delete(*[f"user_tokens:{user_id}" for user_id in user_ids])
             
-            return count
+            return counts
         
         except Exception as e:
             logger.error(f"Error blacklisting user tokens: {str(e)}")
-            return 0
+            return {}
+    
+    def _has_unindexed_tokens(self, r):
+        """
+        Whether tokens created before the per-user index may still be valid.
+        
+        The first indexed token records when indexing started; tokens created before
+        that expire within the refresh token lifetime.
+        """
+        started = r.get(self.INDEX_STARTED_KEY)
+        if started is None:
+            return True
+        deadline = int(started) + int(self.refresh_token_lifetime.total_seconds())
+        return datetime.utcnow().timestamp() < deadline
+    
+    def _remaining_ttl(self, exp):
+        """
+        Seconds until a token's exp timestamp.
+        """
+        now = datetime.utcnow()
+        expiry = datetime.fromtimestamp(exp)
+        return max(0, int((expiry - now).total_seconds()))
     
     def _store_token_metadata(self, jti, user_data, expiry):
         """
@@ -276,7 +333,7 @@ class TokenManager:
             if not self.redis_url:
                 return False
             
-            r = redis.from_url(self.redis_url)
+            r = get_redis_client(self.redis_url)
             
             # Get user ID
             user_id = user_data.get('user_id') or user_data.get('id')
@@ -297,19 +354,26 @@ class TokenManager:
             ttl = max(0, int((expiry - now).total_seconds()))
             
             # Store in Redis with expiry
-            r.setex(
+            pipe = r.pipeline(transaction=False)
+            pipe.setex(
                 f"token:jti:{jti}",
                 ttl,
                 json.dumps(token_data)
             )
             
             # Store reference by user ID
-            r.setex(
+            pipe.setex(
                 f"token:user:{user_id}:{jti}",
                 ttl,
                 json.dumps(token_data)
             )
             
+            # Index the token under its user, kept until the longest-lived token expires
+            pipe.sadd(f"user_tokens:{user_id}", jti)
+            pipe.expire(f"user_tokens:{user_id}", int(self.refresh_token_lifetime.total_seconds()))
+            pipe.set(self.INDEX_STARTED_KEY, int(now.timestamp()), nx=True)
+            pipe.execute()
+            
             return True
         
         except Exception as e:
@@ -331,16 +395,8 @@ class TokenManager:
             if not self.redis_url:
                 return False
             
-            r = redis.from_url(self.redis_url)
-            
-            # Add to blacklist with the same TTL as the token
-            r.setex(
-                f"blacklist_token:{jti}",
-                ttl,
-                "1"
-            )
-            
-            return True
+            # Add to blacklist with the same TTL as the token and notify other processes
+            return blacklist_cache.blacklist(jti, ttl)
         
         except Exception as e:
             logger.error(f"Error blacklisting token JTI: {str(e)}")
@@ -360,8 +416,7 @@ class TokenManager:
             if not self.redis_url:
                 return False
             
-            r = redis.from_url(self.redis_url)
-            return r.exists(f"blacklist_token:{jti}") > 0
+            return blacklist_cache.is_blacklisted(jti)
         
         except Exception as e:
             logger.error(f"Error checking token blacklist: {str(e)}")
@@ -291,3 +291,54 @@ class AdminSessionView(APIView):
                 {'error': str(e)},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
+
+
+class AdminBulkRevokeView(APIView):
+    """
+    Admin view for revoking access of many users at once (incident response).
+    """
+    permission_classes = [IsAuthenticated, HasRole('ADMIN')]
+    
+    def post(self, request):
+        """
+        Blacklist all tokens and terminate all sessions of the given users.
+        
+        Request body:
+            user_ids: List of user IDs.
+            terminate_sessions: Whether to also terminate sessions (default: true).
+        
+        Returns:
+            Response with per-user counts of revoked tokens and terminated sessions.
+        """
+        try:
+            user_ids = request.data.get('user_ids')
+            if not user_ids or not isinstance(user_ids, list):
+                return Response(
+                    {'error': 'user_ids must be a non-empty list'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            
+            token_manager = TokenManager()
+            revoked_tokens = token_manager.blacklist_users_tokens(user_ids)
+            
+            terminated_sessions = {}
+            if request.data.get('terminate_sessions', True):
+                session_manager = SessionManager()
+                terminated_sessions = session_manager.terminate_users_sessions(user_ids)
+            
+            logger.warning(
+                f"User {request.user.id} revoked access for {len(user_ids)} users: "
+                f"{sum(revoked_tokens.values())} tokens, {sum(terminated_sessions.values())} sessions"
+            )
+            
+            return Response({
+                'revoked_tokens': revoked_tokens,
+                'terminated_sessions': terminated_sessions
+            })
+        
+        except Exception as e:
+            logger.error(f"Error revoking user access: {str(e)}")
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
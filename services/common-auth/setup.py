@@ -10,6 +10,9 @@ setup(
         "django>=3.2.0",
         "redis>=4.0.0",
     ],
+    extras_require={
+        "async": ["httpx>=0.24.0"],
+    },
     author="bisosad",
     author_email="thangdz1501@gmail.com",
     description="Common authentication library for Healthcare System",
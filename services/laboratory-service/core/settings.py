@@ -43,6 +43,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'common_auth.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -152,6 +153,9 @@ CORS_ALLOW_CREDENTIALS = True
 
 # Common Auth settings
 REDIS_URL = os.environ.get('REDIS_URL', 'redis://redis:6379/0')
+
+# Bearer token for scraping /metrics/ (common_auth.metrics); unset = other services and localhost only
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
 JWT_SECRET = os.environ.get('JWT_SECRET', SECRET_KEY)
 ACCESS_TOKEN_LIFETIME = timedelta(minutes=60)
 REFRESH_TOKEN_LIFETIME = timedelta(days=7)
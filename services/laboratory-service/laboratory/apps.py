@@ -3,4 +3,7 @@ from django.apps import AppConfig
 
 class LaboratoryConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'laboratory'
\ No newline at end of file
+    name = 'laboratory'
+
+    def ready(self):
+        import laboratory.signals
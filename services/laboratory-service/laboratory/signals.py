@@ -0,0 +1,29 @@
+"""
+Signals publishing test type price changes for billing-service's price catalog.
+"""
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from common_auth.redis_notifications import send_notification
+
+from .models import TestType
+
+
+def _publish_test_type_change(event_type, test_type):
+    data = {
+        'test_type_id': test_type.id,
+        'name': test_type.name,
+        'price': str(test_type.price) if test_type.price is not None else None,
+        'updated_at': test_type.updated_at.isoformat() if test_type.updated_at else None,
+    }
+    transaction.on_commit(lambda: send_notification('LABORATORY', event_type, data, recipients=[]))
+
+
+@receiver(post_save, sender=TestType)
+def test_type_saved(sender, instance, **kwargs):
+    _publish_test_type_change('TEST_TYPE_UPDATED', instance)
+
+
+@receiver(post_delete, sender=TestType)
+def test_type_deleted(sender, instance, **kwargs):
+    _publish_test_type_change('TEST_TYPE_DELETED', instance)
@@ -43,6 +43,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'common_auth.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -139,6 +140,9 @@ CORS_ALLOW_ALL_ORIGINS = True
 # Redis settings
 REDIS_URL = os.environ.get('REDIS_URL', 'redis://redis:6379/0')
 
+# Bearer token for scraping /metrics/ (common_auth.metrics); unset = other services and localhost only
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
 # Celery settings
 CELERY_BROKER_URL = REDIS_URL
 CELERY_RESULT_BACKEND = REDIS_URL
@@ -150,6 +154,9 @@ CELERY_TIMEZONE = TIME_ZONE
 # API Gateway URL
 API_GATEWAY_URL = os.environ.get('API_GATEWAY_URL', 'http://api-gateway:4000')
 
+# Timeout (giây) cho các lời gọi service qua API Gateway
+SERVICE_CALL_TIMEOUT = float(os.environ.get('SERVICE_CALL_TIMEOUT', '5'))
+
 # Service API Keys
 SERVICE_API_KEYS = {
     'pharmacy-service': os.environ.get('PHARMACY_SERVICE_API_KEY', 'pharmacy-service-api-key'),
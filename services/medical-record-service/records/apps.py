@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class RecordsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'records'
+
+    def ready(self):
+        # Đăng ký signals cập nhật dòng thời gian bệnh nhân
+        from . import signals  # noqa: F401
@@ -0,0 +1,16 @@
+import logging
+from django.core.management.base import BaseCommand
+from records.timeline import rebuild_timeline
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Rebuilds the materialized patient timeline from clinical records'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--patient-id', type=int, default=None, help='Only rebuild the timeline of this patient')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Number of timeline entries written per batch')
+
+    def handle(self, *args, **options):
+        total = rebuild_timeline(patient_id=options['patient_id'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {total} timeline entries"))
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-18 20:10
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('records', '0006_encounter_billing_status_encounter_invoice_id_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimelineEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('patient_id', models.IntegerField(help_text='ID của bệnh nhân trong user-service')),
+                ('entry_type', models.CharField(choices=[('ENCOUNTER', 'Encounter'), ('DIAGNOSIS', 'Diagnosis'), ('MEDICATION', 'Medication'), ('VITAL_SIGN', 'Vital Sign'), ('LAB_TEST', 'Lab Test'), ('LAB_RESULT', 'Lab Result'), ('IMMUNIZATION', 'Immunization'), ('ALLERGY', 'Allergy')], max_length=20)),
+                ('source_id', models.IntegerField(help_text='ID của bản ghi gốc')),
+                ('encounter_id', models.IntegerField(blank=True, null=True)),
+                ('occurred_at', models.DateTimeField()),
+                ('title', models.CharField(max_length=255)),
+                ('details', models.JSONField(blank=True, default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('medical_record', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to='records.medicalrecord')),
+            ],
+            options={
+                'verbose_name': 'Timeline Entry',
+                'verbose_name_plural': 'Timeline Entries',
+                'ordering': ['-occurred_at', '-id'],
+                'indexes': [models.Index(fields=['patient_id', '-occurred_at', '-id'], name='timeline_patient_time_idx')],
+                'unique_together': {('entry_type', 'source_id')},
+            },
+        ),
+    ]
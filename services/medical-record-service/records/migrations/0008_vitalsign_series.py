@@ -0,0 +1,73 @@
+# Generated by Django 4.2.7 on 2026-10-18 21:05
+
+from django.db import migrations, models
+
+
+def parse_value(vital_type, value):
+    value = (value or '').strip()
+    if vital_type == 'BLOOD_PRESSURE':
+        parts = value.split('/')
+        if len(parts) == 2:
+            try:
+                return None, float(parts[0]), float(parts[1])
+            except ValueError:
+                pass
+        return None, None, None
+    try:
+        return float(value.replace(',', '.')), None, None
+    except ValueError:
+        return None, None, None
+
+
+def backfill_series_fields(apps, schema_editor):
+    VitalSign = apps.get_model('records', 'VitalSign')
+    Encounter = apps.get_model('records', 'Encounter')
+
+    VitalSign.objects.update(patient_id=models.Subquery(
+        Encounter.objects.filter(pk=models.OuterRef('encounter_id')).values('medical_record__patient_id')[:1]
+    ))
+
+    batch = []
+    for vital_sign in VitalSign.objects.only('id', 'vital_type', 'value').iterator(chunk_size=2000):
+        vital_sign.numeric_value, vital_sign.systolic, vital_sign.diastolic = parse_value(vital_sign.vital_type, vital_sign.value)
+        batch.append(vital_sign)
+        if len(batch) >= 2000:
+            VitalSign.objects.bulk_update(batch, ['numeric_value', 'systolic', 'diastolic'])
+            batch = []
+    if batch:
+        VitalSign.objects.bulk_update(batch, ['numeric_value', 'systolic', 'diastolic'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('records', '0007_timelineentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vitalsign',
+            name='patient_id',
+            field=models.IntegerField(blank=True, help_text='ID của bệnh nhân (sao chép từ MedicalRecord để truy vấn chuỗi thời gian)', null=True),
+        ),
+        migrations.AddField(
+            model_name='vitalsign',
+            name='numeric_value',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='vitalsign',
+            name='systolic',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='vitalsign',
+            name='diastolic',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='vitalsign',
+            index=models.Index(fields=['patient_id', 'vital_type', 'recorded_at'], name='vitalsign_series_idx'),
+        ),
+        migrations.RunPython(backfill_series_fields, migrations.RunPython.noop),
+    ]
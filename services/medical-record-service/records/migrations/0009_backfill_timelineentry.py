@@ -0,0 +1,128 @@
+# Generated by Django 4.2.7 on 2026-10-18 23:20
+
+import datetime
+from django.db import migrations
+from django.utils import timezone
+
+BATCH_SIZE = 1000
+
+# Bản sao của timeline.SOURCES cho model lịch sử:
+# (model, entry_type, time_field, title, details, encounter_path, select_related)
+SOURCES = [
+    ('Encounter', 'ENCOUNTER', 'encounter_date',
+     lambda obj: f"{obj.get_encounter_type_display()} encounter",
+     lambda obj: {'doctor_id': obj.doctor_id, 'status': obj.status, 'chief_complaint': obj.chief_complaint},
+     'id', ()),
+    ('Diagnosis', 'DIAGNOSIS', 'diagnosis_date',
+     lambda obj: f"{obj.diagnosis_code} - {obj.diagnosis_description[:200]}",
+     lambda obj: {'doctor_id': obj.doctor_id, 'diagnosis_code': obj.diagnosis_code},
+     'encounter_id', ()),
+    ('Medication', 'MEDICATION', 'start_date',
+     lambda obj: f"{obj.medication_name} {obj.dosage}",
+     lambda obj: {
+         'frequency': obj.frequency,
+         'route': obj.route,
+         'end_date': obj.end_date.isoformat() if obj.end_date else None,
+         'prescribed_by': obj.prescribed_by,
+     },
+     'encounter_id', ()),
+    ('VitalSign', 'VITAL_SIGN', 'recorded_at',
+     lambda obj: f"{obj.get_vital_type_display()}: {obj.value} {obj.unit}",
+     lambda obj: {'vital_type': obj.vital_type, 'value': obj.value, 'unit': obj.unit},
+     'encounter_id', ()),
+    ('LabTest', 'LAB_TEST', 'ordered_at',
+     lambda obj: obj.test_name,
+     lambda obj: {'test_code': obj.test_code, 'status': obj.status, 'ordered_by': obj.ordered_by},
+     'encounter_id', ()),
+    ('LabResult', 'LAB_RESULT', 'performed_at',
+     lambda obj: f"{obj.lab_test.test_name}: {obj.result_value} {obj.unit or ''}".strip(),
+     lambda obj: {
+         'lab_test_id': obj.lab_test_id,
+         'result_value': obj.result_value,
+         'unit': obj.unit,
+         'reference_range': obj.reference_range,
+         'is_abnormal': obj.is_abnormal,
+     },
+     'lab_test.encounter_id', ('lab_test',)),
+    ('Immunization', 'IMMUNIZATION', 'administration_date',
+     lambda obj: obj.vaccine_name,
+     lambda obj: {'dose': obj.dose, 'administered_by': obj.administered_by},
+     'encounter_id', ()),
+    ('Allergy', 'ALLERGY', 'created_at',
+     lambda obj: obj.allergy_name,
+     lambda obj: {'allergy_type': obj.allergy_type, 'severity': obj.severity},
+     None, ()),
+]
+
+
+def as_datetime(value):
+    if isinstance(value, datetime.datetime):
+        return value
+    return timezone.make_aware(datetime.datetime.combine(value, datetime.time.min))
+
+
+def backfill_timeline(apps, schema_editor):
+    TimelineEntry = apps.get_model('records', 'TimelineEntry')
+    Encounter = apps.get_model('records', 'Encounter')
+    MedicalRecord = apps.get_model('records', 'MedicalRecord')
+
+    owners = {
+        encounter_id: (medical_record_id, patient_id)
+        for encounter_id, medical_record_id, patient_id in Encounter.objects.values_list(
+            'id', 'medical_record_id', 'medical_record__patient_id'
+        )
+    }
+    patients = dict(MedicalRecord.objects.values_list('id', 'patient_id'))
+
+    def write(batch):
+        TimelineEntry.objects.bulk_create(
+            batch,
+            update_conflicts=True,
+            unique_fields=['entry_type', 'source_id'],
+            update_fields=['patient_id', 'medical_record_id', 'encounter_id', 'occurred_at', 'title', 'details', 'updated_at'],
+        )
+
+    for model_name, entry_type, time_field, title, details, encounter_path, select_related in SOURCES:
+        model = apps.get_model('records', model_name)
+        batch = []
+        for obj in model.objects.select_related(*select_related).order_by('pk').iterator(chunk_size=BATCH_SIZE):
+            if encounter_path is None:
+                encounter_id = None
+                medical_record_id = obj.medical_record_id
+                patient_id = patients.get(medical_record_id)
+            else:
+                encounter_id = obj
+                for attr in encounter_path.split('.'):
+                    encounter_id = getattr(encounter_id, attr)
+                medical_record_id, patient_id = owners.get(encounter_id, (None, None))
+
+            occurred_at = getattr(obj, time_field)
+            if medical_record_id is None or patient_id is None or occurred_at is None:
+                continue
+
+            batch.append(TimelineEntry(
+                patient_id=patient_id,
+                medical_record_id=medical_record_id,
+                entry_type=entry_type,
+                source_id=obj.pk,
+                encounter_id=encounter_id,
+                occurred_at=as_datetime(occurred_at),
+                title=title(obj)[:255],
+                details=details(obj),
+            ))
+            if len(batch) >= BATCH_SIZE:
+                write(batch)
+                batch = []
+        if batch:
+            write(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('records', '0008_vitalsign_series'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_timeline, migrations.RunPython.noop),
+    ]
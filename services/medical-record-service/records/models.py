@@ -220,16 +220,62 @@ class VitalSign(models.Model):
     recorded_by = models.IntegerField(help_text="ID của nhân viên y tế trong user-service", null=True, blank=True)
     recorded_at = models.DateTimeField()
     notes = models.TextField(blank=True, null=True)
+    # Dữ liệu dạng số cho chuỗi thời gian (được tách từ value khi lưu)
+    patient_id = models.IntegerField(help_text="ID của bệnh nhân (sao chép từ MedicalRecord để truy vấn chuỗi thời gian)", null=True, blank=True)
+    numeric_value = models.FloatField(null=True, blank=True)
+    systolic = models.FloatField(null=True, blank=True)
+    diastolic = models.FloatField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.vital_type}: {self.value} {self.unit}"
 
+    @staticmethod
+    def parse_value(vital_type, value):
+        """
+        Tách giá trị dạng chuỗi thành số.
+
+        Returns:
+        - tuple: (numeric_value, systolic, diastolic); huyết áp "120/80" -> (None, 120.0, 80.0)
+        """
+        value = (value or '').strip()
+        if vital_type == 'BLOOD_PRESSURE':
+            parts = value.split('/')
+            if len(parts) == 2:
+                try:
+                    return None, float(parts[0]), float(parts[1])
+                except ValueError:
+                    pass
+            return None, None, None
+        try:
+            return float(value.replace(',', '.')), None, None
+        except ValueError:
+            return None, None, None
+
+    def update_series_fields(self):
+        """Cập nhật các trường số và patient_id từ value/encounter"""
+        self.numeric_value, self.systolic, self.diastolic = self.parse_value(self.vital_type, self.value)
+        # Luôn lấy lại từ encounter: bản ghi có thể đã được chuyển sang phiên khám của bệnh nhân khác
+        if self.encounter_id is not None:
+            self.patient_id = Encounter.objects.filter(pk=self.encounter_id).values_list(
+                'medical_record__patient_id', flat=True
+            ).first()
+
+    def save(self, *args, **kwargs):
+        self.update_series_fields()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = set(update_fields) | {'patient_id', 'numeric_value', 'systolic', 'diastolic'}
+        super().save(*args, **kwargs)
+
     class Meta:
         verbose_name = "Vital Sign"
         verbose_name_plural = "Vital Signs"
         ordering = ['-recorded_at']
+        indexes = [
+            models.Index(fields=['patient_id', 'vital_type', 'recorded_at'], name='vitalsign_series_idx'),
+        ]
 
 class LabTest(models.Model):
     """Xét nghiệm y tế trong phiên khám"""
@@ -280,4 +326,40 @@ class LabResult(models.Model):
     class Meta:
         verbose_name = "Lab Result"
         verbose_name_plural = "Lab Results"
-        ordering = ['-performed_at']
\ No newline at end of file
+        ordering = ['-performed_at']
+
+class TimelineEntry(models.Model):
+    """Dòng thời gian của bệnh nhân – bảng tổng hợp, được cập nhật qua signals (xem timeline.py)"""
+    ENTRY_TYPE_CHOICES = [
+        ('ENCOUNTER', 'Encounter'),
+        ('DIAGNOSIS', 'Diagnosis'),
+        ('MEDICATION', 'Medication'),
+        ('VITAL_SIGN', 'Vital Sign'),
+        ('LAB_TEST', 'Lab Test'),
+        ('LAB_RESULT', 'Lab Result'),
+        ('IMMUNIZATION', 'Immunization'),
+        ('ALLERGY', 'Allergy'),
+    ]
+
+    patient_id = models.IntegerField(help_text="ID của bệnh nhân trong user-service")
+    medical_record = models.ForeignKey(MedicalRecord, on_delete=models.CASCADE, related_name='timeline_entries')
+    entry_type = models.CharField(max_length=20, choices=ENTRY_TYPE_CHOICES)
+    source_id = models.IntegerField(help_text="ID của bản ghi gốc")
+    encounter_id = models.IntegerField(null=True, blank=True)
+    occurred_at = models.DateTimeField()
+    title = models.CharField(max_length=255)
+    details = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.entry_type} for Patient {self.patient_id} at {self.occurred_at}"
+
+    class Meta:
+        verbose_name = "Timeline Entry"
+        verbose_name_plural = "Timeline Entries"
+        ordering = ['-occurred_at', '-id']
+        unique_together = ['entry_type', 'source_id']
+        indexes = [
+            models.Index(fields=['patient_id', '-occurred_at', '-id'], name='timeline_patient_time_idx'),
+        ]
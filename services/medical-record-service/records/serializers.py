@@ -1,8 +1,10 @@
+from django.db.models import Count, IntegerField, OuterRef, Subquery, prefetch_related_objects
+from django.db.models.functions import Coalesce
 from rest_framework import serializers
 from .models import (
     MedicalRecord, Encounter, Diagnosis, Treatment, Allergy,
     Immunization, MedicalHistory, Medication,
-    VitalSign, LabTest, LabResult
+    VitalSign, LabTest, LabResult, TimelineEntry
 )
 
 
@@ -55,7 +57,21 @@ class VitalSignSerializer(serializers.ModelSerializer):
     class Meta:
         model = VitalSign
         fields = '__all__'
-        read_only_fields = ('id', 'created_at', 'updated_at')
+        read_only_fields = ('id', 'patient_id', 'numeric_value', 'systolic', 'diastolic', 'created_at', 'updated_at')
+
+
+class VitalSignReadingSerializer(serializers.Serializer):
+    """Một phép đo trong lô dấu hiệu sinh tồn gửi từ thiết bị"""
+    vital_type = serializers.ChoiceField(choices=VitalSign.VITAL_TYPE_CHOICES)
+    value = serializers.CharField(max_length=50)
+    unit = serializers.CharField(max_length=20)
+    recorded_at = serializers.DateTimeField()
+    notes = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+
+
+class VitalSignBulkSerializer(serializers.Serializer):
+    encounter = serializers.PrimaryKeyRelatedField(queryset=Encounter.objects.all())
+    readings = VitalSignReadingSerializer(many=True, allow_empty=False)
 
 
 class LabResultSerializer(serializers.ModelSerializer):
@@ -97,11 +113,30 @@ class MedicalRecordSerializer(serializers.ModelSerializer):
     allergies = AllergySerializer(many=True, read_only=True)
     medical_histories = MedicalHistorySerializer(many=True, read_only=True)
 
+    # Toàn bộ cây quan hệ được serialize, mỗi quan hệ một truy vấn
+    PREFETCH_RELATED = (
+        'encounters__diagnoses__treatments',
+        'encounters__immunizations',
+        'encounters__medications',
+        'encounters__vital_signs',
+        'encounters__lab_tests__results',
+        'allergies',
+        'medical_histories',
+    )
+
     class Meta:
         model = MedicalRecord
         fields = '__all__'
         read_only_fields = ('id', 'created_at', 'updated_at')
 
+    @classmethod
+    def prefetch_tree(cls, records):
+        """
+        Prefetch toàn bộ cây hồ sơ cho các hồ sơ đã được tải.
+        Số truy vấn cố định, không phụ thuộc vào kích thước hồ sơ.
+        """
+        prefetch_related_objects(records, *cls.PREFETCH_RELATED)
+
 
 class MedicalRecordSummarySerializer(serializers.ModelSerializer):
     diagnosis_count = serializers.SerializerMethodField()
@@ -115,17 +150,49 @@ class MedicalRecordSummarySerializer(serializers.ModelSerializer):
             'diagnosis_count', 'allergy_count', 'medication_count'
         )
 
+    @staticmethod
+    def annotate_counts(queryset):
+        """
+        Tính các số đếm bằng subquery trong cùng truy vấn danh sách hồ sơ.
+        """
+        def count_subquery(model, record_field):
+            counts = (
+                model.objects.filter(**{record_field: OuterRef('pk')})
+                .order_by()
+                .values(record_field)
+                .annotate(count=Count('pk'))
+                .values('count')
+            )
+            return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+        return queryset.annotate(
+            diagnosis_count=count_subquery(Diagnosis, 'encounter__medical_record'),
+            allergy_count=count_subquery(Allergy, 'medical_record'),
+            medication_count=count_subquery(Medication, 'encounter__medical_record'),
+        )
+
     def get_diagnosis_count(self, obj):
-        count = 0
-        for encounter in obj.encounters.all():
-            count += encounter.diagnoses.count()
-        return count
+        count = getattr(obj, 'diagnosis_count', None)
+        if count is not None:
+            return count
+        return Diagnosis.objects.filter(encounter__medical_record=obj).count()
 
     def get_allergy_count(self, obj):
+        count = getattr(obj, 'allergy_count', None)
+        if count is not None:
+            return count
         return obj.allergies.count()
 
     def get_medication_count(self, obj):
-        count = 0
-        for encounter in obj.encounters.all():
-            count += encounter.medications.count()
-        return count
+        count = getattr(obj, 'medication_count', None)
+        if count is not None:
+            return count
+        return Medication.objects.filter(encounter__medical_record=obj).count()
+
+
+class TimelineEntrySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = TimelineEntry
+        fields = ('id', 'patient_id', 'medical_record', 'entry_type', 'source_id', 'encounter_id',
+                  'occurred_at', 'title', 'details')
+        read_only_fields = fields
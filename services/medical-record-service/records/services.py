@@ -1,9 +1,29 @@
 import requests
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from django.conf import settings
 
 logger = logging.getLogger(__name__)
 
+# Thread pool dùng chung cho các lời gọi service chạy song song với truy vấn DB
+_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'SERVICE_CALL_MAX_WORKERS', 8),
+    thread_name_prefix='service-calls'
+)
+
+
+def run_in_background(func, *args, **kwargs):
+    """
+    Chạy một lời gọi service trong thread pool dùng chung.
+
+    Args:
+        func: Hàm cần gọi (ví dụ UserService.get_patient_info)
+
+    Returns:
+        Future: Kết quả của lời gọi
+    """
+    return _executor.submit(func, *args, **kwargs)
+
 class AppointmentService:
     """
     Service để giao tiếp với Appointment Service thông qua API Gateway.
@@ -135,7 +155,10 @@ class UserService:
         """
         try:
             # Sử dụng endpoint /api/users/{patient_id}/ để lấy thông tin người dùng
-            response = requests.get(f"{settings.API_GATEWAY_URL}/api/users/{patient_id}/")
+            response = requests.get(
+                f"{settings.API_GATEWAY_URL}/api/users/{patient_id}/",
+                timeout=getattr(settings, 'SERVICE_CALL_TIMEOUT', 5)
+            )
             if response.status_code == 200:
                 return response.json()
             logger.error(f"Failed to fetch patient info: {response.status_code} - {response.text}")
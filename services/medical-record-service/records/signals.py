@@ -0,0 +1,50 @@
+"""
+Signals cập nhật dòng thời gian của bệnh nhân khi bản ghi lâm sàng thay đổi.
+"""
+import logging
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from .models import Encounter, MedicalRecord
+from .timeline import SOURCES, sync_entry, delete_entry, update_patient_id as update_timeline_patient_id
+from .vitals import update_patient_id, update_record_patient_id
+
+logger = logging.getLogger(__name__)
+
+
+def update_timeline_entry(sender, instance, raw=False, **kwargs):
+    """Tạo/cập nhật TimelineEntry sau khi lưu bản ghi"""
+    if raw:
+        # Nạp fixture: chạy rebuild_patient_timeline sau đó
+        return
+    try:
+        with transaction.atomic():
+            sync_entry(instance)
+            if sender is Encounter:
+                update_patient_id(instance)
+    except Exception as e:
+        # Không làm hỏng thao tác chính; mục bị thiếu sẽ được bù bằng rebuild_patient_timeline
+        logger.error(f"Error updating timeline entry for {sender.__name__} {instance.pk}: {str(e)}")
+
+
+def remove_timeline_entry(sender, instance, **kwargs):
+    """Xóa TimelineEntry khi bản ghi bị xóa"""
+    delete_entry(instance)
+
+
+def update_record_patient(sender, instance, created=False, raw=False, **kwargs):
+    """Đồng bộ patient_id của dòng thời gian và dấu hiệu sinh tồn khi hồ sơ đổi bệnh nhân"""
+    if raw or created:
+        return
+    try:
+        with transaction.atomic():
+            update_timeline_patient_id(instance)
+            update_record_patient_id(instance)
+    except Exception as e:
+        logger.error(f"Error updating patient_id for medical record {instance.pk}: {str(e)}")
+
+
+post_save.connect(update_record_patient, sender=MedicalRecord, dispatch_uid='timeline_save_MedicalRecord')
+
+for model in SOURCES:
+    post_save.connect(update_timeline_entry, sender=model, dispatch_uid=f'timeline_save_{model.__name__}')
+    post_delete.connect(remove_timeline_entry, sender=model, dispatch_uid=f'timeline_delete_{model.__name__}')
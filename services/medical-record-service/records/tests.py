@@ -0,0 +1,25 @@
+from django.test import TestCase
+from django.utils import timezone
+from .models import Encounter, MedicalRecord, TimelineEntry, VitalSign
+
+
+class VitalSignPatientTests(TestCase):
+    """patient_id của VitalSign luôn theo hồ sơ của phiên khám"""
+
+    def setUp(self):
+        self.encounter_a = Encounter.objects.create(medical_record=MedicalRecord.objects.create(patient_id=3))
+        self.encounter_b = Encounter.objects.create(medical_record=MedicalRecord.objects.create(patient_id=2))
+
+    def test_moving_vital_to_another_patient_updates_patient_id(self):
+        vital = VitalSign.objects.create(
+            encounter=self.encounter_a, vital_type='HEART_RATE', value='72', unit='bpm', recorded_at=timezone.now()
+        )
+        self.assertEqual(vital.patient_id, 3)
+
+        vital.encounter = self.encounter_b
+        vital.save()
+
+        vital.refresh_from_db()
+        self.assertEqual(vital.patient_id, 2)
+        entry = TimelineEntry.objects.get(entry_type='VITAL_SIGN', source_id=vital.pk)
+        self.assertEqual(entry.patient_id, 2)
@@ -0,0 +1,300 @@
+"""
+Dòng thời gian của bệnh nhân (TimelineEntry).
+
+Mỗi bản ghi lâm sàng (Encounter, Diagnosis, Medication, VitalSign, LabTest, LabResult,
+Immunization, Allergy) có một TimelineEntry tương ứng, được cập nhật từng bản ghi qua
+signals (xem signals.py). Endpoint timeline chỉ cần quét index (patient_id, occurred_at)
+thay vì join tám bảng về MedicalRecord.
+"""
+import datetime
+import logging
+from typing import Callable, NamedTuple, Optional
+from django.utils import timezone
+from .models import (
+    MedicalRecord, Encounter, Diagnosis, Allergy, Immunization,
+    Medication, VitalSign, LabTest, LabResult, TimelineEntry
+)
+
+logger = logging.getLogger(__name__)
+
+
+class TimelineSource(NamedTuple):
+    """
+    Cách chuyển một model lâm sàng thành TimelineEntry.
+
+    encounter_path: đường dẫn tới encounter_id trên instance (None nếu gắn trực tiếp với MedicalRecord).
+    patient_lookup: lookup ORM tới patient_id (lọc khi rebuild cho một bệnh nhân).
+    select_related: quan hệ cần nạp khi rebuild hàng loạt.
+    """
+    entry_type: str
+    time_field: str
+    title: Callable
+    details: Callable
+    encounter_path: Optional[str] = 'encounter_id'
+    patient_lookup: str = 'encounter__medical_record__patient_id'
+    select_related: tuple = ()
+
+
+SOURCES = {
+    Encounter: TimelineSource(
+        entry_type='ENCOUNTER',
+        time_field='encounter_date',
+        title=lambda obj: f"{obj.get_encounter_type_display()} encounter",
+        details=lambda obj: {
+            'doctor_id': obj.doctor_id,
+            'status': obj.status,
+            'chief_complaint': obj.chief_complaint,
+        },
+        encounter_path='id',
+        patient_lookup='medical_record__patient_id',
+    ),
+    Diagnosis: TimelineSource(
+        entry_type='DIAGNOSIS',
+        time_field='diagnosis_date',
+        title=lambda obj: f"{obj.diagnosis_code} - {obj.diagnosis_description[:200]}",
+        details=lambda obj: {
+            'doctor_id': obj.doctor_id,
+            'diagnosis_code': obj.diagnosis_code,
+        },
+    ),
+    Medication: TimelineSource(
+        entry_type='MEDICATION',
+        time_field='start_date',
+        title=lambda obj: f"{obj.medication_name} {obj.dosage}",
+        details=lambda obj: {
+            'frequency': obj.frequency,
+            'route': obj.route,
+            'end_date': obj.end_date.isoformat() if obj.end_date else None,
+            'prescribed_by': obj.prescribed_by,
+        },
+    ),
+    VitalSign: TimelineSource(
+        entry_type='VITAL_SIGN',
+        time_field='recorded_at',
+        title=lambda obj: f"{obj.get_vital_type_display()}: {obj.value} {obj.unit}",
+        details=lambda obj: {
+            'vital_type': obj.vital_type,
+            'value': obj.value,
+            'unit': obj.unit,
+        },
+    ),
+    LabTest: TimelineSource(
+        entry_type='LAB_TEST',
+        time_field='ordered_at',
+        title=lambda obj: obj.test_name,
+        details=lambda obj: {
+            'test_code': obj.test_code,
+            'status': obj.status,
+            'ordered_by': obj.ordered_by,
+        },
+    ),
+    LabResult: TimelineSource(
+        entry_type='LAB_RESULT',
+        time_field='performed_at',
+        title=lambda obj: f"{obj.lab_test.test_name}: {obj.result_value} {obj.unit or ''}".strip(),
+        details=lambda obj: {
+            'lab_test_id': obj.lab_test_id,
+            'result_value': obj.result_value,
+            'unit': obj.unit,
+            'reference_range': obj.reference_range,
+            'is_abnormal': obj.is_abnormal,
+        },
+        encounter_path='lab_test.encounter_id',
+        patient_lookup='lab_test__encounter__medical_record__patient_id',
+        select_related=('lab_test',),
+    ),
+    Immunization: TimelineSource(
+        entry_type='IMMUNIZATION',
+        time_field='administration_date',
+        title=lambda obj: obj.vaccine_name,
+        details=lambda obj: {
+            'dose': obj.dose,
+            'administered_by': obj.administered_by,
+        },
+    ),
+    Allergy: TimelineSource(
+        entry_type='ALLERGY',
+        time_field='created_at',
+        title=lambda obj: obj.allergy_name,
+        details=lambda obj: {
+            'allergy_type': obj.allergy_type,
+            'severity': obj.severity,
+        },
+        encounter_path=None,
+        patient_lookup='medical_record__patient_id',
+    ),
+}
+
+ENTRY_FIELDS = ['patient_id', 'medical_record_id', 'encounter_id', 'occurred_at', 'title', 'details']
+
+
+def _as_datetime(value):
+    """Chuyển DateField thành datetime (00:00, múi giờ hiện tại) để sắp xếp chung với DateTimeField"""
+    if isinstance(value, datetime.datetime):
+        return value
+    return timezone.make_aware(datetime.datetime.combine(value, datetime.time.min))
+
+
+def _get_encounter_id(source, instance):
+    value = instance
+    for attr in source.encounter_path.split('.'):
+        value = getattr(value, attr)
+    return value
+
+
+def _resolve_owner(source, instance, owners=None):
+    """
+    Lấy (medical_record_id, patient_id, encounter_id) của một bản ghi.
+
+    Parameters:
+    - owners: dict {encounter_id: (medical_record_id, patient_id)} đã nạp sẵn (dùng khi rebuild)
+    """
+    if source.encounter_path is None:
+        medical_record_id = instance.medical_record_id
+        patient_id = MedicalRecord.objects.filter(pk=medical_record_id).values_list('patient_id', flat=True).first()
+        return medical_record_id, patient_id, None
+
+    encounter_id = _get_encounter_id(source, instance)
+    if owners is not None and encounter_id in owners:
+        return owners[encounter_id] + (encounter_id,)
+
+    owner = Encounter.objects.filter(pk=encounter_id).values_list(
+        'medical_record_id', 'medical_record__patient_id'
+    ).first()
+    if owner is None:
+        return None, None, encounter_id
+    return owner + (encounter_id,)
+
+
+def build_entry(instance, owners=None):
+    """
+    Tạo TimelineEntry (chưa lưu) cho một bản ghi lâm sàng.
+
+    Returns:
+    - TimelineEntry hoặc None nếu model không thuộc timeline
+    """
+    source = SOURCES.get(type(instance))
+    if source is None:
+        return None
+
+    medical_record_id, patient_id, encounter_id = _resolve_owner(source, instance, owners)
+    if medical_record_id is None or patient_id is None:
+        return None
+
+    return TimelineEntry(
+        patient_id=patient_id,
+        medical_record_id=medical_record_id,
+        entry_type=source.entry_type,
+        source_id=instance.pk,
+        encounter_id=encounter_id,
+        occurred_at=_as_datetime(getattr(instance, source.time_field)),
+        title=source.title(instance)[:255],
+        details=source.details(instance),
+    )
+
+
+def sync_entry(instance):
+    """Tạo hoặc cập nhật TimelineEntry của một bản ghi"""
+    entry = build_entry(instance)
+    if entry is None:
+        return None
+
+    entry, _ = TimelineEntry.objects.update_or_create(
+        entry_type=entry.entry_type,
+        source_id=entry.source_id,
+        defaults={field: getattr(entry, field) for field in ENTRY_FIELDS}
+    )
+
+    if isinstance(instance, Encounter):
+        # Phiên khám chuyển sang hồ sơ khác: cập nhật các mục con của phiên khám
+        TimelineEntry.objects.filter(encounter_id=instance.pk).exclude(
+            medical_record_id=entry.medical_record_id
+        ).update(medical_record_id=entry.medical_record_id, patient_id=entry.patient_id)
+    return entry
+
+
+def sync_entries(instances, owners=None):
+    """
+    Tạo hoặc cập nhật TimelineEntry cho nhiều bản ghi (dùng sau bulk_create, vốn không gửi signals).
+
+    Returns:
+    - int: số TimelineEntry đã ghi
+    """
+    entries = [entry for entry in (build_entry(instance, owners) for instance in instances) if entry is not None]
+    if not entries:
+        return 0
+    return _write_batch(entries)
+
+
+def delete_entry(instance):
+    """Xóa TimelineEntry của một bản ghi"""
+    source = SOURCES.get(type(instance))
+    if source is None:
+        return
+    TimelineEntry.objects.filter(entry_type=source.entry_type, source_id=instance.pk).delete()
+
+
+def update_patient_id(medical_record):
+    """Cập nhật patient_id của các TimelineEntry khi hồ sơ đổi bệnh nhân"""
+    TimelineEntry.objects.filter(medical_record_id=medical_record.pk).exclude(
+        patient_id=medical_record.patient_id
+    ).update(patient_id=medical_record.patient_id)
+
+
+def rebuild_timeline(patient_id=None, batch_size=1000):
+    """
+    Tạo lại toàn bộ TimelineEntry (dùng để backfill dữ liệu cũ).
+
+    Parameters:
+    - patient_id: chỉ rebuild cho một bệnh nhân (None = tất cả)
+    - batch_size: số bản ghi mỗi lần ghi
+
+    Returns:
+    - int: số TimelineEntry đã ghi
+    """
+    encounters = Encounter.objects.all()
+    if patient_id is not None:
+        encounters = encounters.filter(medical_record__patient_id=patient_id)
+    owners = {
+        encounter_id: (medical_record_id, owner_patient_id)
+        for encounter_id, medical_record_id, owner_patient_id in encounters.values_list(
+            'id', 'medical_record_id', 'medical_record__patient_id'
+        )
+    }
+
+    started_at = timezone.now()
+    total = 0
+    for model, source in SOURCES.items():
+        queryset = model.objects.select_related(*source.select_related).order_by('pk')
+        if patient_id is not None:
+            queryset = queryset.filter(**{source.patient_lookup: patient_id})
+
+        batch = []
+        for instance in queryset.iterator(chunk_size=batch_size):
+            entry = build_entry(instance, owners)
+            if entry is not None:
+                batch.append(entry)
+            if len(batch) >= batch_size:
+                total += _write_batch(batch)
+                batch = []
+        if batch:
+            total += _write_batch(batch)
+
+    # Các mục không được ghi lại trong lần rebuild này không còn bản ghi gốc
+    stale = TimelineEntry.objects.filter(updated_at__lt=started_at)
+    if patient_id is not None:
+        stale = stale.filter(patient_id=patient_id)
+    stale.delete()
+
+    logger.info(f"Rebuilt {total} timeline entries" + (f" for patient {patient_id}" if patient_id is not None else ""))
+    return total
+
+
+def _write_batch(entries):
+    TimelineEntry.objects.bulk_create(
+        entries,
+        update_conflicts=True,
+        unique_fields=['entry_type', 'source_id'],
+        update_fields=ENTRY_FIELDS + ['updated_at'],
+    )
+    return len(entries)
@@ -10,8 +10,10 @@ from .views import (
     MedicalHistoryListCreateAPIView, MedicalHistoryDetailAPIView,
     MedicationListCreateAPIView, MedicationDetailAPIView,
     VitalSignListCreateAPIView, VitalSignDetailAPIView,
+    VitalSignBulkCreateAPIView, VitalSignSeriesAPIView,
     LabTestListCreateAPIView, LabTestDetailAPIView,
     LabResultListCreateAPIView, LabResultDetailAPIView,
+    PatientTimelineAPIView,
     create_encounter_from_appointment, update_encounter_status
 )
 
@@ -53,6 +55,7 @@ urlpatterns = [
     # Vital Sign endpoints
     path('vital-signs/', VitalSignListCreateAPIView.as_view(), name='vital-sign-list'),
     path('vital-signs/<int:pk>/', VitalSignDetailAPIView.as_view(), name='vital-sign-detail'),
+    path('vital-signs/bulk/', VitalSignBulkCreateAPIView.as_view(), name='vital-sign-bulk-create'),
 
     # Lab Test endpoints
     path('lab-tests/', LabTestListCreateAPIView.as_view(), name='lab-test-list'),
@@ -61,6 +64,10 @@ urlpatterns = [
     # Lab Result endpoints
     path('lab-results/', LabResultListCreateAPIView.as_view(), name='lab-result-list'),
     path('lab-results/<int:pk>/', LabResultDetailAPIView.as_view(), name='lab-result-detail'),
+
+    # Patient timeline endpoint
+    path('patients/<int:patient_id>/timeline/', PatientTimelineAPIView.as_view(), name='patient-timeline'),
+    path('patients/<int:patient_id>/vital-signs/series/', VitalSignSeriesAPIView.as_view(), name='vital-sign-series'),
 ]
 
 # Register health check endpoint
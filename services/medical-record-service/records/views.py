@@ -1,13 +1,17 @@
 from rest_framework import status, viewsets
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import PageNumberPagination, CursorPagination
 from rest_framework.decorators import api_view, permission_classes, authentication_classes, action
 from rest_framework.exceptions import ValidationError
+from django.conf import settings
 from django.db.models import Q
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 import logging
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from datetime import timedelta
 
 from .models import (
     MedicalRecord, Encounter, Diagnosis, Treatment, Allergy,
@@ -91,14 +95,14 @@ def update_encounter_status(request, encounter_id):
 from .models import (
     MedicalRecord, Encounter, Diagnosis, Treatment, Allergy,
     Immunization, MedicalHistory, Medication,
-    VitalSign, LabTest, LabResult
+    VitalSign, LabTest, LabResult, TimelineEntry
 )
 from .serializers import (
     MedicalRecordSerializer, MedicalRecordSummarySerializer,
     DiagnosisSerializer, TreatmentSerializer, AllergySerializer,
     ImmunizationSerializer, MedicalHistorySerializer, MedicationSerializer,
     VitalSignSerializer, LabTestSerializer, LabResultSerializer,
-    EncounterSerializer
+    EncounterSerializer, TimelineEntrySerializer, VitalSignBulkSerializer
 )
 from .permissions import (
     CanViewMedicalRecords, CanCreateMedicalRecord, CanUpdateMedicalRecord,
@@ -106,13 +110,21 @@ from .permissions import (
     IsPatient, IsLabTechnician, IsPharmacist, IsServiceRequest
 )
 from .authentication import CustomJWTAuthentication
-from .services import UserService, AppointmentService, BillingService
+from .services import UserService, AppointmentService, BillingService, run_in_background
+from .vitals import aggregate_vital_series, bulk_ingest_vital_signs, BULK_INGEST_MAX_READINGS
 
 class StandardResultsSetPagination(PageNumberPagination):
     page_size = 10
     page_size_query_param = 'page_size'
     max_page_size = 100
 
+class TimelineCursorPagination(CursorPagination):
+    # Khớp index (patient_id, -occurred_at, -id) của TimelineEntry
+    ordering = ('-occurred_at', '-id')
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
 @api_view(['POST'])
 @authentication_classes([CustomJWTAuthentication])
 @permission_classes([IsDoctor])
@@ -221,15 +233,27 @@ class MedicalRecordViewSet(viewsets.ModelViewSet):
         if ordering:
             queryset = queryset.order_by(ordering)
 
+        if self.action in ('list', 'summary'):
+            queryset = MedicalRecordSummarySerializer.annotate_counts(queryset)
+
         return queryset
 
     def retrieve(self, request, *args, **kwargs):
         instance = self.get_object()
+
+        # Lấy thông tin bệnh nhân song song với việc tải cây hồ sơ
+        patient_future = run_in_background(UserService.get_patient_info, instance.patient_id)
+        MedicalRecordSerializer.prefetch_tree([instance])
+
         serializer = self.get_serializer(instance)
         data = serializer.data
 
-        # Lấy thông tin bệnh nhân
-        patient_info = UserService.get_patient_info(instance.patient_id)
+        try:
+            patient_info = patient_future.result(timeout=getattr(settings, 'SERVICE_CALL_TIMEOUT', 5))
+        except FutureTimeoutError:
+            # User service chậm: trả hồ sơ không kèm thông tin bệnh nhân thay vì giữ request
+            logger.warning(f"Timed out fetching patient info for patient {instance.patient_id}")
+            patient_info = None
         if patient_info:
             data['patient'] = {
                 'id': patient_info.get('id'),
@@ -279,7 +303,9 @@ class MedicalRecordViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_403_FORBIDDEN
             )
 
-        queryset = MedicalRecord.objects.filter(patient_id=patient_id)
+        queryset = MedicalRecordSummarySerializer.annotate_counts(
+            MedicalRecord.objects.filter(patient_id=patient_id)
+        )
 
         # Phân trang
         page = self.paginate_queryset(queryset)
@@ -1213,6 +1239,100 @@ class VitalSignListCreateAPIView(APIView):
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+class VitalSignBulkCreateAPIView(APIView):
+    """
+    API endpoint để ghi nhận một lô dấu hiệu sinh tồn (ví dụ từ thiết bị theo dõi).
+
+    Body: {"encounter": <id>, "readings": [{"vital_type", "value", "unit", "recorded_at", "notes"}, ...]}
+    """
+    permission_classes = [IsServiceRequest | CanViewMedicalRecords]
+    authentication_classes = [CustomJWTAuthentication]
+
+    def post(self, request):
+        user_role = request.auth.get('role', None) if request.auth else None
+        is_service_request = getattr(request, 'is_service_request', False)
+
+        if not is_service_request and user_role not in ['DOCTOR', 'NURSE', 'ADMIN']:
+            return Response({"detail": "You do not have permission to create vital signs."}, status=status.HTTP_403_FORBIDDEN)
+
+        readings = request.data.get('readings')
+        if isinstance(readings, list) and len(readings) > BULK_INGEST_MAX_READINGS:
+            return Response(
+                {"detail": f"A batch may contain at most {BULK_INGEST_MAX_READINGS} readings."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        serializer = VitalSignBulkSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        recorded_by = None if is_service_request else request.user.id
+        vital_signs = bulk_ingest_vital_signs(
+            serializer.validated_data['encounter'],
+            serializer.validated_data['readings'],
+            recorded_by=recorded_by
+        )
+        return Response({
+            "created": len(vital_signs),
+            "ids": [vital_sign.id for vital_sign in vital_signs]
+        }, status=status.HTTP_201_CREATED)
+
+class VitalSignSeriesAPIView(APIView):
+    """
+    API endpoint để lấy chuỗi thời gian dấu hiệu sinh tồn của bệnh nhân, gom nhóm theo bucket.
+
+    Query params:
+    - start, end: khoảng thời gian (ISO 8601, mặc định 24 giờ gần nhất)
+    - types: lọc theo loại dấu hiệu, phân tách bằng dấu phẩy (ví dụ: HEART_RATE,BLOOD_PRESSURE)
+    - bucket: độ rộng bucket (giây); được nới rộng nếu vượt quá số bucket tối đa
+    """
+    permission_classes = [IsServiceRequest | CanViewMedicalRecords]
+    authentication_classes = [CustomJWTAuthentication]
+
+    def get(self, request, patient_id):
+        user_role = request.auth.get('role', None) if request.auth else None
+        user_id = request.user.id
+
+        if user_role == 'PATIENT' and int(user_id) != patient_id:
+            return Response({"detail": "You do not have permission to view these vital signs."}, status=status.HTTP_403_FORBIDDEN)
+
+        end = self._parse_datetime_param(request, 'end') or timezone.now()
+        start = self._parse_datetime_param(request, 'start') or end - timedelta(days=1)
+        if start >= end:
+            raise ValidationError({"start": "start must be before end."})
+
+        vital_types = None
+        types = request.query_params.get('types')
+        if types:
+            vital_types = [vital_type.strip().upper() for vital_type in types.split(',') if vital_type.strip()]
+            valid_types = {choice for choice, _ in VitalSign.VITAL_TYPE_CHOICES}
+            invalid = [vital_type for vital_type in vital_types if vital_type not in valid_types]
+            if invalid:
+                raise ValidationError({"types": f"Invalid vital types: {', '.join(invalid)}"})
+
+        bucket_seconds = request.query_params.get('bucket')
+        if bucket_seconds is not None:
+            try:
+                bucket_seconds = int(bucket_seconds)
+            except ValueError:
+                raise ValidationError({"bucket": "bucket must be an integer number of seconds."})
+
+        result = aggregate_vital_series(patient_id, start, end, vital_types=vital_types, bucket_seconds=bucket_seconds)
+        result.update({'patient_id': patient_id, 'start': start, 'end': end})
+        return Response(result)
+
+    @staticmethod
+    def _parse_datetime_param(request, param):
+        value = request.query_params.get(param)
+        if not value:
+            return None
+        parsed = parse_datetime(value)
+        if parsed is None:
+            raise ValidationError({param: "Invalid datetime format. Use ISO 8601."})
+        if timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed)
+        return parsed
+
 class VitalSignDetailAPIView(APIView):
     """
     API endpoint để xem, cập nhật và xóa dấu hiệu sinh tồn.
@@ -1715,4 +1835,49 @@ class EncounterDetailAPIView(APIView):
         if encounter is None:
             return Response({"detail": "Encounter not found."}, status=status.HTTP_404_NOT_FOUND)
         encounter.delete()
-        return Response(status=status.HTTP_204_NO_CONTENT)
\ No newline at end of file
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+class PatientTimelineAPIView(APIView):
+    """
+    API endpoint để lấy dòng thời gian của bệnh nhân (phân trang theo cursor).
+
+    Query params:
+    - types: lọc theo loại mục, phân tách bằng dấu phẩy (ví dụ: DIAGNOSIS,LAB_RESULT)
+    - since / until: khoảng thời gian (ISO 8601)
+    """
+    permission_classes = [CanViewMedicalRecords]
+    authentication_classes = [CustomJWTAuthentication]
+    pagination_class = TimelineCursorPagination
+
+    def get(self, request, patient_id):
+        user_role = request.auth.get('role', None) if request.auth else None
+        user_id = request.user.id
+
+        if user_role == 'PATIENT' and int(user_id) != patient_id:
+            return Response({"detail": "You do not have permission to view this timeline."}, status=status.HTTP_403_FORBIDDEN)
+
+        queryset = TimelineEntry.objects.filter(patient_id=patient_id)
+
+        types = request.query_params.get('types')
+        if types:
+            entry_types = [entry_type.strip().upper() for entry_type in types.split(',') if entry_type.strip()]
+            valid_types = {choice for choice, _ in TimelineEntry.ENTRY_TYPE_CHOICES}
+            invalid = [entry_type for entry_type in entry_types if entry_type not in valid_types]
+            if invalid:
+                raise ValidationError({"types": f"Invalid entry types: {', '.join(invalid)}"})
+            queryset = queryset.filter(entry_type__in=entry_types)
+
+        for param, lookup in (('since', 'occurred_at__gte'), ('until', 'occurred_at__lt')):
+            value = request.query_params.get(param)
+            if value:
+                parsed = parse_datetime(value)
+                if parsed is None:
+                    raise ValidationError({param: "Invalid datetime format. Use ISO 8601."})
+                if timezone.is_naive(parsed):
+                    parsed = timezone.make_aware(parsed)
+                queryset = queryset.filter(**{lookup: parsed})
+
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        serializer = TimelineEntrySerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
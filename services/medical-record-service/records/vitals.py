@@ -0,0 +1,152 @@
+"""
+Chuỗi thời gian dấu hiệu sinh tồn.
+
+VitalSign lưu thêm patient_id và các giá trị dạng số (numeric_value, systolic, diastolic)
+với index (patient_id, vital_type, recorded_at). Việc gom nhóm theo khoảng thời gian
+(min/max/avg) được thực hiện hoàn toàn trong PostgreSQL bằng một câu GROUP BY, nên số
+điểm trả về chỉ phụ thuộc vào số bucket chứ không phụ thuộc số bản ghi.
+"""
+import datetime
+import logging
+import math
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Avg, Count, FloatField, Max, Min
+from django.db.models.functions import Extract, Floor
+from .models import Encounter, VitalSign
+from .timeline import sync_entries
+
+logger = logging.getLogger(__name__)
+
+MIN_BUCKET_SECONDS = 60
+MAX_BUCKETS = getattr(settings, 'VITAL_SIGN_MAX_BUCKETS', 1000)
+BULK_INGEST_MAX_READINGS = getattr(settings, 'VITAL_SIGN_BULK_MAX_READINGS', 5000)
+BULK_INGEST_BATCH_SIZE = 1000
+
+SERIES_FIELDS = ('numeric_value', 'systolic', 'diastolic')
+
+
+def choose_bucket_seconds(start, end, bucket_seconds=None):
+    """
+    Xác định độ rộng bucket.
+
+    Parameters:
+    - start, end: khoảng thời gian truy vấn
+    - bucket_seconds: độ rộng yêu cầu (None = tự chọn để không vượt quá MAX_BUCKETS)
+
+    Returns:
+    - int: độ rộng bucket (giây)
+    """
+    span = max((end - start).total_seconds(), 1)
+    minimum = max(MIN_BUCKET_SECONDS, math.ceil(span / MAX_BUCKETS))
+    if bucket_seconds is None:
+        return minimum
+    return max(int(bucket_seconds), minimum)
+
+
+def aggregate_vital_series(patient_id, start, end, vital_types=None, bucket_seconds=None):
+    """
+    Gom nhóm dấu hiệu sinh tồn của bệnh nhân theo bucket thời gian.
+
+    Parameters:
+    - patient_id: ID bệnh nhân
+    - start, end: khoảng thời gian [start, end)
+    - vital_types: danh sách loại dấu hiệu (None = tất cả)
+    - bucket_seconds: độ rộng bucket (None = tự chọn)
+
+    Returns:
+    - dict: {'bucket_seconds': int, 'series': {vital_type: [bucket, ...]}}
+    """
+    bucket_seconds = choose_bucket_seconds(start, end, bucket_seconds)
+
+    queryset = VitalSign.objects.filter(
+        patient_id=patient_id,
+        recorded_at__gte=start,
+        recorded_at__lt=end
+    )
+    if vital_types:
+        queryset = queryset.filter(vital_type__in=vital_types)
+
+    aggregates = {'count': Count('id')}
+    for field in SERIES_FIELDS:
+        aggregates[f'{field}_min'] = Min(field)
+        aggregates[f'{field}_max'] = Max(field)
+        aggregates[f'{field}_avg'] = Avg(field)
+
+    rows = queryset.annotate(
+        bucket=Floor(Extract('recorded_at', 'epoch', tzinfo=datetime.timezone.utc) / bucket_seconds, output_field=FloatField())
+    ).order_by().values('vital_type', 'bucket').annotate(**aggregates).order_by('vital_type', 'bucket')
+
+    series = {}
+    for row in rows:
+        bucket_start = datetime.datetime.fromtimestamp(int(row['bucket']) * bucket_seconds, tz=datetime.timezone.utc)
+        point = {'start': bucket_start, 'count': row['count']}
+        for field in SERIES_FIELDS:
+            if row[f'{field}_avg'] is not None:
+                point[field] = {
+                    'min': row[f'{field}_min'],
+                    'max': row[f'{field}_max'],
+                    'avg': row[f'{field}_avg'],
+                }
+        series.setdefault(row['vital_type'], []).append(point)
+
+    return {'bucket_seconds': bucket_seconds, 'series': series}
+
+
+def bulk_ingest_vital_signs(encounter, readings, recorded_by=None):
+    """
+    Lưu một lô dấu hiệu sinh tồn (ví dụ từ thiết bị theo dõi) bằng bulk_create.
+
+    bulk_create không gọi save() và signals, nên các trường chuỗi thời gian và
+    TimelineEntry được tạo trực tiếp ở đây.
+
+    Parameters:
+    - encounter: Encounter chứa các dấu hiệu sinh tồn
+    - readings: danh sách dict đã được validate (vital_type, value, unit, recorded_at, notes)
+    - recorded_by: ID nhân viên/thiết bị ghi nhận
+
+    Returns:
+    - list: các VitalSign đã tạo
+    """
+    patient_id = Encounter.objects.filter(pk=encounter.pk).values_list(
+        'medical_record__patient_id', flat=True
+    ).first()
+
+    vital_signs = []
+    for reading in readings:
+        vital_sign = VitalSign(
+            encounter=encounter,
+            patient_id=patient_id,
+            vital_type=reading['vital_type'],
+            value=reading['value'],
+            unit=reading['unit'],
+            recorded_at=reading['recorded_at'],
+            notes=reading.get('notes'),
+            recorded_by=recorded_by
+        )
+        vital_sign.numeric_value, vital_sign.systolic, vital_sign.diastolic = VitalSign.parse_value(
+            vital_sign.vital_type, vital_sign.value
+        )
+        vital_signs.append(vital_sign)
+
+    with transaction.atomic():
+        VitalSign.objects.bulk_create(vital_signs, batch_size=BULK_INGEST_BATCH_SIZE)
+        sync_entries(vital_signs, owners={encounter.pk: (encounter.medical_record_id, patient_id)})
+
+    logger.info(f"Ingested {len(vital_signs)} vital signs for encounter {encounter.pk}")
+    return vital_signs
+
+
+def update_patient_id(encounter):
+    """Cập nhật patient_id của dấu hiệu sinh tồn khi phiên khám đổi hồ sơ"""
+    patient_id = Encounter.objects.filter(pk=encounter.pk).values_list(
+        'medical_record__patient_id', flat=True
+    ).first()
+    VitalSign.objects.filter(encounter_id=encounter.pk).exclude(patient_id=patient_id).update(patient_id=patient_id)
+
+
+def update_record_patient_id(medical_record):
+    """Cập nhật patient_id của dấu hiệu sinh tồn khi hồ sơ đổi bệnh nhân"""
+    VitalSign.objects.filter(encounter__medical_record_id=medical_record.pk).exclude(
+        patient_id=medical_record.patient_id
+    ).update(patient_id=medical_record.patient_id)
@@ -44,6 +44,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'common_auth.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -192,8 +193,25 @@ BILLING_SERVICE_URL = os.environ.get('BILLING_SERVICE_URL', 'http://billing-serv
 PHARMACY_SERVICE_URL = os.environ.get('PHARMACY_SERVICE_URL', 'http://pharmacy-service:8004')
 LABORATORY_SERVICE_URL = os.environ.get('LABORATORY_SERVICE_URL', 'http://laboratory-service:8005')
 
+# Service API Key (service-to-service requests)
+SERVICE_API_KEY = os.environ.get('NOTIFICATION_SERVICE_API_KEY', 'notification-service-api-key')
+SERVICE_NAME = 'notification-service'
+
 # Common Auth settings
 REDIS_URL = os.environ.get('REDIS_URL', 'redis://redis:6379/0')
+
+# Bearer token for scraping /metrics/ (common_auth.metrics); unset = other services and localhost only
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+# User contact info cache (seconds)
+USER_INFO_CACHE_TTL = int(os.environ.get('USER_INFO_CACHE_TTL', 3600))
+USER_INFO_LOCAL_CACHE_TTL = int(os.environ.get('USER_INFO_LOCAL_CACHE_TTL', 60))
+USER_INFO_LOCAL_CACHE_SIZE = int(os.environ.get('USER_INFO_LOCAL_CACHE_SIZE', 10000))
+
+# Compiled notification template cache
+NOTIFICATION_TEMPLATE_CACHE_SIZE = int(os.environ.get('NOTIFICATION_TEMPLATE_CACHE_SIZE', 256))
+NOTIFICATION_TEMPLATE_CACHE_TTL = int(os.environ.get('NOTIFICATION_TEMPLATE_CACHE_TTL', 3600))
+
 # Đặt JWT_SECRET cố định để đảm bảo nhất quán với các service khác
 JWT_SECRET = 'healthcare_jwt_secret_key_2025'
 ACCESS_TOKEN_LIFETIME = timedelta(minutes=60)
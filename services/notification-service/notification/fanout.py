@@ -0,0 +1,154 @@
+"""
+Declarative notification fan-out for events from other services.
+
+Each event type maps to an EventSpec: a list of NotificationRules (recipient x channel)
+rendered against the event. All notifications for one event are persisted with a single
+bulk_create per model, and delivery is enqueued as one Celery task once the transaction
+has committed.
+"""
+import logging
+from typing import Any, Callable, NamedTuple, Optional, Sequence, Union
+from django.db import transaction
+from .models import Notification, InAppNotification
+from .tasks import send_notification_batch
+from .utils import send_realtime_notification
+
+logger = logging.getLogger(__name__)
+
+DELIVERY_CHANNELS = (Notification.Channel.EMAIL, Notification.Channel.SMS)
+
+
+class NotificationRule(NamedTuple):
+    """
+    One notification produced for an event.
+
+    recipient: name of the event attribute holding the recipient ID, or a fixed group ID (e.g. 0 for admins).
+    subject/content: a string or a callable taking the event.
+    when: optional predicate on the event; the rule is skipped when it returns a falsy value.
+    in_app: also create an InAppNotification mirroring this notification.
+    realtime: push the InAppNotification over WebSocket after commit.
+    """
+    recipient_type: str
+    channel: str
+    subject: Union[str, Callable[[Any], str]]
+    content: Union[str, Callable[[Any], str]]
+    recipient: Union[str, int] = 'patient_id'
+    when: Optional[Callable[[Any], Any]] = None
+    in_app: bool = False
+    realtime: bool = False
+    is_urgent: bool = False
+
+
+class EventSpec(NamedTuple):
+    """Notifications to produce for one event type."""
+    message: str
+    reference: tuple  # (event attribute holding the reference ID, reference type)
+    rules: Sequence[NotificationRule]
+
+
+def _render(value, event):
+    return value(event) if callable(value) else value
+
+
+def _resolve_recipient(rule, event):
+    if isinstance(rule.recipient, str):
+        return getattr(event, rule.recipient)
+    return rule.recipient
+
+
+def build_notifications(spec, event, notification_type, service):
+    """
+    Render all notifications for an event without saving them.
+
+    Returns:
+        tuple: (list of Notification, list of (InAppNotification, realtime))
+    """
+    reference_attr, reference_type = spec.reference
+    reference_id = str(getattr(event, reference_attr))
+
+    notifications = []
+    in_app_notifications = []
+    for rule in spec.rules:
+        if rule.when is not None and not rule.when(event):
+            continue
+
+        recipient_id = _resolve_recipient(rule, event)
+        subject = _render(rule.subject, event)
+        content = _render(rule.content, event)
+
+        notifications.append(Notification(
+            recipient_id=recipient_id,
+            recipient_type=rule.recipient_type,
+            notification_type=notification_type,
+            channel=rule.channel,
+            subject=subject,
+            content=content,
+            reference_id=reference_id,
+            reference_type=reference_type,
+            status='PENDING'
+        ))
+
+        if rule.in_app:
+            in_app_notifications.append((InAppNotification(
+                recipient_id=recipient_id,
+                recipient_type=rule.recipient_type,
+                notification_type=notification_type,
+                title=subject,
+                content=content,
+                reference_id=reference_id,
+                reference_type=reference_type,
+                service=service,
+                event_type=event.event_type,
+                is_urgent=rule.is_urgent
+            ), rule.realtime))
+
+    return notifications, in_app_notifications
+
+
+def _send_realtime(in_app_notifications):
+    for in_app in in_app_notifications:
+        send_realtime_notification(in_app)
+
+
+def dispatch_event(events, event, notification_type, service, unknown_message):
+    """
+    Render, persist and enqueue delivery for all notifications of an event.
+
+    Args:
+        events: dict mapping event type to EventSpec
+        event: object exposing the event fields as attributes (including event_type)
+        notification_type: Notification.NotificationType value for the created notifications
+        service: name of the source service, stored on in-app notifications
+        unknown_message: response message for unknown event types (formatted with event_type)
+
+    Returns:
+        dict: response with a message and the IDs of the created notifications
+    """
+    spec = events.get(event.event_type)
+    if spec is None:
+        logger.warning(f"Unknown {service.lower().replace('_', ' ')} event type: {event.event_type}")
+        return {
+            'message': unknown_message.format(event_type=event.event_type),
+            'notifications': []
+        }
+
+    notifications, in_app_entries = build_notifications(spec, event, notification_type, service)
+    in_app_notifications = [in_app for in_app, _ in in_app_entries]
+
+    with transaction.atomic():
+        Notification.objects.bulk_create(notifications)
+        if in_app_notifications:
+            InAppNotification.objects.bulk_create(in_app_notifications)
+
+        delivery_ids = [notification.id for notification in notifications if notification.channel in DELIVERY_CHANNELS]
+        if delivery_ids:
+            transaction.on_commit(lambda: send_notification_batch.delay(delivery_ids))
+
+        realtime = [in_app for in_app, push in in_app_entries if push]
+        if realtime:
+            transaction.on_commit(lambda: _send_realtime(realtime))
+
+    return {
+        'message': spec.message,
+        'notifications': [notification.id for notification in notifications]
+    }
@@ -2,157 +2,380 @@ import logging
 import json
 import time
 import os
+import threading
 from django.core.management.base import BaseCommand
-from django.utils import timezone
+from django.db import close_old_connections, connection
 from common_auth.redis_notifications import RedisNotificationClient
+from notification.event_handlers import process_billing_event, process_pharmacy_event
 from notification.models import InAppNotification, Notification
+from notification.user_contacts import handle_contact_change_event
 
 logger = logging.getLogger(__name__)
 
+# Price changes published for billing-service's price catalog; they are not user notifications
+PRICE_CHANGE_EVENTS = (
+    'TEST_TYPE_UPDATED', 'TEST_TYPE_DELETED',
+    'MEDICATION_UPDATED', 'MEDICATION_DELETED',
+    'DOCTOR_FEE_UPDATED', 'DOCTOR_FEE_DELETED',
+)
+
+# Outbox events from these services go through the same handlers as /api/events,
+# so they get the same email, in-app and admin notifications
+EVENT_HANDLERS = {
+    'BILLING': process_billing_event,
+    'PHARMACY': process_pharmacy_event,
+}
+
+# How long a dispatched outbox event is remembered, so a reclaimed message is not sent twice
+DISPATCH_DEDUPE_TTL = 7 * 24 * 3600
+# How long an event is reserved by the worker dispatching it (a crashed worker releases it)
+DISPATCH_RESERVE_TTL = 300
+
+
+class ConsumerStats:
+    """
+    Thread-safe throughput counters shared by all consumer workers.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started_at = time.monotonic()
+        self.messages = 0
+        self.notifications = 0
+        self.claimed = 0
+        self.dead_lettered = 0
+        self.errors = 0
+
+    def add(self, messages=0, notifications=0, claimed=0, dead_lettered=0, errors=0):
+        with self._lock:
+            self.messages += messages
+            self.notifications += notifications
+            self.claimed += claimed
+            self.dead_lettered += dead_lettered
+            self.errors += errors
+
+    def snapshot(self):
+        with self._lock:
+            elapsed = max(time.monotonic() - self.started_at, 1e-6)
+            return {
+                'messages': self.messages,
+                'notifications': self.notifications,
+                'claimed': self.claimed,
+                'dead_lettered': self.dead_lettered,
+                'errors': self.errors,
+                'messages_per_second': self.messages / elapsed,
+            }
+
+
 class Command(BaseCommand):
     help = 'Consumes notifications from Redis Stream and processes them as in-app notifications'
 
     def add_arguments(self, parser):
         parser.add_argument('--group', type=str, default='notification_processors', help='Consumer group name')
         parser.add_argument('--consumer', type=str, default=None, help='Consumer name (default: auto-generated)')
-        parser.add_argument('--batch-size', type=int, default=10, help='Number of notifications to process in one batch')
-        parser.add_argument('--sleep', type=int, default=1, help='Sleep time in seconds when no messages are available')
+        parser.add_argument('--batch-size', type=int, default=100, help='Number of notifications to process in one batch')
+        parser.add_argument('--workers', type=int, default=4, help='Number of consumer threads in the group')
+        parser.add_argument('--block', type=int, default=2000, help='Time in milliseconds to block waiting for new messages')
+        parser.add_argument('--claim-idle', type=int, default=60000, help='Reclaim pending messages idle for this many milliseconds')
+        parser.add_argument('--claim-interval', type=int, default=30, help='Seconds between reclaiming stuck pending messages')
+        parser.add_argument('--max-deliveries', type=int, default=5, help='Move a message to the dead-letter stream after this many deliveries')
+        parser.add_argument('--dead-letter-stream', type=str, default='notifications:dead', help='Stream for messages that could not be processed')
+        parser.add_argument('--stats-interval', type=int, default=60, help='Seconds between throughput and lag reports')
+        parser.add_argument('--sleep', type=int, default=1, help='Sleep time in seconds after a consumer error')
 
     def handle(self, *args, **options):
         group_name = options['group']
         consumer_name = options['consumer'] or f"consumer-{os.getpid()}"
-        batch_size = options['batch_size']
-        sleep_time = options['sleep']
+        workers = max(options['workers'], 1)
+        stats_interval = options['stats_interval']
 
         client = RedisNotificationClient()
         client.create_consumer_group(group_name)
 
+        self.stats = ConsumerStats()
+        self.stop_event = threading.Event()
+
         self.stdout.write(self.style.SUCCESS(f"Starting Redis notification consumer: {consumer_name}"))
-        self.stdout.write(f"Consumer group: {group_name}, Batch size: {batch_size}, Sleep time: {sleep_time}s")
+        self.stdout.write(f"Consumer group: {group_name}, Workers: {workers}, Batch size: {options['batch_size']}")
 
-        while True:
-            try:
-                messages = client.read_notifications(group_name, consumer_name, count=batch_size)
+        threads = []
+        for index in range(workers):
+            worker_name = consumer_name if workers == 1 else f"{consumer_name}-{index}"
+            thread = threading.Thread(
+                target=self.run_worker,
+                args=(client, group_name, worker_name, options),
+                name=worker_name,
+                daemon=True
+            )
+            thread.start()
+            threads.append(thread)
 
-                if not messages:
-                    time.sleep(sleep_time)
-                    continue
+        try:
+            while any(thread.is_alive() for thread in threads):
+                self.stop_event.wait(stats_interval)
+                self.report_stats(client, group_name)
+        except KeyboardInterrupt:
+            self.stop_event.set()
+            for thread in threads:
+                thread.join()
+            self.report_stats(client, group_name)
+            self.stdout.write(self.style.SUCCESS("Notification consumer stopped by user"))
 
-                for stream, message_list in messages:
-                    for message_id, message_data in message_list:
-                        self.process_notification(message_id, message_data, group_name, client)
+    def run_worker(self, client, group_name, consumer_name, options):
+        """
+        Worker loop: periodically reclaim stuck messages, then read and process batches.
+        read_notifications blocks on Redis, so no sleep is needed when the stream is idle.
+        """
+        batch_size = options['batch_size']
+        claim_interval = options['claim_interval']
+        next_claim = time.monotonic()
+
+        try:
+            while not self.stop_event.is_set():
+                try:
+                    if time.monotonic() >= next_claim:
+                        self.reclaim_stale_messages(client, group_name, consumer_name, options)
+                        next_claim = time.monotonic() + claim_interval
+
+                    messages = client.read_notifications(group_name, consumer_name, count=batch_size, block=options['block'])
+                    if not messages:
+                        continue
 
-            except KeyboardInterrupt:
-                self.stdout.write(self.style.SUCCESS("Notification consumer stopped by user"))
+                    for stream, message_list in messages:
+                        self.process_batch(message_list, group_name, client)
+
+                except Exception as e:
+                    logger.error(f"Error in notification consumer loop ({consumer_name}): {str(e)}")
+                    self.stderr.write(self.style.ERROR(f"Error in consumer loop: {str(e)}"))
+                    self.stats.add(errors=1)
+                    self.stop_event.wait(options['sleep'])
+        finally:
+            connection.close()
+
+    def reclaim_stale_messages(self, client, group_name, consumer_name, options):
+        """
+        Take over messages left pending by crashed or stuck consumers (XAUTOCLAIM).
+        """
+        start_id = "0-0"
+        while True:
+            start_id, messages = client.claim_stale_messages(
+                group_name, consumer_name,
+                min_idle_time=options['claim_idle'],
+                count=options['batch_size'],
+                start_id=start_id
+            )
+            if messages:
+                logger.info(f"{consumer_name} reclaimed {len(messages)} stale notifications")
+                self.stats.add(claimed=len(messages))
+                messages = self.dead_letter_exhausted(client, group_name, messages, options)
+                if messages:
+                    self.process_batch(messages, group_name, client)
+
+            if isinstance(start_id, bytes):
+                start_id = start_id.decode('utf-8')
+            if not messages or start_id == "0-0":
                 break
+
+    def dead_letter_exhausted(self, client, group_name, messages, options):
+        """
+        Move messages delivered --max-deliveries times or more to the dead-letter stream,
+        so a message that always fails is not retried forever.
+
+        Returns:
+            list: the messages that should still be processed
+        """
+        counts = client.get_delivery_counts(group_name, [message_id for message_id, _ in messages])
+        exhausted = [(message_id, data) for message_id, data in messages if counts.get(message_id, 0) >= options['max_deliveries']]
+        if not exhausted:
+            return messages
+
+        moved = client.dead_letter_messages(
+            group_name, exhausted, options['dead_letter_stream'],
+            reason=f"Failed after {options['max_deliveries']} deliveries"
+        )
+        if moved:
+            logger.error(f"Moved {moved} notifications to {options['dead_letter_stream']} after {options['max_deliveries']} deliveries")
+            self.stats.add(dead_lettered=moved)
+        exhausted_ids = {message_id for message_id, _ in exhausted}
+        return [(message_id, data) for message_id, data in messages if message_id not in exhausted_ids]
+
+    def report_stats(self, client, group_name):
+        stats = self.stats.snapshot()
+        group = client.get_group_lag(group_name)
+        self.stdout.write(
+            f"Processed {stats['messages']} messages ({stats['messages_per_second']:.1f}/s), "
+            f"created {stats['notifications']} in-app notifications, reclaimed {stats['claimed']}, "
+            f"dead-lettered {stats['dead_lettered']}, errors {stats['errors']}, lag {group['lag']}, pending {group['pending']}"
+        )
+
+    def process_batch(self, message_list, group_name, client):
+        """
+        Build in-app notifications for a batch of messages, insert them with one bulk_create
+        and acknowledge the whole batch with one XACK.
+        """
+        close_old_connections()
+
+        built = []
+        for message_id, message_data in message_list:
+            try:
+                built.append((message_id, self.build_notifications(message_id, message_data, client)))
             except Exception as e:
-                logger.error(f"Error in notification consumer loop: {str(e)}")
-                self.stderr.write(self.style.ERROR(f"Error in consumer loop: {str(e)}"))
-                time.sleep(sleep_time)
+                # Message is left pending and will be reclaimed later
+                logger.error(f"Error processing notification {message_id}: {str(e)}")
+                self.stats.add(errors=1)
 
-    def process_notification(self, message_id, message_data, group_name, client):
-        try:
-            # Decode message data from bytes to string
-            notification = {
-                key.decode('utf-8') if isinstance(key, bytes) else key: 
-                value.decode('utf-8') if isinstance(value, bytes) else value
-                for key, value in message_data.items()
-            }
+        if not built:
+            return
 
-            # Parse JSON fields if they exist
-            if 'recipients' in notification:
-                try:
-                    notification['recipients'] = json.loads(notification['recipients'])
-                except json.JSONDecodeError:
-                    notification['recipients'] = []
-                    
-            if 'data' in notification:
+        try:
+            InAppNotification.objects.bulk_create(
+                [notification for _, notifications in built for notification in notifications]
+            )
+            acknowledged = built
+        except Exception as e:
+            # Fall back to one insert per message so a bad message does not block the batch
+            logger.error(f"Bulk insert failed for {len(built)} notifications, retrying per message: {str(e)}")
+            acknowledged = []
+            for message_id, notifications in built:
                 try:
-                    notification['data'] = json.loads(notification['data'])
-                except json.JSONDecodeError:
-                    notification['data'] = {}
-
-            # Extract data from notification
-            service = notification.get('service', 'SYSTEM')
-            event_type = notification.get('event_type', 'UNKNOWN')
-            recipients = notification.get('recipients', [])
-            data = notification.get('data', {})
-            
-            self.stdout.write(f"Processing {service}.{event_type} notification")
-            
-            # Log detailed information for debugging
-            logger.debug(f"Notification data: {notification}")
-            logger.debug(f"Recipients: {recipients}")
-            logger.debug(f"Data: {data}")
+                    InAppNotification.objects.bulk_create(notifications)
+                    acknowledged.append((message_id, notifications))
+                except Exception as message_error:
+                    logger.error(f"Error creating notifications for message {message_id}: {str(message_error)}")
+                    self.stats.add(errors=1)
 
-            # If no recipients specified, use defaults based on data
-            if not recipients:
-                recipients = self._determine_default_recipients(service, event_type, data)
+        client.acknowledge_messages(group_name, [message_id for message_id, _ in acknowledged])
 
-            # Map notification_type based on service and event_type
-            notification_type = self._map_notification_type(service, event_type)
-            
-            # Determine if this notification is urgent
-            is_urgent = self._is_urgent_notification(service, event_type, data)
+        created_count = sum(len(notifications) for _, notifications in acknowledged)
+        self.stats.add(messages=len(acknowledged), notifications=created_count)
+        logger.info(f"Processed {len(acknowledged)} notifications: Created {created_count} in-app notifications")
 
-            # Create in-app notification for each recipient
-            created_count = 0
-            for recipient in recipients:
-                try:
-                    # Extract recipient information
-                    recipient_id = recipient.get('recipient_id')
-                    recipient_type = recipient.get('recipient_type', 'PATIENT')
-                    
-                    if not recipient_id:
-                        continue
-                        
-                    # Only create in-app notifications for recipients that should receive them
-                    if 'channels' in recipient and 'IN_APP' not in recipient['channels']:
-                        logger.debug(f"Skipping in-app notification for recipient {recipient_id}: not in channels")
-                        continue
-                    
-                    # Get title and content
-                    title = data.get('subject', f"{service} {event_type}")
-                    content = data.get('message', '')
-                    if not content and 'content' in data:
-                        content = data.get('content')
-                        
-                    # Get reference information
-                    reference_id = data.get('reference_id', '')
-                    reference_type = data.get('reference_type', service)
-                    
-                    # Extract IDs for common entities
-                    metadata = data.copy()
-                    
-                    # Create the in-app notification
-                    InAppNotification.objects.create(
-                        recipient_id=recipient_id,
-                        recipient_type=recipient_type,
-                        notification_type=notification_type,
-                        title=title,
-                        content=content,
-                        status=InAppNotification.Status.UNREAD,
-                        reference_id=reference_id,
-                        reference_type=reference_type,
-                        is_urgent=is_urgent,
-                        service=service,
-                        event_type=event_type,
-                        metadata=metadata
-                    )
-                    created_count += 1
-                    
-                except Exception as e:
-                    logger.error(f"Error creating notification for recipient {recipient}: {str(e)}")
-            
-            # Acknowledge message processing
-            client.acknowledge_message(group_name, message_id)
-            logger.info(f"Processed notification {message_id}: Created {created_count} in-app notifications")
-            self.stdout.write(self.style.SUCCESS(f"Created {created_count} in-app notifications"))
+    def build_notifications(self, message_id, message_data, client):
+        """
+        Parse a stream message and build (unsaved) in-app notifications for its recipients.
+        Outbox events with a handler are dispatched through it instead.
+        """
+        # Decode message data from bytes to string
+        notification = {
+            key.decode('utf-8') if isinstance(key, bytes) else key:
+            value.decode('utf-8') if isinstance(value, bytes) else value
+            for key, value in message_data.items()
+        }
+
+        # Parse JSON fields if they exist
+        if 'recipients' in notification:
+            try:
+                notification['recipients'] = json.loads(notification['recipients'])
+            except json.JSONDecodeError:
+                notification['recipients'] = []
+
+        if 'data' in notification:
+            try:
+                notification['data'] = json.loads(notification['data'])
+            except json.JSONDecodeError:
+                notification['data'] = {}
+
+        # Extract data from notification
+        service = notification.get('service', 'SYSTEM')
+        event_type = notification.get('event_type', 'UNKNOWN')
+        recipients = notification.get('recipients', [])
+        data = notification.get('data', {})
+
+        logger.debug(f"Processing {service}.{event_type} notification {message_id}: {notification}")
+
+        # Contact changes in the User Service only invalidate cached contact info
+        if service == 'USER' and handle_contact_change_event(event_type, data):
+            return []
+
+        if event_type in PRICE_CHANGE_EVENTS:
+            return []
+
+        event_id = notification.get('event_id')
+        if event_id and service in EVENT_HANDLERS and self._dispatch_event(client, event_id, service, event_type, data):
+            return []
+
+        # If no recipients specified, use defaults based on data
+        if not recipients:
+            recipients = self._determine_default_recipients(service, event_type, data)
+
+        # Map notification_type based on service and event_type
+        notification_type = self._map_notification_type(service, event_type)
+
+        # Determine if this notification is urgent
+        is_urgent = self._is_urgent_notification(service, event_type, data)
+
+        # Get title and content
+        title = data.get('subject', f"{service} {event_type}")
+        content = data.get('message', '')
+        if not content and 'content' in data:
+            content = data.get('content')
+
+        # Get reference information
+        reference_id = data.get('reference_id', '')
+        reference_type = data.get('reference_type', service)
+
+        # Build in-app notification for each recipient
+        notifications = []
+        for recipient in recipients:
+            try:
+                # Extract recipient information
+                recipient_id = recipient.get('recipient_id')
+                recipient_type = recipient.get('recipient_type', 'PATIENT')
+
+                if not recipient_id:
+                    continue
+
+                # Only create in-app notifications for recipients that should receive them
+                if 'channels' in recipient and 'IN_APP' not in recipient['channels']:
+                    logger.debug(f"Skipping in-app notification for recipient {recipient_id}: not in channels")
+                    continue
+
+                notifications.append(InAppNotification(
+                    recipient_id=recipient_id,
+                    recipient_type=recipient_type,
+                    notification_type=notification_type,
+                    title=title,
+                    content=content,
+                    status=InAppNotification.Status.UNREAD,
+                    reference_id=reference_id,
+                    reference_type=reference_type,
+                    is_urgent=is_urgent,
+                    service=service,
+                    event_type=event_type,
+                    metadata=data.copy()
+                ))
+
+            except Exception as e:
+                logger.error(f"Error creating notification for recipient {recipient}: {str(e)}")
+
+        return notifications
+
+    def _dispatch_event(self, client, event_id, service, event_type, data):
+        """
+        Send an outbox event through its service's event handler, once per event_id.
+
+        Returns:
+            bool: True if the handler created notifications (now or on an earlier delivery),
+                  False if it does not know the event type and the generic in-app notification should be used
+        """
+        key = f"notification_dispatched:{event_id}"
+        # Reserve the event first, so two workers that reclaimed the same message do not both dispatch it
+        if not client.redis_client.set(key, 'pending', nx=True, ex=DISPATCH_RESERVE_TTL):
+            dispatched = client.redis_client.get(key)
+            if dispatched is None or dispatched in (b'pending', 'pending'):
+                # Left pending; retried once the other worker finished or its reservation expired
+                raise RuntimeError(f"Event {event_id} is being dispatched by another worker")
+            logger.info(f"Skipping already dispatched event {event_id}")
+            return dispatched in (b'1', '1')
+
+        try:
+            result = EVENT_HANDLERS[service]({'service': service, 'event_type': event_type, **data})
+        except Exception:
+            client.redis_client.delete(key)
+            raise
+        handled = bool(result.get('notifications'))
+        client.redis_client.set(key, '1' if handled else '0', ex=DISPATCH_DEDUPE_TTL)
+        return handled
 
-        except Exception as e:
-            logger.error(f"Error processing notification {message_id}: {str(e)}")
-            self.stderr.write(self.style.ERROR(f"Error processing notification: {str(e)}"))
-            
     def _determine_default_recipients(self, service, event_type, data):
         """
         Determine default recipients based on notification data.
@@ -6,7 +6,7 @@ from datetime import datetime, timedelta
 from django.core.management.base import BaseCommand
 from django.utils import timezone
 from notification.models import NotificationSchedule, NotificationTemplate, Notification
-from notification.services import get_user_info
+from notification.services import get_users_info, render_template_batch
 
 logger = logging.getLogger(__name__)
 
@@ -69,7 +69,11 @@ class Command(BaseCommand):
         ]
         
         scheduled_count = 0
+        pending = []
         
+        # Resolve all patients' contact info in one lookup
+        patients_info = get_users_info([appointment['patient_id'] for appointment in test_appointments], 'PATIENT')
+
         for appointment in test_appointments:
             # Check if a reminder has already been scheduled for this appointment
             existing_schedule = NotificationSchedule.objects.filter(
@@ -85,14 +89,12 @@ class Command(BaseCommand):
                 continue
             
             # Get patient info
-            patient_info = get_user_info(appointment['patient_id'], 'PATIENT')
+            patient_info = patients_info.get(appointment['patient_id'])
             
             if not patient_info:
                 self.stdout.write(self.style.WARNING(f'Could not get info for patient {appointment["patient_id"]}'))
                 continue
             
-            # Calculate the reminder date (days_before days before the appointment date)
-            reminder_date = timezone.now()
             
             # Format appointment date and time for display
             formatted_date = appointment['appointment_date'].strftime('%d/%m/%Y')
@@ -108,6 +110,17 @@ class Command(BaseCommand):
                 'location': appointment['location']
             }
             
+            pending.append((appointment, patient_info, context_data))
+
+        # Render all reminders with one compiled template per channel
+        contexts = [context_data for _, _, context_data in pending]
+        email_rendered = render_template_batch(email_template, contexts)
+        sms_rendered = render_template_batch(sms_template, contexts)
+
+        for (appointment, patient_info, _), (email_subject, email_content), (_, sms_content) in zip(pending, email_rendered, sms_rendered):
+            # Calculate the reminder date (days_before days before the appointment date)
+            reminder_date = timezone.now()
+
             # Schedule email notification
             if patient_info.get('email'):
                 email_schedule = NotificationSchedule(
@@ -116,8 +129,8 @@ class Command(BaseCommand):
                     recipient_email=patient_info.get('email'),
                     notification_type=Notification.NotificationType.APPOINTMENT,
                     channel=Notification.Channel.EMAIL,
-                    subject=email_template.subject_template,
-                    content=email_template.content_template,
+                    subject=email_subject,
+                    content=email_content,
                     scheduled_at=reminder_date,
                     status=NotificationSchedule.Status.SCHEDULED,
                     template=email_template,
@@ -137,7 +150,7 @@ class Command(BaseCommand):
                     notification_type=Notification.NotificationType.APPOINTMENT,
                     channel=Notification.Channel.SMS,
                     subject='',
-                    content=sms_template.content_template,
+                    content=sms_content,
                     scheduled_at=reminder_date,
                     status=NotificationSchedule.Status.SCHEDULED,
                     template=sms_template,
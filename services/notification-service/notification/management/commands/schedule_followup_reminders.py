@@ -6,7 +6,7 @@ from datetime import datetime, timedelta
 from django.core.management.base import BaseCommand
 from django.utils import timezone
 from notification.models import NotificationSchedule, NotificationTemplate, Notification
-from notification.services import get_user_info
+from notification.services import get_users_info, render_template_batch
 
 logger = logging.getLogger(__name__)
 
@@ -59,7 +59,11 @@ class Command(BaseCommand):
         ]
         
         scheduled_count = 0
+        pending = []
         
+        # Resolve all patients' contact info in one lookup
+        patients_info = get_users_info([followup['patient_id'] for followup in test_followups], 'PATIENT')
+
         for followup in test_followups:
             # Check if a reminder has already been scheduled for this follow-up
             existing_schedule = NotificationSchedule.objects.filter(
@@ -75,14 +79,12 @@ class Command(BaseCommand):
                 continue
             
             # Get patient info
-            patient_info = get_user_info(followup['patient_id'], 'PATIENT')
+            patient_info = patients_info.get(followup['patient_id'])
             
             if not patient_info or not patient_info.get('email'):
                 self.stdout.write(self.style.WARNING(f'Could not get email for patient {followup["patient_id"]}'))
                 continue
             
-            # Calculate the reminder date (days_before days before the recommended follow-up date)
-            reminder_date = timezone.now()
             
             # Create context data for the template
             context_data = {
@@ -93,6 +95,15 @@ class Command(BaseCommand):
                 'reason': followup.get('reason', '')
             }
             
+            pending.append((followup, patient_info, context_data))
+
+        # Render all reminders with one compiled template
+        rendered = render_template_batch(template, [context_data for _, _, context_data in pending])
+
+        for (followup, patient_info, _), (subject, content) in zip(pending, rendered):
+            # Calculate the reminder date (days_before days before the recommended follow-up date)
+            reminder_date = timezone.now()
+
             # Schedule the notification
             schedule = NotificationSchedule(
                 recipient_id=followup['patient_id'],
@@ -100,8 +111,8 @@ class Command(BaseCommand):
                 recipient_email=patient_info.get('email'),
                 notification_type=Notification.NotificationType.APPOINTMENT,
                 channel=Notification.Channel.EMAIL,
-                subject=template.subject_template,
-                content=template.content_template,
+                subject=subject,
+                content=content,
                 scheduled_at=reminder_date,
                 status=NotificationSchedule.Status.SCHEDULED,
                 template=template,
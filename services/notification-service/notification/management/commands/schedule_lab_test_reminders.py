@@ -6,7 +6,7 @@ from datetime import datetime, timedelta
 from django.core.management.base import BaseCommand
 from django.utils import timezone
 from notification.models import NotificationSchedule, NotificationTemplate, Notification
-from notification.services import get_user_info
+from notification.services import get_users_info, render_template_batch
 
 logger = logging.getLogger(__name__)
 
@@ -65,7 +65,11 @@ class Command(BaseCommand):
         ]
         
         scheduled_count = 0
+        pending = []
         
+        # Resolve all patients' contact info in one lookup
+        patients_info = get_users_info([test['patient_id'] for test in test_lab_tests], 'PATIENT')
+
         for test in test_lab_tests:
             # Check if a reminder has already been scheduled for this test
             existing_schedule = NotificationSchedule.objects.filter(
@@ -81,14 +85,12 @@ class Command(BaseCommand):
                 continue
             
             # Get patient info
-            patient_info = get_user_info(test['patient_id'], 'PATIENT')
+            patient_info = patients_info.get(test['patient_id'])
             
             if not patient_info or not patient_info.get('email'):
                 self.stdout.write(self.style.WARNING(f'Could not get email for patient {test["patient_id"]}'))
                 continue
             
-            # Calculate the reminder date (days_before days before the test date)
-            reminder_date = timezone.now()
             
             # Format test date and time for display
             formatted_date = test['test_date'].strftime('%d/%m/%Y')
@@ -104,6 +106,15 @@ class Command(BaseCommand):
                 'notes': test.get('notes', '')
             }
             
+            pending.append((test, patient_info, context_data))
+
+        # Render all reminders with one compiled template
+        rendered = render_template_batch(template, [context_data for _, _, context_data in pending])
+
+        for (test, patient_info, _), (subject, content) in zip(pending, rendered):
+            # Calculate the reminder date (days_before days before the test date)
+            reminder_date = timezone.now()
+
             # Schedule the notification
             schedule = NotificationSchedule(
                 recipient_id=test['patient_id'],
@@ -111,8 +122,8 @@ class Command(BaseCommand):
                 recipient_email=patient_info.get('email'),
                 notification_type=Notification.NotificationType.LAB_RESULT,
                 channel=Notification.Channel.EMAIL,
-                subject=template.subject_template,
-                content=template.content_template,
+                subject=subject,
+                content=content,
                 scheduled_at=reminder_date,
                 status=NotificationSchedule.Status.SCHEDULED,
                 template=template,
@@ -6,7 +6,7 @@ from datetime import datetime, timedelta
 from django.core.management.base import BaseCommand
 from django.utils import timezone
 from notification.models import NotificationSchedule, NotificationTemplate, Notification
-from notification.services import get_user_info
+from notification.services import get_users_info, render_template_batch
 
 logger = logging.getLogger(__name__)
 
@@ -63,7 +63,11 @@ class Command(BaseCommand):
         ]
         
         scheduled_count = 0
+        pending = []
         
+        # Resolve all patients' contact info in one lookup
+        patients_info = get_users_info([invoice['patient_id'] for invoice in test_invoices], 'PATIENT')
+
         for invoice in test_invoices:
             # Check if a reminder has already been scheduled for this invoice
             existing_schedule = NotificationSchedule.objects.filter(
@@ -79,14 +83,12 @@ class Command(BaseCommand):
                 continue
             
             # Get patient info
-            patient_info = get_user_info(invoice['patient_id'], 'PATIENT')
+            patient_info = patients_info.get(invoice['patient_id'])
             
             if not patient_info:
                 self.stdout.write(self.style.WARNING(f'Could not get info for patient {invoice["patient_id"]}'))
                 continue
             
-            # Calculate the reminder date (days_before days before the due date)
-            reminder_date = timezone.now()
             
             # Format amount and due date for display
             formatted_amount = f"{invoice['amount']:,}"
@@ -101,6 +103,17 @@ class Command(BaseCommand):
                 'due_date': formatted_due_date
             }
             
+            pending.append((invoice, patient_info, context_data))
+
+        # Render all reminders with one compiled template per channel
+        contexts = [context_data for _, _, context_data in pending]
+        email_rendered = render_template_batch(email_template, contexts)
+        sms_rendered = render_template_batch(sms_template, contexts)
+
+        for (invoice, patient_info, _), (email_subject, email_content), (_, sms_content) in zip(pending, email_rendered, sms_rendered):
+            # Calculate the reminder date (days_before days before the due date)
+            reminder_date = timezone.now()
+
             # Schedule email notification
             if patient_info.get('email'):
                 email_schedule = NotificationSchedule(
@@ -109,8 +122,8 @@ class Command(BaseCommand):
                     recipient_email=patient_info.get('email'),
                     notification_type=Notification.NotificationType.BILLING,
                     channel=Notification.Channel.EMAIL,
-                    subject=email_template.subject_template,
-                    content=email_template.content_template,
+                    subject=email_subject,
+                    content=email_content,
                     scheduled_at=reminder_date,
                     status=NotificationSchedule.Status.SCHEDULED,
                     template=email_template,
@@ -130,7 +143,7 @@ class Command(BaseCommand):
                     notification_type=Notification.NotificationType.BILLING,
                     channel=Notification.Channel.SMS,
                     subject='',
-                    content=sms_template.content_template,
+                    content=sms_content,
                     scheduled_at=reminder_date,
                     status=NotificationSchedule.Status.SCHEDULED,
                     template=sms_template,
@@ -7,6 +7,7 @@ from datetime import datetime
 from django.core.mail import send_mail
 from django.conf import settings
 from django.template import Template, Context
+from .user_contacts import LRUCache
 
 logger = logging.getLogger(__name__)
 
@@ -83,38 +84,138 @@ def send_sms(recipient_phone, content):
         return False
 
 
-def render_template(template_content, context_data):
+_compiled_templates = LRUCache(
+    max_size=getattr(settings, 'NOTIFICATION_TEMPLATE_CACHE_SIZE', 256),
+    ttl=getattr(settings, 'NOTIFICATION_TEMPLATE_CACHE_TTL', 3600)
+)
+
+
+def compile_template(template_content, cache_key=None):
     """
-    Render a template with the given context data.
+    Compile a template string, reusing the compiled Template for the same cache key.
+
+    Args:
+        template_content: template source
+        cache_key: key identifying this source; defaults to the source itself
+
+    Returns:
+        Template: the compiled template, or None if the source is invalid
     """
+    key = cache_key if cache_key is not None else ('source', template_content)
+    template = _compiled_templates.get(key)
+    if template is None:
+        try:
+            template = Template(template_content)
+        except Exception as e:
+            logger.error(f"Error compiling template: {str(e)}")
+            return None
+        _compiled_templates.set(key, template)
+    return template
+
+
+def _render_compiled(template, template_content, context_data):
+    if template is None:
+        return template_content
     try:
-        template = Template(template_content)
-        context = Context(context_data)
-        return template.render(context)
+        return template.render(Context(context_data))
     except Exception as e:
         logger.error(f"Error rendering template: {str(e)}")
         return template_content
 
 
-def get_user_info(user_id, user_type):
+def render_template(template_content, context_data, cache_key=None):
+    """
+    Render a template with the given context data.
+    """
+    return _render_compiled(compile_template(template_content, cache_key), template_content, context_data)
+
+
+def render_template_batch(template, contexts):
+    """
+    Render a NotificationTemplate against a list of contexts.
+
+    The subject and content templates are compiled once per (template_id, updated_at),
+    so editing a template invalidates its cached compilation.
+
+    Args:
+        template: NotificationTemplate instance
+        contexts: list of context dicts
+
+    Returns:
+        list: (subject, content) tuples in the order of contexts
+    """
+    version = (template.id, template.updated_at)
+    subject_template = None
+    if template.subject_template:
+        subject_template = compile_template(template.subject_template, version + ('subject',))
+    content_template = compile_template(template.content_template, version + ('content',))
+
+    rendered = []
+    for context_data in contexts:
+        subject = _render_compiled(subject_template, template.subject_template, context_data) if template.subject_template else ""
+        content = _render_compiled(content_template, template.content_template, context_data)
+        rendered.append((subject, content))
+    return rendered
+
+
+def render_notification_template(template, context_data):
     """
-    Get user information from the User Service.
+    Render a NotificationTemplate with the given context data.
+
+    Returns:
+        tuple: (subject, content)
     """
-    import requests
-    import os
-    from django.conf import settings
+    return render_template_batch(template, [context_data])[0]
+
+
+_user_service_session = None
+
+
+def _get_user_service_session():
+    """Shared keep-alive session for User Service calls"""
+    global _user_service_session
+    if _user_service_session is None:
+        import requests
+        _user_service_session = requests.Session()
+    return _user_service_session
+
 
+def _get_user_service_url():
     # Get User Service URL from settings or environment variable
-    user_service_url = getattr(settings, 'USER_SERVICE_URL', os.environ.get('USER_SERVICE_URL', 'http://user-service:8000'))
+    return getattr(settings, 'USER_SERVICE_URL', os.environ.get('USER_SERVICE_URL', 'http://user-service:8000'))
+
+
+def _fallback_user_info(user_id, user_type):
+    # Fallback to basic info if API call fails
+    return {
+        'id': user_id,
+        'email': f"user{user_id}@example.com",
+        'phone': f"+1234567890{user_id}",
+        'first_name': f"User{user_id}",
+        'last_name': "Test",
+        'type': user_type
+    }
+
+
+def _fetch_user_info(user_id, user_type):
+    """
+    Fetch user and contact information for one user from the User Service.
+
+    Returns:
+        dict or None: None if the User Service could not be reached
+    """
+    session = _get_user_service_session()
+    user_service_url = _get_user_service_url()
+    headers = {
+        'X-User-ID': str(user_id),
+        'X-User-Role': user_type
+    }
 
     try:
         # Make API call to User Service
-        response = requests.get(
+        response = session.get(
             f"{user_service_url}/api/users/{user_id}/",
-            headers={
-                'X-User-ID': str(user_id),
-                'X-User-Role': user_type
-            },
+            headers=headers,
             timeout=5  # 5 seconds timeout
         )
 
@@ -122,12 +223,9 @@ def get_user_info(user_id, user_type):
             user_data = response.json()
 
             # Get contact information
-            contact_response = requests.get(
+            contact_response = session.get(
                 f"{user_service_url}/api/contact-info/?user_id={user_id}",
-                headers={
-                    'X-User-ID': str(user_id),
-                    'X-User-Role': user_type
-                },
+                headers=headers,
                 timeout=5
             )
 
@@ -155,12 +253,89 @@ def get_user_info(user_id, user_type):
     except Exception as e:
         logger.error(f"Error getting user info from User Service: {str(e)}")
 
-    # Fallback to basic info if API call fails
-    return {
-        'id': user_id,
-        'email': f"user{user_id}@example.com",
-        'phone': f"+1234567890{user_id}",
-        'first_name': f"User{user_id}",
-        'last_name': "Test",
-        'type': user_type
-    }
+    return None
+
+
+def _fetch_users_contacts(user_ids, user_type):
+    """
+    Fetch contact information for many users with one User Service request.
+
+    Returns:
+        dict: {user_id: user_info} for the users returned by the User Service
+    """
+    session = _get_user_service_session()
+    user_service_url = _get_user_service_url()
+
+    try:
+        response = session.get(
+            f"{user_service_url}/api/users/contacts/",
+            params={'ids': ','.join(str(user_id) for user_id in user_ids)},
+            headers={
+                'X-Service-API-Key': getattr(settings, 'SERVICE_API_KEY', ''),
+                'X-Service-Name': getattr(settings, 'SERVICE_NAME', 'notification-service')
+            },
+            timeout=10
+        )
+        if response.status_code != 200:
+            logger.warning(f"Bulk contact lookup failed: {response.status_code} - {response.text}")
+            return {}
+
+        return {
+            str(user['id']): {
+                'id': user.get('id'),
+                'email': user.get('email'),
+                'phone': user.get('phone'),
+                'first_name': user.get('first_name'),
+                'last_name': user.get('last_name'),
+                'type': user_type
+            }
+            for user in response.json()
+        }
+    except Exception as e:
+        logger.error(f"Error getting bulk contact info from User Service: {str(e)}")
+        return {}
+
+
+def get_users_info(user_ids, user_type):
+    """
+    Get user information for many users of the same type.
+
+    Cached entries are served from the local/Redis cache; the rest are fetched with a
+    single bulk request to the User Service, falling back to per-user lookups.
+
+    Returns:
+        dict: {user_id: user_info} for every requested user
+    """
+    from .user_contacts import user_info_cache
+
+    user_ids = list(dict.fromkeys(user_id for user_id in user_ids if user_id is not None))
+    keys = {user_id: user_info_cache.make_key(user_id, user_type) for user_id in user_ids}
+    cached = user_info_cache.get_many(list(keys.values()))
+
+    result = {user_id: cached[key] for user_id, key in keys.items() if key in cached}
+    missing = [user_id for user_id in user_ids if user_id not in result]
+
+    fetched = {}
+    if missing:
+        bulk = _fetch_users_contacts(missing, user_type) if len(missing) > 1 else {}
+        for user_id in missing:
+            user_info = bulk.get(str(user_id)) or _fetch_user_info(user_id, user_type)
+            if user_info:
+                fetched[user_id] = user_info
+
+        user_info_cache.set_many({keys[user_id]: user_info for user_id, user_info in fetched.items()})
+        result.update(fetched)
+
+    # Users that could not be resolved get basic info (not cached)
+    for user_id in missing:
+        if user_id not in result:
+            result[user_id] = _fallback_user_info(user_id, user_type)
+
+    return result
+
+
+def get_user_info(user_id, user_type):
+    """
+    Get user information from the User Service (cached).
+    """
+    return get_users_info([user_id], user_type).get(user_id) or _fallback_user_info(user_id, user_type)
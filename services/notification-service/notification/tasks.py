@@ -6,7 +6,7 @@ from datetime import datetime
 from celery import shared_task
 from django.db import transaction
 from .models import Notification, NotificationSchedule, NotificationTemplate
-from .services import send_email, send_sms, render_template, get_user_info
+from .services import send_email, send_sms, render_notification_template, get_user_info
 
 logger = logging.getLogger(__name__)
 
@@ -104,6 +104,29 @@ def send_sms_notification(notification_id):
         return False
 
 
+@shared_task
+def send_notification_batch(notification_ids):
+    """
+    Send a batch of pending EMAIL/SMS notifications in one task.
+    """
+    notifications = Notification.objects.filter(
+        id__in=notification_ids,
+        status=Notification.Status.PENDING,
+        channel__in=[Notification.Channel.EMAIL, Notification.Channel.SMS]
+    )
+
+    sent = 0
+    for notification in notifications:
+        if notification.channel == Notification.Channel.EMAIL:
+            success = send_email_notification(notification.id)
+        else:
+            success = send_sms_notification(notification.id)
+        if success:
+            sent += 1
+
+    return sent
+
+
 @shared_task
 def process_scheduled_notifications():
     """
@@ -177,8 +200,7 @@ def send_notification_from_template(template_id, recipient_id, recipient_type, c
         context = {**user_info, **(context_data or {})}
         
         # Render the template
-        subject = render_template(template.subject_template, context) if template.subject_template else ""
-        content = render_template(template.content_template, context)
+        subject, content = render_notification_template(template, context)
         
         # Create a notification
         notification = Notification(
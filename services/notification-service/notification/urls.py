@@ -3,6 +3,7 @@ URL configuration for notification app.
 """
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from common_auth import register_health_check
 from .views import (
     NotificationViewSet, NotificationTemplateViewSet,
     NotificationScheduleViewSet, InAppNotificationViewSet,
@@ -21,3 +22,6 @@ urlpatterns = [
     # Giữ lại đường dẫn cũ cho khả năng tương thích ngược
     path('events', EventViewSet.as_view({'post': 'process'}), name='process-event'),
 ]
+
+# Register health check and metrics endpoints
+urlpatterns = register_health_check(urlpatterns)
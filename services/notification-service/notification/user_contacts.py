@@ -0,0 +1,164 @@
+"""
+Two-level cache for user contact information fetched from the User Service.
+
+Entries are kept in a per-process LRU with a short TTL and in Redis with a longer TTL so
+that all workers share lookups. Entries are invalidated when the User Service publishes a
+contact change event (see CONTACT_CHANGE_EVENTS).
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from common_auth.redis_client import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+# Events published by the User Service when a user's contact information changes
+CONTACT_CHANGE_EVENTS = ('CONTACT_INFO_UPDATED', 'CONTACT_INFO_DELETED', 'USER_UPDATED', 'USER_DELETED')
+
+LOCAL_CACHE_SIZE = getattr(settings, 'USER_INFO_LOCAL_CACHE_SIZE', 10000)
+LOCAL_CACHE_TTL = getattr(settings, 'USER_INFO_LOCAL_CACHE_TTL', 60)
+REDIS_CACHE_TTL = getattr(settings, 'USER_INFO_CACHE_TTL', 3600)
+
+KEY_PREFIX = 'notification:user_info'
+
+
+class LRUCache:
+    """
+    Thread-safe in-process LRU cache with a per-entry TTL.
+    """
+    def __init__(self, max_size=LOCAL_CACHE_SIZE, ttl=LOCAL_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class UserInfoCache:
+    """
+    User info cache: in-process LRU in front of Redis.
+    """
+    def __init__(self, redis_url=None):
+        self.local = LRUCache()
+        self.redis_url = redis_url
+        self._redis_client = None
+
+    @property
+    def redis_client(self):
+        """Shared Redis client (one connection pool per process)"""
+        if self._redis_client is None:
+            redis_url = self.redis_url or getattr(settings, 'REDIS_URL', os.environ.get('REDIS_URL', 'redis://redis:6379/0'))
+            self._redis_client = get_redis_client(redis_url)
+        return self._redis_client
+
+    @staticmethod
+    def make_key(user_id, user_type):
+        return f"{KEY_PREFIX}:{user_type}:{user_id}"
+
+    def get_many(self, keys):
+        """
+        Look up keys in the local cache, then the missing ones in Redis with one MGET.
+
+        Returns:
+            dict: {key: user_info} for the keys found
+        """
+        found = {}
+        missing = []
+        for key in keys:
+            value = self.local.get(key)
+            if value is not None:
+                found[key] = value
+            else:
+                missing.append(key)
+
+        if missing:
+            try:
+                for key, raw in zip(missing, self.redis_client.mget(missing)):
+                    if raw is not None:
+                        value = json.loads(raw)
+                        self.local.set(key, value)
+                        found[key] = value
+            except Exception as e:
+                logger.warning(f"Error reading user info from Redis cache: {str(e)}")
+
+        return found
+
+    def set_many(self, values):
+        """Store {key: user_info} in both cache levels"""
+        if not values:
+            return
+        for key, value in values.items():
+            self.local.set(key, value)
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            for key, value in values.items():
+                pipe.setex(key, REDIS_CACHE_TTL, json.dumps(value))
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"Error writing user info to Redis cache: {str(e)}")
+
+    def invalidate(self, user_ids):
+        """
+        Remove cached entries for the given users (all user types).
+        """
+        user_ids = [str(user_id) for user_id in user_ids if user_id is not None]
+        if not user_ids:
+            return
+
+        from .models import Notification
+        keys = [self.make_key(user_id, user_type) for user_id in user_ids for user_type in Notification.RecipientType.values]
+        for key in keys:
+            self.local.delete(key)
+        try:
+            self.redis_client.delete(*keys)
+        except Exception as e:
+            logger.warning(f"Error invalidating user info in Redis cache: {str(e)}")
+        logger.info(f"Invalidated cached contact info for users {user_ids}")
+
+
+user_info_cache = UserInfoCache()
+
+
+def handle_contact_change_event(event_type, data):
+    """
+    Invalidate cached contact info for a User Service contact change event.
+
+    Returns:
+        bool: True if the event was a contact change event
+    """
+    if event_type not in CONTACT_CHANGE_EVENTS:
+        return False
+
+    user_ids = data.get('user_ids') or [data.get('user_id')]
+    user_info_cache.invalidate(user_ids)
+    return True
@@ -43,6 +43,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'common_auth.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -153,8 +154,17 @@ MEDICAL_RECORD_SERVICE_URL = os.environ.get('MEDICAL_RECORD_SERVICE_URL', 'http:
 SERVICE_API_KEY = os.environ.get('PHARMACY_SERVICE_API_KEY', 'pharmacy-service-api-key')
 SERVICE_NAME = 'pharmacy-service'
 
+# Notification event outbox (see common_auth.outbox)
+EVENT_OUTBOX_PUBLISH_ON_COMMIT = os.environ.get('EVENT_OUTBOX_PUBLISH_ON_COMMIT', 'False') == 'True'
+EVENT_OUTBOX_MAX_ATTEMPTS = int(os.environ.get('EVENT_OUTBOX_MAX_ATTEMPTS', 10))
+EVENT_OUTBOX_MAX_BACKOFF = int(os.environ.get('EVENT_OUTBOX_MAX_BACKOFF', 300))  # seconds
+EVENT_OUTBOX_DEDUPE_TTL = int(os.environ.get('EVENT_OUTBOX_DEDUPE_TTL', 7 * 24 * 3600))  # seconds
+
 # Common Auth settings
 REDIS_URL = os.environ.get('REDIS_URL', 'redis://redis:6379/0')
+
+# Bearer token for scraping /metrics/ (common_auth.metrics); unset = other services and localhost only
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
 JWT_SECRET = os.environ.get('JWT_SECRET', SECRET_KEY)
 ACCESS_TOKEN_LIFETIME = timedelta(minutes=60)
 REFRESH_TOKEN_LIFETIME = timedelta(days=7)
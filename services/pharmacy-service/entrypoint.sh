@@ -89,6 +89,10 @@ python manage.py migrate
 echo "Collecting static files..."
 python manage.py collectstatic --noinput
 
+# Start notification outbox relay
+echo "Starting notification outbox relay..."
+python manage.py relay_event_outbox --loop &
+
 # Start server in background and fetch swagger spec
 echo "Starting server in background..."
 "$@" &
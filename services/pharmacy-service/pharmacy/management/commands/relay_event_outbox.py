@@ -0,0 +1,51 @@
+import logging
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from common_auth.outbox import relay_pending, retry_failed, prune_published
+from pharmacy.models import EventOutbox
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Publishes pending outbox events to the notification stream'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=100, help='Maximum number of events to publish per batch')
+        parser.add_argument('--loop', action='store_true', help='Keep relaying instead of exiting when the outbox is drained')
+        parser.add_argument('--interval', type=float, default=1.0, help='Seconds to wait between polls when the outbox is drained (with --loop)')
+        parser.add_argument('--retry-failed', action='store_true', help='Reset FAILED events to PENDING before relaying')
+        parser.add_argument('--prune-days', type=int, default=None, help='Delete events published more than this many days ago')
+
+    def handle(self, *args, **options):
+        limit = options['limit']
+
+        if options['retry_failed']:
+            reset = retry_failed(EventOutbox)
+            self.stdout.write(f"Reset {reset} failed outbox events")
+
+        if options['prune_days'] is not None:
+            deleted = prune_published(EventOutbox, timedelta(days=options['prune_days']))
+            self.stdout.write(f"Deleted {deleted} published outbox events")
+
+        total_published = 0
+        while True:
+            close_old_connections()
+            try:
+                published, seen = relay_pending(EventOutbox, limit=limit)
+            except Exception as e:
+                logger.error(f"Error relaying outbox events: {str(e)}")
+                if not options['loop']:
+                    raise
+                published, seen = 0, 0
+            total_published += published
+
+            # A full batch that was published means more events may be waiting
+            if seen == limit and published == seen:
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS(f"Published {total_published} outbox events"))
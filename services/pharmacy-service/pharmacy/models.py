@@ -1,4 +1,5 @@
 from django.db import models
+from common_auth.outbox import EventOutboxBase
 
 class Medication(models.Model):
     """
@@ -194,3 +195,15 @@ class DispensingItem(models.Model):
             models.Index(fields=['prescription_item']),
             models.Index(fields=['inventory']),
         ]
+
+
+class EventOutbox(EventOutboxBase):
+    """
+    Notification events written in the same transaction as the pharmacy change
+    and published to the notification stream by relay_event_outbox.
+    """
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'available_at', 'id'], name='pharmacy_outbox_pending_idx'),
+        ]
@@ -0,0 +1,31 @@
+"""
+Signals publishing medication changes for billing-service's price catalog.
+"""
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from common_auth.redis_notifications import send_notification
+
+from .models import Medication
+
+
+def _publish_medication_change(event_type, medication):
+    # Medication has no list price yet; billing falls back to its default fee when price is None
+    price = getattr(medication, 'price', None)
+    data = {
+        'medication_id': medication.id,
+        'name': str(medication),
+        'price': str(price) if price is not None else None,
+        'updated_at': medication.updated_at.isoformat() if medication.updated_at else None,
+    }
+    transaction.on_commit(lambda: send_notification('PHARMACY', event_type, data, recipients=[]))
+
+
+@receiver(post_save, sender=Medication)
+def medication_saved(sender, instance, **kwargs):
+    _publish_medication_change('MEDICATION_UPDATED', instance)
+
+
+@receiver(post_delete, sender=Medication)
+def medication_deleted(sender, instance, **kwargs):
+    _publish_medication_change('MEDICATION_DELETED', instance)
@@ -381,7 +381,8 @@ class DispensingViewSet(viewsets.ModelViewSet):
 
         # Create invoice for the completed dispensing
         try:
-            from .integrations import create_invoice_from_prescription, send_notification
+            from .integrations import create_invoice_from_prescription
+            from .outbox import enqueue_notification
 
             # Get token from request
             auth_header = request.META.get('HTTP_AUTHORIZATION')
@@ -396,19 +397,15 @@ class DispensingViewSet(viewsets.ModelViewSet):
             if invoice:
                 logger.info(f"Created invoice for dispensing {dispensing.id}: {invoice.get('id')}")
 
-                # Send notification about invoice to patient
-                send_notification(
-                    user_id=dispensing.prescription.patient_id,
-                    notification_type="INVOICE_CREATED",
-                    message=f"An invoice has been created for your prescription.",
-                    additional_data={
-                        "invoice_id": invoice.get('id'),
-                        "prescription_id": dispensing.prescription.id,
-                        "dispensing_id": dispensing.id,
-                        "amount": invoice.get('total_amount')
-                    },
-                    token=auth_header
-                )
+                # Notification about the invoice is published to the patient by the outbox relay
+                enqueue_notification('INVOICE_CREATED', {
+                    "patient_id": dispensing.prescription.patient_id,
+                    "message": "An invoice has been created for your prescription.",
+                    "invoice_id": invoice.get('id'),
+                    "prescription_id": dispensing.prescription.id,
+                    "dispensing_id": dispensing.id,
+                    "amount": invoice.get('total_amount')
+                })
         except Exception as e:
             logger.error(f"Error creating invoice for dispensing {dispensing.id}: {str(e)}")
             # Don't raise the exception to avoid affecting the main flow
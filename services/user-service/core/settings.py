@@ -44,6 +44,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'common_auth.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -52,6 +53,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'users.middleware.ServiceAPIKeyMiddleware',
     # 'common_auth.middleware.SessionMiddleware',
 ]
 
@@ -137,6 +139,11 @@ REST_FRAMEWORK = {
     ],
 }
 
+# Service API Keys (service-to-service requests, see users.middleware.ServiceAPIKeyMiddleware)
+SERVICE_API_KEYS = {
+    'notification-service': os.environ.get('NOTIFICATION_SERVICE_API_KEY', 'notification-service-api-key'),
+}
+
 # CORS settings
 CORS_ALLOW_ALL_ORIGINS = True
 
@@ -180,6 +187,9 @@ SWAGGER_SETTINGS = {
 
 # Common Auth settings
 REDIS_URL = os.environ.get('REDIS_URL', 'redis://redis:6379/0')
+
+# Bearer token for scraping /metrics/ (common_auth.metrics); unset = other services and localhost only
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
 JWT_SECRET = os.environ.get('JWT_SECRET', SECRET_KEY)
 ACCESS_TOKEN_LIFETIME = timedelta(minutes=60)
 REFRESH_TOKEN_LIFETIME = timedelta(days=7)
@@ -0,0 +1,10 @@
+from rest_framework import permissions
+
+
+class IsServiceRequest(permissions.BasePermission):
+    """
+    Cho phép truy cập nếu request đến từ một service khác đã được xác thực (xem ServiceAPIKeyMiddleware).
+    """
+
+    def has_permission(self, request, view):
+        return getattr(request, 'is_service_request', False)
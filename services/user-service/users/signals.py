@@ -0,0 +1,71 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from authentication.models import User
+from .models import ContactInfo, DoctorProfile
+
+# Import module redis_notifications từ common-auth
+try:
+    from common_auth.redis_notifications import send_notification
+except ImportError:
+    # Fallback nếu không import được
+    def send_notification(service, event_type, data, recipients=None):
+        print(f"Would send notification: {service}.{event_type} - {data}")
+        return True
+
+
+def _publish_contact_change(event_type, user_id):
+    """
+    Thông báo cho các service khác (notification-service) rằng thông tin liên hệ đã thay đổi,
+    để xóa cache thông tin liên hệ của người dùng.
+    """
+    transaction.on_commit(lambda: send_notification('USER', event_type, {'user_id': user_id}, recipients=[]))
+
+
+@receiver(post_save, sender=ContactInfo)
+def contact_info_saved(sender, instance, **kwargs):
+    _publish_contact_change('CONTACT_INFO_UPDATED', instance.user_id)
+
+
+@receiver(post_delete, sender=ContactInfo)
+def contact_info_deleted(sender, instance, **kwargs):
+    _publish_contact_change('CONTACT_INFO_DELETED', instance.user_id)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, update_fields=None, **kwargs):
+    # Chỉ quan tâm đến thay đổi email/tên của người dùng đã tồn tại (bỏ qua cập nhật last_login)
+    if created or (update_fields and not {'email', 'first_name', 'last_name'} & set(update_fields)):
+        return
+    _publish_contact_change('USER_UPDATED', instance.id)
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    _publish_contact_change('USER_DELETED', instance.id)
+
+
+def _publish_doctor_fee_change(event_type, doctor):
+    """
+    Thông báo cho billing-service rằng phí khám của bác sĩ đã thay đổi (cập nhật bảng giá cục bộ).
+    """
+    data = {
+        'doctor_id': doctor.id,
+        'user_id': doctor.user_id,
+        'price': str(doctor.consultation_fee) if doctor.consultation_fee is not None else None,
+        'updated_at': doctor.updated_at.isoformat() if doctor.updated_at else None,
+    }
+    transaction.on_commit(lambda: send_notification('USER', event_type, data, recipients=[]))
+
+
+@receiver(post_save, sender=DoctorProfile)
+def doctor_profile_saved(sender, instance, update_fields=None, **kwargs):
+    if update_fields and 'consultation_fee' not in update_fields:
+        return
+    _publish_doctor_fee_change('DOCTOR_FEE_UPDATED', instance)
+
+
+@receiver(post_delete, sender=DoctorProfile)
+def doctor_profile_deleted(sender, instance, **kwargs):
+    _publish_doctor_fee_change('DOCTOR_FEE_DELETED', instance)
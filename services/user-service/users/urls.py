@@ -1,5 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from common_auth import register_health_check
 from .views import (
     UserViewSet, UserDocumentViewSet, AddressViewSet, ContactInfoViewSet,
     PatientProfileViewSet, DoctorProfileViewSet, NurseProfileViewSet,
@@ -63,3 +64,6 @@ urlpatterns = [
     # Thêm route đặc biệt cho medical-record-service
     path('users/doctors/<int:doctor_id>/', doctor_user_info, name='doctor-user-info'),
 ]
+
+# Register health check and metrics endpoints
+urlpatterns = register_health_check(urlpatterns)
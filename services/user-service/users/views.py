@@ -75,6 +75,7 @@ from .serializers import (
     PharmacistProfileSerializer, InsuranceInformationSerializer, InsuranceProviderProfileSerializer,
     LabTechnicianProfileSerializer, AdminProfileSerializer
 )
+from .permissions import IsServiceRequest
 
 # ============================================================
 # User ViewSet
@@ -132,6 +133,34 @@ class UserViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(request.user)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['get'], authentication_classes=[], permission_classes=[IsServiceRequest])
+    def contacts(self, request):
+        """
+        Lấy thông tin liên hệ của nhiều người dùng trong một request (dùng cho notification-service).
+        Chỉ dành cho service đã xác thực bằng API key.
+        Tham số: ids=1,2,3
+        """
+        ids_param = request.query_params.get('ids', '')
+        try:
+            user_ids = [int(user_id) for user_id in ids_param.split(',') if user_id.strip()]
+        except ValueError:
+            return Response({"detail": "Invalid ids parameter."}, status=status.HTTP_400_BAD_REQUEST)
+
+        users = User.objects.filter(id__in=user_ids).select_related('contact_info')
+
+        data = []
+        for user in users:
+            contact_info = getattr(user, 'contact_info', None)
+            data.append({
+                'id': user.id,
+                'email': user.email,
+                'phone': contact_info.phone_number if contact_info else None,
+                'first_name': user.first_name,
+                'last_name': user.last_name,
+                'role': user.role,
+            })
+        return Response(data)
+
     @action(detail=False, methods=['post'])
     def create_staff(self, request):
         """
@@ -615,6 +644,22 @@ class DoctorListViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = DoctorProfileSerializer
     permission_classes = [permissions.IsAuthenticated]
 
+    @action(detail=False, methods=['get'])
+    def batch(self, request):
+        """
+        Lấy thông tin của nhiều bác sĩ trong một request (dùng cho appointment-service).
+        Tham số: ids=1,2,3. ID không tồn tại sẽ không có trong kết quả.
+        """
+        ids_param = request.query_params.get('ids', '')
+        try:
+            doctor_ids = [int(doctor_id) for doctor_id in ids_param.split(',') if doctor_id.strip()]
+        except ValueError:
+            return Response({"detail": "Invalid ids parameter."}, status=status.HTTP_400_BAD_REQUEST)
+
+        doctors = DoctorProfile.objects.filter(id__in=doctor_ids)
+        serializer = self.get_serializer(doctors, many=True)
+        return Response(serializer.data)
+
     @action(detail=True, methods=['get'], url_path='user')
     def get_user_info(self, request, pk=None):
         """